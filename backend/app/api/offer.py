@@ -3,34 +3,49 @@ Offer API routes
 """
 import os
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse, Response
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, File, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import exists, select, tuple_
+from pydantic import ValidationError
 from sqlalchemy.orm import selectinload
 from app.database import get_db
 from app.models.user import User
 from app.models.property import Property
 from app.models.offer import Offer, OfferStatus
+from app.models.offer_batch import OfferBatchJob, OfferBatchStatus
 from app.models.payment import Payment, PaymentStatus, PaymentType
-from app.schemas.offer import OfferCreate, OfferResponse, OfferWithProperty, OfferCreateResponse
-from app.utils.pdf_generator import generate_offer_letter_pdf, OfferData
+from app.schemas.offer import (
+    OfferBase,
+    OfferCreate,
+    OfferResponse,
+    OfferWithProperty,
+    OfferCreateResponse,
+    OfferBatchResponse,
+    OfferBatchRowResult,
+    OfferVariantsCreate,
+    OfferVariantsCreateResponse,
+)
+from app.utils.pdf_generator import OfferData
+from app.utils.pdf_renderer import RenderQueueFullError
+from app.services.offer_documents import (
+    acquire_offer_document,
+    acquire_offer_documents,
+    materialize_offer_letter,
+)
 from app.utils.email import send_offer_notification, OfferNotificationData
+from app.utils.offer_import import RowResult, UploadFormatError, detect_upload_format, parse_offer_rows
+from app.utils.http_cache import conditional_file_response, offload_file_response
 from app.config import settings
 
 router = APIRouter()
 
 
-@router.post("/create", response_model=OfferCreateResponse)
-async def create_offer(
-    request: OfferCreate,
-    db: AsyncSession = Depends(get_db)
-):
+async def get_placeholder_user(db: AsyncSession) -> User:
     """
-    Create a new offer
-    
-    Creates the property if it doesn't exist, generates the offer letter PDF,
-    and sends an email notification.
+    Get the user that offers are created for
     """
     # TODO: Get user from session/auth
     # For now, use a placeholder user
@@ -47,7 +62,13 @@ async def create_offer(
         await db.commit()
         await db.refresh(user)
     
-    # Create or find the property
+    return user
+
+
+async def get_or_create_property(db: AsyncSession, request: OfferBase) -> Property:
+    """
+    Find the property an offer is for, creating it if it doesn't exist
+    """
     result = await db.execute(
         select(Property).where(
             Property.address == request.address,
@@ -71,6 +92,82 @@ async def create_offer(
         await db.commit()
         await db.refresh(property_obj)
     
+    return property_obj
+
+
+def build_offer_data(offer: Offer, property_obj: Property, user: User) -> OfferData:
+    """
+    Build the PDF generation inputs from a persisted offer
+    """
+    closing_date = ""
+    if offer.timeline_preferences:
+        closing_date = offer.timeline_preferences.get("closingDate", "") or offer.timeline_preferences.get("closing_date", "")
+    
+    seller_credits = None
+    if offer.concessions:
+        credits_str = offer.concessions.get("sellerCredits") or offer.concessions.get("seller_credits")
+        if credits_str:
+            try:
+                seller_credits = float(credits_str)
+            except (ValueError, TypeError):
+                pass
+    
+    return OfferData(
+        property_address=property_obj.address,
+        city=property_obj.city,
+        state=property_obj.state,
+        zip_code=property_obj.zip_code,
+        offer_price=offer.offer_price,
+        closing_date=closing_date,
+        financing_type=offer.financing_type,
+        buyer_name=user.name,
+        buyer_email=user.email,
+        seller_credits=seller_credits,
+        additional_notes=offer.additional_notes,
+    )
+
+
+async def ensure_offer_letter(db: AsyncSession, offer: Offer) -> None:
+    """
+    In lazy render mode, render the offer letter PDF if it isn't on disk yet
+    
+    The offer must have its property and user relationships loaded.
+    """
+    if settings.OFFER_LETTER_RENDER_MODE != "lazy":
+        return
+    offer_data = build_offer_data(offer, offer.property, offer.user)
+    await materialize_offer_letter(db, offer, offer_data, offer.property.property_type)
+
+
+async def reject_busy_renderer(db: AsyncSession, *objects) -> None:
+    """
+    Discard the just-created rows and answer 503 while the render queue is full
+    
+    Deleting the offers releases any offer letters already acquired for them.
+    """
+    for obj in objects:
+        await db.delete(obj)
+    await db.commit()
+    raise HTTPException(status_code=503, detail="Offer letter rendering is busy", headers={"Retry-After": "5"})
+
+
+@router.post("/create", response_model=OfferCreateResponse)
+async def create_offer(
+    request: OfferCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create a new offer
+    
+    Creates the property if it doesn't exist, generates the offer letter PDF,
+    and sends an email notification. Answers 503 with Retry-After, keeping
+    nothing, when the PDF render queue is full.
+    """
+    user = await get_placeholder_user(db)
+    
+    # Create or find the property
+    property_obj = await get_or_create_property(db, request)
+    
     # Create the offer
     offer = Offer(
         user_id=user.id,
@@ -88,61 +185,28 @@ async def create_offer(
     await db.commit()
     await db.refresh(offer)
     
-    # Generate PDF offer letter
+    # Generate PDF offer letter (in lazy mode it is rendered on first access)
     offer_letter_url = None
-    try:
-        # Prepare offer data for PDF generation
-        closing_date = ""
-        if request.timeline_preferences:
-            closing_date = request.timeline_preferences.get("closingDate", "") or request.timeline_preferences.get("closing_date", "")
-        
-        seller_credits = None
-        if request.concessions:
-            credits_str = request.concessions.get("sellerCredits") or request.concessions.get("seller_credits")
-            if credits_str:
-                try:
-                    seller_credits = float(credits_str)
-                except (ValueError, TypeError):
-                    pass
-        
-        offer_data = OfferData(
-            property_address=request.address,
-            city=request.city,
-            state=request.state,
-            zip_code=request.zip_code,
-            offer_price=request.offer_price,
-            closing_date=closing_date,
-            financing_type=request.financing_type,
-            buyer_name=user.name,
-            buyer_email=user.email,
-            seller_credits=seller_credits,
-            additional_notes=request.additional_notes,
-        )
-        
-        # Generate the PDF
-        pdf_bytes = await generate_offer_letter_pdf(offer_data, request.property_type)
-        
-        # Create offers directory if it doesn't exist
-        os.makedirs(settings.OFFERS_DIR, exist_ok=True)
-        
-        # Save PDF to offers directory
-        pdf_filename = f"offer-{offer.id}.pdf"
-        pdf_path = os.path.join(settings.OFFERS_DIR, pdf_filename)
-        
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_bytes)
-        
-        # Set the URL
-        offer_letter_url = f"/offers/{pdf_filename}"
-        
-        # Update offer with PDF URL
-        offer.offer_letter_url = offer_letter_url
-        offer.status = OfferStatus.GENERATED
-        await db.commit()
-        
-    except Exception as e:
-        print(f"Error generating PDF offer letter: {e}")
-        # Don't fail the request if PDF generation fails
+    if settings.OFFER_LETTER_RENDER_MODE != "lazy":
+        try:
+            # Prepare offer data for PDF generation
+            offer_data = build_offer_data(offer, property_obj, user)
+            
+            # Generate the PDF, or reuse the one rendered for identical terms
+            document = await acquire_offer_document(db, offer_data, request.property_type)
+            
+            # Set the URL
+            offer_letter_url = f"/offers/{document.file_name}"
+            
+            # Update offer with PDF URL
+            offer.offer_letter_url = offer_letter_url
+            offer.status = OfferStatus.GENERATED
+            await db.commit()
+        except RenderQueueFullError:
+            await reject_busy_renderer(db, offer)
+        except Exception as e:
+            print(f"Error generating PDF offer letter: {e}")
+            # Don't fail the request if PDF generation fails
     
     # Send email notification
     try:
@@ -164,12 +228,285 @@ async def create_offer(
     return OfferCreateResponse(offer_id=offer.id)
 
 
+@router.post("/variants", response_model=OfferVariantsCreateResponse)
+async def create_offer_variants(
+    request: OfferVariantsCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create one offer per variant of the same terms (e.g. a price ladder)
+    
+    Each variant overrides the offer price, seller credits and/or closing
+    date. All variant PDFs are rendered in one call that loads the template
+    and fill plan once and only re-fills the fields that differ.
+    """
+    user = await get_placeholder_user(db)
+    property_obj = await get_or_create_property(db, request)
+    
+    offers = []
+    for variant in request.variants:
+        timeline_preferences = dict(request.timeline_preferences or {})
+        if variant.closing_date is not None:
+            timeline_preferences.pop("closing_date", None)
+            timeline_preferences["closingDate"] = variant.closing_date
+        concessions = dict(request.concessions or {})
+        if variant.seller_credits is not None:
+            concessions.pop("seller_credits", None)
+            concessions["sellerCredits"] = str(variant.seller_credits)
+        
+        offer = Offer(
+            user_id=user.id,
+            property_id=property_obj.id,
+            financing_type=request.financing_type,
+            offer_price=variant.offer_price if variant.offer_price is not None else request.offer_price,
+            contingencies=request.contingencies,
+            timeline_preferences=timeline_preferences or None,
+            concessions=concessions or None,
+            additional_notes=request.additional_notes,
+            status=OfferStatus.GENERATED,
+            offer_letter_preview=None,
+        )
+        db.add(offer)
+        offers.append(offer)
+    await db.commit()
+    
+    # Render all variant PDFs together (in lazy mode on first access instead)
+    if settings.OFFER_LETTER_RENDER_MODE != "lazy":
+        documents = await acquire_offer_documents(
+            db,
+            [(build_offer_data(offer, property_obj, user), property_obj.property_type) for offer in offers],
+            as_variants=True,
+        )
+        for offer, document in zip(offers, documents):
+            if isinstance(document, Exception):
+                print(f"Error generating PDF offer letter: {document}")
+                continue
+            offer.offer_letter_url = f"/offers/{document.file_name}"
+        if any(isinstance(document, RenderQueueFullError) for document in documents):
+            await reject_busy_renderer(db, *offers)
+        await db.commit()
+    
+    for offer in offers:
+        try:
+            await send_offer_notification(OfferNotificationData(
+                offer_id=offer.id,
+                property_address=property_obj.address,
+                offer_price=offer.offer_price,
+                financing_type=offer.financing_type,
+                buyer_email=user.email,
+            ))
+            offer.notification_sent = True
+            offer.notification_sent_at = datetime.utcnow()
+        except Exception as e:
+            print(f"Failed to send email notification: {e}")
+    await db.commit()
+    
+    return OfferVariantsCreateResponse(offer_ids=[offer.id for offer in offers])
+
+
+def validate_offer_rows(
+    rows: list[RowResult],
+) -> tuple[dict[int, OfferBatchRowResult], list[tuple[int, OfferCreate]]]:
+    """Split parsed upload rows into per-row errors and validated offers"""
+    results: dict[int, OfferBatchRowResult] = {}
+    valid_rows: list[tuple[int, OfferCreate]] = []
+    for row_number, row in rows:
+        if isinstance(row, Exception):
+            results[row_number] = OfferBatchRowResult(row=row_number, error=f"Invalid row: {row}")
+            continue
+        try:
+            valid_rows.append((row_number, OfferCreate.model_validate(row)))
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            results[row_number] = OfferBatchRowResult(row=row_number, error=errors)
+    return results, valid_rows
+
+
+@router.post("/batch", response_model=OfferBatchResponse)
+async def create_offer_batch(
+    file: UploadFile = File(..., description="CSV or NDJSON file with one offer per row"),
+    upload_format: Optional[str] = Query(None, alias="format", description="csv or ndjson; detected from the file if omitted"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create many offers from a CSV or NDJSON upload
+    
+    Rows are validated with the OfferCreate schema. Properties and offers are
+    inserted in batched transactions and the offer letter PDFs are rendered
+    concurrently on the render pool (identical terms are rendered once).
+    Returns the batch job id with a result per row.
+    """
+    upload_format = (upload_format or detect_upload_format(file.filename, file.content_type) or "").lower()
+    if upload_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Upload must be a CSV or NDJSON file")
+    
+    # The upload is bounded, so read it whole and parse it off the event loop
+    data = await file.read(settings.OFFER_BATCH_MAX_BYTES + 1)
+    if len(data) > settings.OFFER_BATCH_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds the maximum of {settings.OFFER_BATCH_MAX_BYTES} bytes"
+        )
+    try:
+        rows = await run_in_threadpool(parse_offer_rows, data, upload_format, settings.OFFER_BATCH_MAX_ROWS)
+    except UploadFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(rows) > settings.OFFER_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds the maximum of {settings.OFFER_BATCH_MAX_ROWS} rows"
+        )
+    results, valid_rows = await run_in_threadpool(validate_offer_rows, rows)
+    
+    user = await get_placeholder_user(db)
+    job = OfferBatchJob(
+        user_id=user.id,
+        source_format=upload_format,
+        status=OfferBatchStatus.PROCESSING,
+        total_rows=len(results) + len(valid_rows),
+    )
+    db.add(job)
+    
+    # Find or create all properties with one query and one insert batch
+    def property_key(item: OfferCreate) -> tuple:
+        return (item.address, item.city, item.state, item.zip_code, item.property_type)
+    
+    keys = {property_key(item) for _, item in valid_rows}
+    properties: dict[tuple, Property] = {}
+    if keys:
+        result = await db.execute(
+            select(Property).where(
+                tuple_(
+                    Property.address,
+                    Property.city,
+                    Property.state,
+                    Property.zip_code,
+                    Property.property_type,
+                ).in_(list(keys))
+            )
+        )
+        for property_obj in result.scalars():
+            properties.setdefault(
+                (property_obj.address, property_obj.city, property_obj.state,
+                 property_obj.zip_code, property_obj.property_type),
+                property_obj,
+            )
+    for key in keys - properties.keys():
+        address, city, state, zip_code, property_type = key
+        properties[key] = Property(
+            address=address,
+            city=city,
+            state=state,
+            zip_code=zip_code,
+            property_type=property_type,
+        )
+        db.add(properties[key])
+    await db.flush()
+    
+    # Insert every offer in the same transaction
+    offers: list[tuple[int, Offer, Property]] = []
+    for row_number, item in valid_rows:
+        property_obj = properties[property_key(item)]
+        offer = Offer(
+            user_id=user.id,
+            property_id=property_obj.id,
+            financing_type=item.financing_type,
+            offer_price=item.offer_price,
+            contingencies=item.contingencies,
+            timeline_preferences=item.timeline_preferences,
+            concessions=item.concessions,
+            additional_notes=item.additional_notes,
+            status=OfferStatus.GENERATED,
+            offer_letter_preview=None,
+        )
+        db.add(offer)
+        offers.append((row_number, offer, property_obj))
+    await db.commit()
+    
+    # Render all offer letters concurrently (in lazy mode on first access instead)
+    if offers and settings.OFFER_LETTER_RENDER_MODE != "lazy":
+        documents = await acquire_offer_documents(db, [
+            (build_offer_data(offer, property_obj, user), property_obj.property_type)
+            for _, offer, property_obj in offers
+        ])
+        for (row_number, offer, _), document in zip(offers, documents):
+            if isinstance(document, Exception):
+                print(f"Error generating PDF offer letter for batch row {row_number}: {document}")
+                continue
+            offer.offer_letter_url = f"/offers/{document.file_name}"
+        if any(isinstance(document, RenderQueueFullError) for document in documents):
+            await reject_busy_renderer(db, job, *(offer for _, offer, _ in offers))
+        await db.commit()
+    
+    for row_number, offer, property_obj in offers:
+        try:
+            await send_offer_notification(OfferNotificationData(
+                offer_id=offer.id,
+                property_address=property_obj.address,
+                offer_price=offer.offer_price,
+                financing_type=offer.financing_type,
+                buyer_email=user.email,
+            ))
+            offer.notification_sent = True
+            offer.notification_sent_at = datetime.utcnow()
+        except Exception as e:
+            print(f"Failed to send email notification: {e}")
+        results[row_number] = OfferBatchRowResult(
+            row=row_number,
+            offer_id=offer.id,
+            offer_letter_url=offer.offer_letter_url,
+        )
+    
+    ordered = [results[row_number] for row_number in sorted(results)]
+    job.succeeded_rows = len(offers)
+    job.failed_rows = len(ordered) - len(offers)
+    job.results = [r.model_dump() for r in ordered]
+    job.status = OfferBatchStatus.COMPLETED
+    job.completed_at = datetime.utcnow()
+    await db.commit()
+    
+    return _batch_response(job)
+
+
+@router.get("/batch/{job_id}", response_model=OfferBatchResponse)
+async def get_offer_batch(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a bulk offer upload job and its per-row results"""
+    job = await db.get(OfferBatchJob, job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    
+    return _batch_response(job)
+
+
+def _batch_response(job: OfferBatchJob) -> OfferBatchResponse:
+    return OfferBatchResponse(
+        job_id=job.id,
+        status=job.status,
+        total_rows=job.total_rows,
+        succeeded_rows=job.succeeded_rows,
+        failed_rows=job.failed_rows,
+        results=[OfferBatchRowResult.model_validate(r) for r in job.results or []],
+    )
+
+
 @router.get("/{offer_id}", response_model=OfferWithProperty)
 async def get_offer(
     offer_id: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get offer by ID with property details"""
+    """
+    Get offer by ID with property details
+    
+    In lazy render mode an offer letter that isn't on disk is not rendered
+    here; its URL points at the letter route, which renders it once the
+    PDF itself is fetched.
+    """
     result = await db.execute(
         select(Offer)
         .options(selectinload(Offer.property))
@@ -180,26 +517,31 @@ async def get_offer(
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
     
+    if settings.OFFER_LETTER_RENDER_MODE == "lazy" and not (
+        offer.offer_letter_url
+        and offer.offer_letter_url.startswith('/offers/')
+        and os.path.exists(os.path.join(settings.OFFERS_DIR, os.path.basename(offer.offer_letter_url)))
+    ):
+        response = OfferWithProperty.model_validate(offer, from_attributes=True)
+        return response.model_copy(update={"offer_letter_url": f"/api/offer/{offer_id}/letter"})
+    
     return offer
 
 
-@router.get("/{offer_id}/download")
-async def download_offer(
+@router.get("/{offer_id}/letter")
+async def get_offer_letter(
     offer_id: str,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Download the offer letter PDF
+    Redirect to the offer letter PDF shown in the preview
     
-    Requires payment to be completed for SINGLE_DOWNLOAD or SINGLE_DOWNLOAD_WITH_REVIEW.
+    In lazy render mode the letter is rendered here on first access, or
+    again after it was evicted.
     """
-    # Get offer with payments
     result = await db.execute(
         select(Offer)
-        .options(
-            selectinload(Offer.property),
-            selectinload(Offer.payments)
-        )
+        .options(selectinload(Offer.property), selectinload(Offer.user))
         .where(Offer.id == offer_id)
     )
     offer = result.scalar_one_or_none()
@@ -207,17 +549,66 @@ async def download_offer(
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
     
-    # Check if user has paid for download
-    has_paid_download = any(
-        payment.status == PaymentStatus.COMPLETED and
-        payment.payment_type in [PaymentType.SINGLE_DOWNLOAD, PaymentType.SINGLE_DOWNLOAD_WITH_REVIEW]
-        for payment in offer.payments
+    try:
+        await ensure_offer_letter(db, offer)
+    except RenderQueueFullError:
+        raise HTTPException(status_code=503, detail="Offer letter rendering is busy", headers={"Retry-After": "5"})
+    except Exception as e:
+        print(f"Error generating PDF offer letter: {e}")
+    
+    if not offer.offer_letter_url:
+        raise HTTPException(status_code=404, detail="Offer letter not yet available")
+    
+    from fastapi.responses import RedirectResponse
+    return RedirectResponse(url=offer.offer_letter_url)
+
+
+@router.get("/{offer_id}/download")
+async def download_offer(
+    offer_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download the offer letter PDF
+    
+    Requires payment to be completed for SINGLE_DOWNLOAD or SINGLE_DOWNLOAD_WITH_REVIEW.
+    PDFs are served with a strong ETag and support If-None-Match and Range requests,
+    or handed to the front proxy when OFFER_DOWNLOAD_MODE offloads downloads.
+    """
+    query = select(Offer).where(Offer.id == offer_id)
+    if settings.OFFER_LETTER_RENDER_MODE == "lazy":
+        # The letter may have to be rendered here, which needs the property and buyer
+        query = query.options(selectinload(Offer.property), selectinload(Offer.user))
+    result = await db.execute(query)
+    offer = result.scalar_one_or_none()
+    
+    if not offer:
+        raise HTTPException(status_code=404, detail="Offer not found")
+    
+    # Check if user has paid for download without loading the payment history
+    has_paid_download = await db.scalar(
+        select(
+            exists().where(
+                Payment.offer_id == offer_id,
+                Payment.status == PaymentStatus.COMPLETED,
+                Payment.payment_type.in_([PaymentType.SINGLE_DOWNLOAD, PaymentType.SINGLE_DOWNLOAD_WITH_REVIEW]),
+            )
+        )
     )
     # TODO: Also check for active subscription
     
     if not has_paid_download:
         raise HTTPException(status_code=403, detail="Payment required to download")
     
+    # Render on first download when offer letters are generated lazily
+    try:
+        await ensure_offer_letter(db, offer)
+    except RenderQueueFullError:
+        raise HTTPException(status_code=503, detail="Offer letter rendering is busy", headers={"Retry-After": "5"})
+    except Exception as e:
+        print(f"Error generating PDF offer letter: {e}")
+    
     # Check if offer letter is available
     if not offer.offer_letter_url and not offer.offer_letter_preview:
         raise HTTPException(status_code=404, detail="Offer letter not yet available")
@@ -231,10 +622,19 @@ async def download_offer(
             if not os.path.exists(pdf_path):
                 raise HTTPException(status_code=404, detail="PDF file not found")
             
-            return FileResponse(
-                path=pdf_path,
+            if settings.OFFER_DOWNLOAD_MODE != "direct":
+                return offload_file_response(
+                    settings.OFFER_DOWNLOAD_MODE,
+                    pdf_path,
+                    media_type="application/pdf",
+                    filename=f"offer-letter-{offer_id}.pdf",
+                    internal_location=settings.OFFER_DOWNLOAD_INTERNAL_LOCATION,
+                )
+            return conditional_file_response(
+                request,
+                pdf_path,
                 media_type="application/pdf",
-                filename=f"offer-letter-{offer_id}.pdf"
+                filename=f"offer-letter-{offer_id}.pdf",
             )
         else:
             # External URL - redirect
@@ -1,131 +1,201 @@
 """
 Property API routes
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database import get_db
+import time
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, update
+from app.config import settings
+from app.database import get_db, get_session_maker
 from app.models.property import Property
+from app.models.extraction_job import ExtractionJob, ExtractionJobStatus
 from app.schemas.property import (
+    ExtractionJobResponse,
+    PropertyBulkExtractRequest,
+    PropertyBulkExtractResult,
     PropertyExtractRequest,
     PropertyExtractResponse,
+    PropertyRefreshResponse,
     PropertyResponse,
 )
-from app.utils.property_extractor import extract_property_from_url, get_source_type
+from app.services.extraction_cache import extract_property_cached
+from app.services.extraction_jobs import TERMINAL_STATUSES, extraction_jobs
+from app.services.bulk_extraction import iter_bulk_extractions
+from app.services.property_refresh import refresh_property
+from app.services.property_lookup import find_property_by_url, save_extracted_property
+from app.utils.llm_client import LLMTimeoutError, LLMUnavailableError
+from app.utils.disconnect import ClientDisconnected, cancel_on_disconnect
 
 router = APIRouter()
 
+# Property views closer together than this are recorded once
+VIEW_RECORD_INTERVAL = timedelta(minutes=5)
+
 
 @router.post("/extract", response_model=PropertyExtractResponse)
 async def extract_property(
     request: PropertyExtractRequest,
-    db: AsyncSession = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    session_maker: async_sessionmaker = Depends(get_session_maker)
 ):
     """
     Extract property information from a URL using LLM
     
-    If the property already exists (by URL or address), returns the existing property.
+    If the property already exists (by listing id, URL or address), returns the existing property.
     Otherwise, extracts data from the URL and creates a new property.
+    The extraction is cancelled if the client disconnects before it finishes.
     """
     url = request.url
     
     if not url:
         raise HTTPException(status_code=400, detail="URL is required")
     
-    # Determine source type
-    source_type = get_source_type(url)
-    
-    # First, check if property with this URL already exists
-    result = await db.execute(
-        select(Property).where(Property.source_url == url)
-    )
-    property_obj = result.scalar_one_or_none()
+    # First, check if this listing already exists under any of its URLs
+    property_obj = await find_property_by_url(db, url)
     
     if property_obj:
         # Property already exists, return it
         return PropertyExtractResponse(property_id=property_obj.id)
     
-    # Extract property data using LLM
+    # Extract property data (from the extraction cache when still fresh). It
+    # runs on its own session: a disconnect can cancel it mid-flush or
+    # mid-commit, which must not leave the request's session half-finished.
+    async def extract():
+        async with session_maker() as session:
+            return await extract_property_cached(session, url)
+    
     try:
-        extracted_data = await extract_property_from_url(url)
+        extracted_data = await cancel_on_disconnect(http_request, extract())
+    except ClientDisconnected:
+        # Nobody is waiting for the answer (499 is nginx's "client closed request")
+        return Response(status_code=499)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-    # Check if a property with the same address already exists
-    result = await db.execute(
-        select(Property).where(
-            Property.address == extracted_data.address,
-            Property.city == extracted_data.city,
-            Property.state == extracted_data.state,
-            Property.zip_code == extracted_data.zip_code,
-        )
-    )
-    existing_property = result.scalar_one_or_none()
-    
-    if existing_property:
-        # Update the existing property with the new source URL if different
-        if existing_property.source_url != url:
-            existing_property.source_url = url
-            existing_property.source_type = source_type
-            existing_property.price = existing_property.price or extracted_data.price
-            existing_property.ai_fair_value = existing_property.ai_fair_value or extracted_data.ai_fair_value
-            existing_property.days_on_market = existing_property.days_on_market or extracted_data.days_on_market
-            existing_property.property_type = existing_property.property_type or extracted_data.property_type or "singlefamily"
-            existing_property.mls_number = existing_property.mls_number or extracted_data.mls_number
-            existing_property.listing_agent_name = existing_property.listing_agent_name or extracted_data.listing_agent_name
-            existing_property.listing_agent_email = existing_property.listing_agent_email or extracted_data.listing_agent_email
-            existing_property.listing_agent_phone = existing_property.listing_agent_phone or extracted_data.listing_agent_phone
-            existing_property.offer_deadline = existing_property.offer_deadline or extracted_data.offer_deadline
-            existing_property.has_hoa = existing_property.has_hoa if existing_property.has_hoa is not None else extracted_data.has_hoa
-            existing_property.built_before_1978 = existing_property.built_before_1978 if existing_property.built_before_1978 is not None else extracted_data.built_before_1978
-            
-            # Merge extracted data
-            current_data = existing_property.extracted_data or {}
-            current_data.update({
-                'bedrooms': extracted_data.bedrooms,
-                'bathrooms': extracted_data.bathrooms,
-                'square_feet': extracted_data.square_feet,
-                'lot_size': extracted_data.lot_size,
-                'year_built': extracted_data.year_built,
-            })
-            existing_property.extracted_data = current_data
-            
-            await db.commit()
-        
-        property_obj = existing_property
-    else:
-        # Create new property with extracted data
-        property_obj = Property(
-            source_url=url,
-            source_type=source_type,
-            address=extracted_data.address,
-            city=extracted_data.city,
-            state=extracted_data.state,
-            zip_code=extracted_data.zip_code,
-            price=extracted_data.price,
-            ai_fair_value=extracted_data.ai_fair_value,
-            days_on_market=extracted_data.days_on_market,
-            property_type=extracted_data.property_type or "singlefamily",
-            mls_number=extracted_data.mls_number,
-            listing_agent_name=extracted_data.listing_agent_name,
-            listing_agent_email=extracted_data.listing_agent_email,
-            listing_agent_phone=extracted_data.listing_agent_phone,
-            offer_deadline=extracted_data.offer_deadline,
-            has_hoa=extracted_data.has_hoa,
-            built_before_1978=extracted_data.built_before_1978,
-            extracted_data={
-                'bedrooms': extracted_data.bedrooms,
-                'bathrooms': extracted_data.bathrooms,
-                'square_feet': extracted_data.square_feet,
-                'lot_size': extracted_data.lot_size,
-                'year_built': extracted_data.year_built,
-            },
+    property_obj = await save_extracted_property(db, url, extracted_data)
+    
+    return PropertyExtractResponse(property_id=property_obj.id)
+
+
+@router.post("/extract/bulk")
+async def extract_properties_bulk(
+    request: PropertyBulkExtractRequest,
+    session_maker: async_sessionmaker = Depends(get_session_maker)
+):
+    """
+    Extract many listing URLs, streaming one NDJSON line per URL as it finishes
+    
+    URLs of listings that already exist are answered first without extracting;
+    duplicates of the same listing are extracted once. Extractions run with
+    global and per-site concurrency limits. Each line carries the URL's index
+    in the request so results can be matched up in any order.
+    """
+    if len(request.urls) > settings.BULK_EXTRACT_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bulk extraction accepts at most {settings.BULK_EXTRACT_MAX_URLS} URLs"
         )
-        db.add(property_obj)
+    
+    async def ndjson_lines():
+        async for result in iter_bulk_extractions(request.urls, session_maker):
+            line = PropertyBulkExtractResult(**result).model_dump_json(by_alias=True)
+            yield line + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.post("/extract/jobs", response_model=ExtractionJobResponse, status_code=202)
+async def create_extraction_job(
+    request: PropertyExtractRequest,
+    http_request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Queue a property extraction and return its job right away
+    
+    The extraction runs on the worker pool; poll the job (or long-poll with
+    ?wait=seconds) for the property id. A listing that already exists gets a
+    job that is DONE from the start.
+    """
+    url = request.url
+    
+    if not url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    
+    property_obj = await find_property_by_url(db, url)
+    if property_obj is None:
+        if not extraction_jobs.started:
+            raise HTTPException(status_code=503, detail="Extraction workers are not running")
+        if extraction_jobs.full():
+            raise HTTPException(status_code=503, detail="Extraction queue is full", headers={"Retry-After": "5"})
+    
+    job = ExtractionJob(url=url, status=ExtractionJobStatus.QUEUED)
+    if property_obj is not None:
+        job.status = ExtractionJobStatus.DONE
+        job.property_id = property_obj.id
+        job.completed_at = datetime.utcnow()
+    db.add(job)
+    await db.commit()
+    
+    if job.status == ExtractionJobStatus.QUEUED and not extraction_jobs.submit(job.id):
+        # The queue filled up since the check above
+        job.status = ExtractionJobStatus.FAILED
+        job.error = "Extraction queue is full"
+        job.completed_at = datetime.utcnow()
         await db.commit()
-        await db.refresh(property_obj)
     
-    return PropertyExtractResponse(property_id=property_obj.id)
+    response.headers["Location"] = str(http_request.url_for("get_extraction_job", job_id=job.id))
+    return _job_response(job)
+
+
+@router.get("/extract/jobs/{job_id}", response_model=ExtractionJobResponse)
+async def get_extraction_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish (long-poll)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a job-mode property extraction
+    
+    With wait > 0 the response is held until the job is DONE or FAILED, or
+    until wait seconds (at most EXTRACTION_JOB_MAX_WAIT_SECONDS) have passed.
+    """
+    deadline = time.monotonic() + min(wait, settings.EXTRACTION_JOB_MAX_WAIT_SECONDS)
+    while True:
+        job = await db.get(ExtractionJob, job_id, populate_existing=True)
+        # Don't hold a read transaction open while waiting
+        await db.commit()
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Extraction job not found")
+        
+        remaining = deadline - time.monotonic()
+        if job.status in TERMINAL_STATUSES or remaining <= 0:
+            return _job_response(job)
+        # Woken early when a job of this process finishes; jobs run by other
+        # processes are seen on the next poll
+        await extraction_jobs.wait_for_change(min(remaining, settings.EXTRACTION_JOB_POLL_SECONDS))
+
+
+def _job_response(job: ExtractionJob) -> ExtractionJobResponse:
+    return ExtractionJobResponse(
+        job_id=job.id,
+        status=job.status,
+        url=job.url,
+        property_id=job.property_id,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at,
+    )
 
 
 @router.get("/{property_id}", response_model=PropertyResponse)
@@ -142,4 +212,50 @@ async def get_property(
     if not property_obj:
         raise HTTPException(status_code=404, detail="Property not found")
     
+    # Recent views make the property a candidate for background refreshes;
+    # record them at most every few minutes, without touching updated_at
+    now = datetime.utcnow()
+    if property_obj.last_viewed_at is None or now - property_obj.last_viewed_at > VIEW_RECORD_INTERVAL:
+        await db.execute(
+            update(Property)
+            .where(Property.id == property_id)
+            .values(last_viewed_at=now, updated_at=Property.updated_at)
+        )
+        await db.commit()
+    
     return property_obj
+
+
+@router.post("/{property_id}/refresh", response_model=PropertyRefreshResponse)
+async def refresh_property_from_listing(
+    property_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Re-read a property's listing page and update its volatile fields
+    
+    The page is fetched conditionally; the LLM is only called when the page
+    changed (outcome UPDATED), not on a 304 (NOT_MODIFIED) or when its text
+    is the same as last time (UNCHANGED).
+    """
+    property_obj = await db.get(Property, property_id)
+    
+    if not property_obj:
+        raise HTTPException(status_code=404, detail="Property not found")
+    if not property_obj.source_url:
+        raise HTTPException(status_code=400, detail="Property has no source URL to refresh from")
+    
+    try:
+        outcome = await refresh_property(db, property_obj)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return PropertyRefreshResponse(
+        property_id=property_obj.id,
+        outcome=outcome.value,
+        checked_at=property_obj.page_checked_at,
+    )
@@ -31,6 +31,32 @@ class Settings(BaseSettings):
     # Google AI API key for property extraction
     GOOGLE_AI_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
+    LLM_MODEL: str = "gemini-1.5-flash"
+    # LLM backend: "gemini", or "standin" for the local stand-in server
+    # (python -m benchmarks.llm_standin). A cassette "record"s every response
+    # to LLM_CASSETTE_PATH, or "replay"s them without calling the backend
+    LLM_BACKEND: str = "gemini"
+    LLM_STANDIN_URL: str = "http://127.0.0.1:8090"
+    LLM_CASSETTE_MODE: str = "off"
+    LLM_CASSETTE_PATH: str = os.path.join(BACKEND_DIR, "cassettes", "llm.jsonl")
+    # Per-call timeout and maximum concurrent LLM calls per process
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_CONCURRENCY: int = 4
+    # Page text read from a listing, and the part of it (most listing-relevant
+    # first) sent to the LLM, in estimated tokens
+    LLM_PAGE_TEXT_MAX_CHARS: int = 200000
+    LLM_PROMPT_TOKEN_BUDGET: int = 6000
+    # Circuit breaker: over the calls of the last window (at least min calls),
+    # open when the failure ratio or the ratio of calls slower than the slow
+    # threshold is reached, and stay open before probing again
+    LLM_BREAKER_WINDOW_SECONDS: float = 60.0
+    LLM_BREAKER_MIN_CALLS: int = 5
+    LLM_BREAKER_FAILURE_RATIO: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 20.0
+    LLM_BREAKER_SLOW_CALL_RATIO: float = 0.8
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0
+    # Time one extraction may spend fetching the page and calling the LLM
+    EXTRACTION_DEADLINE_SECONDS: float = 45.0
     
     # Stripe
     STRIPE_SECRET_KEY: Optional[str] = None
@@ -45,6 +71,82 @@ class Settings(BaseSettings):
     # Offers directory for generated PDFs
     OFFERS_DIR: str = os.path.join(BACKEND_DIR, "offers")
     
+    # Number of parsed PDF templates kept in memory (LRU)
+    TEMPLATE_CACHE_MAX_ENTRIES: int = 8
+    
+    # PDF rendering: "process" runs on a worker pool, "inline" in the request
+    PDF_RENDER_MODE: str = "process"
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_MAX_QUEUE: int = 32
+    
+    # PDF output: "full" re-serializes the template, "incremental" appends
+    # only the filled fields to the original template bytes
+    PDF_OUTPUT_MODE: str = "full"
+    
+    # Offer letters: "eager" renders on creation, "lazy" when the PDF is first
+    # fetched (preview letter or download), keeping rendered PDFs within a byte budget
+    OFFER_LETTER_RENDER_MODE: str = "eager"
+    OFFER_LETTER_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    
+    # Maximum rows and size accepted by the bulk offer upload endpoint
+    OFFER_BATCH_MAX_ROWS: int = 500
+    OFFER_BATCH_MAX_BYTES: int = 2 * 1024 * 1024
+    
+    # Paid downloads: "direct" streams the PDF from the app, "x-accel-redirect"
+    # (nginx) or "x-sendfile" (Apache/lighttpd) hand the file to the proxy
+    OFFER_DOWNLOAD_MODE: str = "direct"
+    # Internal nginx location aliased to OFFERS_DIR, used with x-accel-redirect
+    OFFER_DOWNLOAD_INTERNAL_LOCATION: str = "/internal/offers"
+    
+    # Shared HTTP client for listing page fetches
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 50
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST: int = 6
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CLIENT_HTTP2: bool = True
+    # Per-host rate limit (requests per second, burst size), and retries of
+    # throttled (403/429/503) or failed fetches with jittered exponential
+    # back-off; longer Retry-After waits than the maximum are not retried
+    HTTP_CLIENT_RATE_PER_HOST: float = 2.0
+    HTTP_CLIENT_BURST_PER_HOST: int = 5
+    HTTP_CLIENT_MAX_RETRIES: int = 3
+    HTTP_CLIENT_BACKOFF_BASE_SECONDS: float = 0.5
+    HTTP_CLIENT_BACKOFF_MAX_SECONDS: float = 30.0
+    HTTP_CLIENT_MAX_RETRY_AFTER_SECONDS: float = 60.0
+    # Hosts whose rate limiter and counters are kept; idle ones beyond it are dropped
+    HTTP_CLIENT_MAX_TRACKED_HOSTS: int = 1024
+    
+    # Extraction result cache: memory LRU size, and how long static facts
+    # (address, size) and volatile fields (price, days on market) stay valid
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 1024
+    EXTRACTION_CACHE_STATIC_TTL_SECONDS: int = 30 * 24 * 3600
+    EXTRACTION_CACHE_VOLATILE_TTL_SECONDS: int = 6 * 3600
+    # Lease taken by the worker extracting a listing; others wait up to this
+    # long for its result before taking over
+    EXTRACTION_LEASE_SECONDS: int = 120
+    EXTRACTION_LEASE_POLL_SECONDS: float = 0.5
+    # Job-mode extraction: worker pool size, queue bound, and the longest a
+    # status request may long-poll (re-reading the job every poll interval)
+    EXTRACTION_JOB_WORKERS: int = 4
+    EXTRACTION_JOB_QUEUE_SIZE: int = 500
+    EXTRACTION_JOB_MAX_WAIT_SECONDS: float = 30.0
+    EXTRACTION_JOB_POLL_SECONDS: float = 1.0
+    # Bulk extraction: URLs per request, and concurrent extractions per
+    # request overall and per listing site
+    BULK_EXTRACT_MAX_URLS: int = 500
+    BULK_EXTRACT_CONCURRENCY: int = 8
+    BULK_EXTRACT_PER_DOMAIN_CONCURRENCY: int = 2
+    # Background refresh of volatile fields for properties with open offers
+    # or views within the window, once stale; at most REFRESH_MAX_PER_HOUR
+    # listing checks, each with a small prompt
+    REFRESH_ENABLED: bool = True
+    REFRESH_INTERVAL_SECONDS: float = 300.0
+    REFRESH_BATCH_SIZE: int = 20
+    REFRESH_MAX_PER_HOUR: int = 120
+    REFRESH_STALE_AFTER_SECONDS: int = 6 * 3600
+    REFRESH_VIEW_WINDOW_SECONDS: int = 7 * 24 * 3600
+    REFRESH_PROMPT_TOKEN_BUDGET: int = 1500
+    
     @property
     def ai_api_key(self) -> Optional[str]:
         """Get the Google AI API key from either environment variable"""
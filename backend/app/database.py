@@ -1,6 +1,7 @@
 """
 Database configuration and session management
 """
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
@@ -41,10 +42,37 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def get_session_maker() -> async_sessionmaker:
+    """Dependency for routes that open their own sessions (e.g. one per concurrent task)"""
+    return async_session_maker
+
+
+def add_missing_columns(sync_conn) -> None:
+    """
+    Add model columns missing from existing tables
+
+    create_all only creates missing tables, so columns added to a model later
+    are added here (they must be nullable), along with their indexes.
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        for column in missing:
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        if missing:
+            for index in table.indexes:
+                index.create(sync_conn, checkfirst=True)
+
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
 
 
 async def close_db():
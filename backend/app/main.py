@@ -6,12 +6,22 @@ Main application entry point
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
 
 from app.config import settings
-from app.database import init_db, close_db
+from app.database import init_db, close_db, async_session_maker
 from app.api import api_router
+from app.utils.template_cache import template_cache
+from app.utils.pdf_renderer import render_pool
+from app.utils.pdf_generator import warm_template_cache
+from app.utils.http_cache import ImmutableStaticFiles
+from app.utils.circuit_breaker import CircuitState
+from app.utils.http_client import http_client
+from app.utils.llm_client import llm_client
+from app.services.extraction_cache import extraction_cache
+from app.services.property_lookup import backfill_listing_keys
+from app.services.extraction_jobs import extraction_jobs
+from app.services.refresh_scheduler import property_refresher
 
 # Create offers directory at import time to ensure it exists before mounting
 os.makedirs(settings.OFFERS_DIR, exist_ok=True)
@@ -24,13 +34,46 @@ async def lifespan(app: FastAPI):
     print("Starting up...")
     await init_db()
     
+    # Index listings stored before properties carried a listing key
+    async with async_session_maker() as session:
+        backfilled = await backfill_listing_keys(session)
+    if backfilled:
+        print(f"Backfilled listing keys for {backfilled} properties")
+    
+    # Workers for job-mode extractions (resumes jobs queued before a restart)
+    await extraction_jobs.start()
+    
     # Ensure offers directory exists
     os.makedirs(settings.OFFERS_DIR, exist_ok=True)
     
+    # Start PDF render workers with the templates already parsed
+    if settings.PDF_RENDER_MODE == "process":
+        render_pool.start(initializer=warm_template_cache)
+    
+    # One pooled client for all listing fetches
+    http_client.start()
+    
+    # Configure the LLM client once instead of on every extraction (Gemini
+    # needs a key; the stand-in and cassette replay don't)
+    if settings.ai_api_key or settings.LLM_BACKEND != "gemini" or settings.LLM_CASSETTE_MODE == "replay":
+        try:
+            llm_client.configure()
+        except Exception as e:
+            print(f"Warning: LLM client not configured: {e}")
+    
+    # Keep prices and deadlines of properties in use current
+    if settings.REFRESH_ENABLED and llm_client.configured:
+        property_refresher.start()
+    
     yield
     
     # Shutdown
     print("Shutting down...")
+    await property_refresher.stop()
+    await extraction_jobs.stop()
+    render_pool.shutdown()
+    await http_client.close()
+    await llm_client.close()
     await close_db()
 
 
@@ -56,7 +99,7 @@ app.add_middleware(
 )
 
 # Mount static files for offer PDFs (directory is created above)
-app.mount("/offers", StaticFiles(directory=settings.OFFERS_DIR), name="offers")
+app.mount("/offers", ImmutableStaticFiles(directory=settings.OFFERS_DIR), name="offers")
 
 # Include API routes
 app.include_router(api_router, prefix="/api")
@@ -74,8 +117,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """Health check endpoint ("degraded" while the LLM circuit breaker isn't closed)"""
+    return {
+        "status": "healthy" if llm_client.breaker.state == CircuitState.CLOSED else "degraded",
+        "template_cache": template_cache.stats(),
+        "pdf_render_pool": render_pool.stats(),
+        "http_client": http_client.stats(),
+        "llm": llm_client.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "extraction_jobs": extraction_jobs.stats(),
+        "property_refresh": property_refresher.stats(),
+    }
 
 
 if __name__ == "__main__":
@@ -5,6 +5,11 @@ from app.models.user import User
 from app.models.subscription import Subscription, SubscriptionStatus
 from app.models.property import Property
 from app.models.offer import Offer, OfferStatus, AgentReviewStatus
+from app.models.offer_document import OfferDocument
+from app.models.offer_batch import OfferBatchJob, OfferBatchStatus
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.models.extraction_lease import ExtractionLease
+from app.models.extraction_job import ExtractionJob, ExtractionJobStatus
 from app.models.payment import Payment, PaymentStatus, PaymentType
 
 __all__ = [
@@ -15,6 +20,13 @@ __all__ = [
     "Offer",
     "OfferStatus",
     "AgentReviewStatus",
+    "OfferDocument",
+    "OfferBatchJob",
+    "OfferBatchStatus",
+    "ExtractionCacheEntry",
+    "ExtractionLease",
+    "ExtractionJob",
+    "ExtractionJobStatus",
     "Payment",
     "PaymentStatus",
     "PaymentType",
@@ -0,0 +1,49 @@
+"""
+Extraction cache model
+"""
+from datetime import datetime
+from typing import Any
+from sqlalchemy import String, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from cuid2 import cuid_wrapper
+from app.database import Base
+
+cuid_generator = cuid_wrapper()
+
+
+class ExtractionCacheEntry(Base):
+    """
+    Listing fields extracted from a URL, kept to skip repeat fetches and LLM calls
+    
+    fields holds the camelCase extraction result and field_fetched_at the Unix
+    time each field was last extracted, so static and volatile fields can
+    expire independently.
+    """
+    
+    __tablename__ = "extraction_cache"
+    
+    id: Mapped[str] = mapped_column(
+        String(25),
+        primary_key=True,
+        default=cuid_generator
+    )
+    cache_key: Mapped[str] = mapped_column(
+        String(2048),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    source_url: Mapped[str] = mapped_column(String(2048), nullable=False)
+    fields: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    field_fetched_at: Mapped[dict[str, float]] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False
+    )
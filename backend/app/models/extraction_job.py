@@ -0,0 +1,47 @@
+"""
+Extraction job model
+"""
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import String, DateTime, Text, Enum as SQLEnum
+from sqlalchemy.orm import Mapped, mapped_column
+from cuid2 import cuid_wrapper
+from app.database import Base
+
+cuid_generator = cuid_wrapper()
+
+
+class ExtractionJobStatus(str, Enum):
+    """Extraction job status enum"""
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class ExtractionJob(Base):
+    """Listing extraction requested in job mode, run by the extraction worker pool"""
+    
+    __tablename__ = "extraction_jobs"
+    
+    id: Mapped[str] = mapped_column(
+        String(25),
+        primary_key=True,
+        default=cuid_generator
+    )
+    url: Mapped[str] = mapped_column(String(2048), nullable=False)
+    status: Mapped[ExtractionJobStatus] = mapped_column(
+        SQLEnum(ExtractionJobStatus),
+        default=ExtractionJobStatus.QUEUED,
+        nullable=False,
+        index=True
+    )
+    property_id: Mapped[str | None] = mapped_column(String(25), nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
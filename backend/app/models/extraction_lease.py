@@ -0,0 +1,40 @@
+"""
+Extraction lease model
+"""
+from datetime import datetime
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from cuid2 import cuid_wrapper
+from app.database import Base
+
+cuid_generator = cuid_wrapper()
+
+
+class ExtractionLease(Base):
+    """
+    Claim by one worker process to extract a listing
+    
+    Workers that find an unexpired lease wait for the holder's result in the
+    extraction cache instead of fetching and calling the LLM themselves.
+    """
+    
+    __tablename__ = "extraction_leases"
+    
+    id: Mapped[str] = mapped_column(
+        String(25),
+        primary_key=True,
+        default=cuid_generator
+    )
+    cache_key: Mapped[str] = mapped_column(
+        String(2048),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    owner: Mapped[str] = mapped_column(String(100), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
@@ -0,0 +1,48 @@
+"""
+Offer batch job model
+"""
+from datetime import datetime
+from enum import Enum
+from typing import Any
+from sqlalchemy import String, DateTime, Integer, JSON, Enum as SQLEnum
+from sqlalchemy.orm import Mapped, mapped_column
+from cuid2 import cuid_wrapper
+from app.database import Base
+
+cuid_generator = cuid_wrapper()
+
+
+class OfferBatchStatus(str, Enum):
+    """Offer batch job status enum"""
+    PROCESSING = "PROCESSING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class OfferBatchJob(Base):
+    """Bulk offer upload (CSV/NDJSON) and its per-row results"""
+    
+    __tablename__ = "offer_batch_jobs"
+    
+    id: Mapped[str] = mapped_column(
+        String(25),
+        primary_key=True,
+        default=cuid_generator
+    )
+    user_id: Mapped[str | None] = mapped_column(String(25), nullable=True, index=True)
+    source_format: Mapped[str] = mapped_column(String(10), nullable=False)
+    status: Mapped[OfferBatchStatus] = mapped_column(
+        SQLEnum(OfferBatchStatus),
+        default=OfferBatchStatus.PROCESSING,
+        nullable=False
+    )
+    total_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    succeeded_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    results: Mapped[list[dict[str, Any]] | None] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,53 @@
+"""
+Offer document model
+"""
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from cuid2 import cuid_wrapper
+from app.database import Base
+
+cuid_generator = cuid_wrapper()
+
+
+class OfferDocument(Base):
+    """
+    Content-addressed offer letter PDF shared by every offer with identical terms
+    
+    ref_count tracks how many offers point at the file, so it is only removed
+    from OFFERS_DIR when the last one is deleted. In lazy render mode the
+    access and eviction times drive the byte budget of OFFERS_DIR; an evicted
+    file is rendered again on its next access.
+    """
+    
+    __tablename__ = "offer_documents"
+    
+    id: Mapped[str] = mapped_column(
+        String(25),
+        primary_key=True,
+        default=cuid_generator
+    )
+    content_hash: Mapped[str] = mapped_column(
+        String(64),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    file_name: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    template_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_accessed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
+    evicted_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False
+    )
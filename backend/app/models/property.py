@@ -30,6 +30,8 @@ class Property(Base):
         nullable=True,
         index=True
     )
+    # "source:listing id" (e.g. "zillow:12345"), shared by every URL of the listing
+    listing_key: Mapped[str | None] = mapped_column(String(100), nullable=True, index=True)
     source_type: Mapped[str | None] = mapped_column(String(50), nullable=True)
     mls_number: Mapped[str | None] = mapped_column(String(50), nullable=True, index=True)
     address: Mapped[str] = mapped_column(String(500), nullable=False)
@@ -47,6 +49,13 @@ class Property(Base):
     has_hoa: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     built_before_1978: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     extracted_data: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
+    # Validators of the last listing page fetch, for conditional refreshes
+    page_etag: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    page_last_modified: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    page_text_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    page_checked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Last time a buyer looked at the property, to prioritize refreshes
+    last_viewed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime,
         default=datetime.utcnow,
@@ -8,6 +8,10 @@ from app.schemas.property import (
     PropertyExtractRequest,
     PropertyExtractResponse,
     ExtractedPropertyData,
+    PropertyRefreshResponse,
+    PropertyBulkExtractRequest,
+    PropertyBulkExtractResult,
+    ExtractionJobResponse,
 )
 from app.schemas.offer import (
     OfferBase,
@@ -17,6 +21,11 @@ from app.schemas.offer import (
     ContingenciesSchema,
     TimelinePreferencesSchema,
     ConcessionsSchema,
+    OfferBatchRowResult,
+    OfferBatchResponse,
+    OfferVariant,
+    OfferVariantsCreate,
+    OfferVariantsCreateResponse,
 )
 from app.schemas.payment import (
     PaymentBase,
@@ -40,6 +49,10 @@ __all__ = [
     "PropertyExtractRequest",
     "PropertyExtractResponse",
     "ExtractedPropertyData",
+    "PropertyRefreshResponse",
+    "PropertyBulkExtractRequest",
+    "PropertyBulkExtractResult",
+    "ExtractionJobResponse",
     # Offer
     "OfferBase",
     "OfferCreate",
@@ -48,6 +61,11 @@ __all__ = [
     "ContingenciesSchema",
     "TimelinePreferencesSchema",
     "ConcessionsSchema",
+    "OfferBatchRowResult",
+    "OfferBatchResponse",
+    "OfferVariant",
+    "OfferVariantsCreate",
+    "OfferVariantsCreateResponse",
     # Payment
     "PaymentBase",
     "PaymentCreate",
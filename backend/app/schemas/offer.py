@@ -2,9 +2,10 @@
 Offer schemas
 """
 from datetime import datetime
-from typing import Optional, Any
+from typing import Optional, Any, List
 from pydantic import BaseModel, ConfigDict, Field
 from app.models.offer import OfferStatus, AgentReviewStatus
+from app.models.offer_batch import OfferBatchStatus
 from app.schemas.property import PropertyResponse
 
 
@@ -63,6 +64,18 @@ class OfferCreate(OfferBase):
     pass
 
 
+class OfferVariant(CamelCaseModel):
+    """Overrides for one variant of an offer; unset fields keep the base value"""
+    offer_price: Optional[float] = Field(None, alias="offerPrice")
+    seller_credits: Optional[float] = Field(None, alias="sellerCredits")
+    closing_date: Optional[str] = Field(None, alias="closingDate")
+
+
+class OfferVariantsCreate(OfferBase):
+    """Offer creation schema with a list of price/credit/closing date variants"""
+    variants: List[OfferVariant] = Field(..., min_length=1, max_length=10)
+
+
 class OfferResponse(CamelCaseModel):
     """Offer response schema"""
     id: str
@@ -97,3 +110,32 @@ class OfferCreateResponse(BaseModel):
     offer_id: str = Field(..., serialization_alias="offerId")
     
     model_config = ConfigDict(populate_by_name=True)
+
+
+class OfferVariantsCreateResponse(BaseModel):
+    """Response for variant offer creation, one offer id per variant in order"""
+    offer_ids: List[str] = Field(..., serialization_alias="offerIds")
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class OfferBatchRowResult(BaseModel):
+    """Outcome of one row of a bulk offer upload"""
+    row: int
+    offer_id: Optional[str] = Field(None, serialization_alias="offerId")
+    offer_letter_url: Optional[str] = Field(None, serialization_alias="offerLetterUrl")
+    error: Optional[str] = None
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class OfferBatchResponse(BaseModel):
+    """Response for a bulk offer upload"""
+    job_id: str = Field(..., serialization_alias="jobId")
+    status: OfferBatchStatus
+    total_rows: int = Field(..., serialization_alias="totalRows")
+    succeeded_rows: int = Field(..., serialization_alias="succeededRows")
+    failed_rows: int = Field(..., serialization_alias="failedRows")
+    results: List[OfferBatchRowResult] = []
+    
+    model_config = ConfigDict(populate_by_name=True)
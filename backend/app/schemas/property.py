@@ -2,8 +2,9 @@
 Property schemas
 """
 from datetime import datetime
-from typing import Optional, Any
+from typing import Optional, Any, List
 from pydantic import BaseModel, ConfigDict, Field
+from app.models.extraction_job import ExtractionJobStatus
 
 
 def to_camel(string: str) -> str:
@@ -89,3 +90,42 @@ class PropertyExtractResponse(BaseModel):
     property_id: str = Field(..., serialization_alias="propertyId")
     
     model_config = ConfigDict(populate_by_name=True)
+
+
+class PropertyRefreshResponse(BaseModel):
+    """Response schema for a property refresh"""
+    property_id: str = Field(..., serialization_alias="propertyId")
+    outcome: str
+    checked_at: Optional[datetime] = Field(None, serialization_alias="checkedAt")
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class PropertyBulkExtractRequest(BaseModel):
+    """Request schema for bulk property extraction"""
+    urls: List[str]
+
+
+class PropertyBulkExtractResult(BaseModel):
+    """One NDJSON line of a bulk property extraction"""
+    index: int
+    url: str
+    status: str
+    property_id: Optional[str] = Field(None, serialization_alias="propertyId")
+    error: Optional[str] = None
+    
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class ExtractionJobResponse(BaseModel):
+    """Status of a job-mode property extraction"""
+    job_id: str = Field(..., serialization_alias="jobId")
+    status: ExtractionJobStatus
+    url: str
+    property_id: Optional[str] = Field(None, serialization_alias="propertyId")
+    error: Optional[str] = None
+    created_at: datetime = Field(..., serialization_alias="createdAt")
+    started_at: Optional[datetime] = Field(None, serialization_alias="startedAt")
+    completed_at: Optional[datetime] = Field(None, serialization_alias="completedAt")
+    
+    model_config = ConfigDict(populate_by_name=True)
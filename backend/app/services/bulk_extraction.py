@@ -0,0 +1,93 @@
+"""
+Bulk listing extraction
+
+URLs are deduplicated by listing key (or canonical URL) and matched against
+existing properties with a couple of queries; the rest are extracted
+concurrently, at most BULK_EXTRACT_CONCURRENCY at a time overall and
+BULK_EXTRACT_PER_DOMAIN_CONCURRENCY per listing site, so one site isn't hit
+with the whole batch at once. Results are yielded as each listing finishes.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.config import settings
+from app.services.extraction_cache import extract_property_cached
+from app.services.property_lookup import find_properties_by_urls, save_extracted_property
+from app.utils.listing_url import listing_cache_key
+
+
+def listing_domain(url: str) -> str:
+    """Site a listing URL belongs to ("zillow.com" for www., m. and other subdomains)"""
+    host = (urlsplit(url.strip()).hostname or "").lower()
+    return ".".join(host.split(".")[-2:])
+
+
+async def iter_bulk_extractions(
+    urls: List[str],
+    session_maker: async_sessionmaker,
+    concurrency: Optional[int] = None,
+    per_domain_concurrency: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Extract many listings, yielding one result per input URL as it is ready
+
+    Each result has the URL's index in the request, the URL, a status
+    ("existing", "extracted" or "failed"), the property id and the error.
+    URLs of the same listing are extracted once and share the result.
+    """
+    global_limit = asyncio.Semaphore(concurrency or settings.BULK_EXTRACT_CONCURRENCY)
+    domain_limits: Dict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(per_domain_concurrency or settings.BULK_EXTRACT_PER_DOMAIN_CONCURRENCY)
+    )
+
+    # Input indexes of each listing, keyed by the URL that will be extracted
+    groups: Dict[str, List[int]] = {}
+    first_url: Dict[str, str] = {}
+    for index, url in enumerate(urls):
+        url = url.strip()
+        if not url:
+            yield _result(index, url, "failed", error="URL is required")
+            continue
+        leader = first_url.setdefault(listing_cache_key(url), url)
+        groups.setdefault(leader, []).append(index)
+
+    async with session_maker() as db:
+        existing = await find_properties_by_urls(db, groups)
+    for url, property_obj in existing.items():
+        for index in groups.pop(url):
+            yield _result(index, urls[index], "existing", property_id=property_obj.id)
+
+    async def extract(url: str) -> Tuple[str, Dict[str, Any]]:
+        # Per-site slot first, so waiting on a busy site doesn't hold a global one
+        async with domain_limits[listing_domain(url)], global_limit:
+            try:
+                async with session_maker() as db:
+                    extracted_data = await extract_property_cached(db, url)
+                    property_obj = await save_extracted_property(db, url, extracted_data)
+            except Exception as e:
+                return url, {"status": "failed", "error": str(e) or type(e).__name__}
+        return url, {"status": "extracted", "property_id": property_obj.id}
+
+    tasks = [asyncio.ensure_future(extract(url)) for url in groups]
+    try:
+        for done in asyncio.as_completed(tasks):
+            url, outcome = await done
+            for index in groups[url]:
+                yield _result(index, urls[index], **outcome)
+    finally:
+        # The client went away (or the caller stopped early): stop the rest
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _result(
+    index: int,
+    url: str,
+    status: str,
+    property_id: Optional[str] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {"index": index, "url": url, "status": status, "property_id": property_id, "error": error}
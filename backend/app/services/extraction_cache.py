@@ -0,0 +1,326 @@
+"""
+Two-tier cache of listing extraction results
+
+A memory LRU sits in front of the extraction_cache table. Every field carries
+the time it was extracted; static facts (address, size, year built) stay
+valid for EXTRACTION_CACHE_STATIC_TTL_SECONDS while volatile ones (price,
+days on market) expire after EXTRACTION_CACHE_VOLATILE_TTL_SECONDS. A fully
+fresh entry skips the page fetch and the LLM; when only volatile fields have
+expired, the fresh ones are passed to the extractor so the LLM is only asked
+for the rest.
+
+Concurrent requests for the same listing share one extraction: callers in
+the same process await the first caller's result, and other worker
+processes see its row in extraction_leases and wait for the cache entry it
+writes.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.models.extraction_lease import ExtractionLease
+from app.utils.listing_url import listing_cache_key
+from app.utils.property_extractor import (
+    PARTIAL_RESULT,
+    ExtractedPropertyData,
+    build_extracted_property_data,
+    extract_property_fields,
+)
+
+
+# Fields that change while a listing is on the market
+VOLATILE_FIELDS = frozenset({"price", "aiFairValue", "daysOnMarket", "offerDeadline"})
+
+# (fields, field_fetched_at)
+CachedFields = Tuple[Dict[str, Any], Dict[str, float]]
+
+
+class ExtractionCache:
+    """Memory LRU over the extraction_cache table, with per-field-class TTLs"""
+
+    def __init__(self, max_entries: int, static_ttl: float, volatile_ttl: float):
+        self.max_entries = max(1, max_entries)
+        self.static_ttl = static_ttl
+        self.volatile_ttl = volatile_ttl
+        self._memory: "OrderedDict[str, CachedFields]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.coalesced = 0
+        self.lease_waits = 0
+        self._served_age_total = 0.0
+        self._served_age_max = 0.0
+
+    def ttl_for(self, field: str) -> float:
+        return self.volatile_ttl if field in VOLATILE_FIELDS else self.static_ttl
+
+    def _remember(self, key: str, entry: CachedFields) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    async def _load(self, db: AsyncSession, key: str, use_memory: bool = True) -> Optional[CachedFields]:
+        with self._lock:
+            entry = self._memory.get(key) if use_memory else None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+        result = await db.execute(
+            select(ExtractionCacheEntry).where(ExtractionCacheEntry.cache_key == key)
+        )
+        row = result.scalar_one_or_none()
+        if row is None:
+            return None
+        entry = (dict(row.fields), dict(row.field_fetched_at))
+        self._remember(key, entry)
+        return entry
+
+    async def lookup(self, db: AsyncSession, url: str, use_memory: bool = True) -> Tuple[Dict[str, Any], bool]:
+        """
+        Fields of url that are still within their TTL, and whether none have expired
+
+        A complete result can be used as is; otherwise the fresh fields are a
+        starting point for re-extraction. use_memory=False reads the table
+        directly, to see entries written by other worker processes.
+        """
+        entry = await self._load(db, listing_cache_key(url), use_memory)
+        if entry is None:
+            self.misses += 1
+            return {}, False
+
+        fields, fetched_at = entry
+        now = time.time()
+        fresh: Dict[str, Any] = {}
+        for name, value in fields.items():
+            if now - fetched_at.get(name, 0) <= self.ttl_for(name):
+                fresh[name] = value
+        complete = bool(fresh) and len(fresh) == len(fields)
+
+        if complete:
+            self.hits += 1
+            age = now - min(fetched_at.values(), default=now)
+            self._served_age_total += age
+            self._served_age_max = max(self._served_age_max, age)
+        elif fresh:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        return fresh, complete
+
+    async def store(self, db: AsyncSession, url: str, fields: Dict[str, Any], commit: bool = True) -> None:
+        """
+        Record newly extracted fields (None values are not cached)
+
+        With commit=False the row is only flushed, to be committed with the
+        caller's other changes.
+        """
+        key = listing_cache_key(url)
+        now = time.time()
+        found = {name: value for name, value in fields.items() if value is not None}
+
+        result = await db.execute(
+            select(ExtractionCacheEntry).where(ExtractionCacheEntry.cache_key == key)
+        )
+        row = result.scalar_one_or_none()
+        if row is None:
+            row = ExtractionCacheEntry(
+                cache_key=key,
+                source_url=url,
+                fields=found,
+                field_fetched_at={name: now for name in found},
+            )
+            try:
+                async with db.begin_nested():
+                    db.add(row)
+            except IntegrityError:
+                # Another request cached this listing first; merge into its row
+                result = await db.execute(
+                    select(ExtractionCacheEntry).where(ExtractionCacheEntry.cache_key == key)
+                )
+                row = result.scalar_one()
+                row = _merge_into(row, found, now)
+        else:
+            row = _merge_into(row, found, now)
+        if commit:
+            await db.commit()
+        else:
+            await db.flush()
+        self._remember(key, (dict(row.fields), dict(row.field_fetched_at)))
+
+    def clear(self) -> None:
+        """Drop the memory tier (the table is kept)"""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio and age of served entries, for monitoring"""
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "static_ttl_seconds": self.static_ttl,
+            "volatile_ttl_seconds": self.volatile_ttl,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "coalesced": self.coalesced,
+            "lease_waits": self.lease_waits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_hit_age_seconds": round(self._served_age_total / self.hits, 1) if self.hits else 0.0,
+            "max_hit_age_seconds": round(self._served_age_max, 1),
+        }
+
+
+def _merge_into(row: ExtractionCacheEntry, found: Dict[str, Any], now: float) -> ExtractionCacheEntry:
+    # JSON columns only notice reassignment, not in-place mutation
+    row.fields = {**row.fields, **found}
+    row.field_fetched_at = {**row.field_fetched_at, **{name: now for name in found}}
+    return row
+
+
+extraction_cache = ExtractionCache(
+    max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+    static_ttl=settings.EXTRACTION_CACHE_STATIC_TTL_SECONDS,
+    volatile_ttl=settings.EXTRACTION_CACHE_VOLATILE_TTL_SECONDS,
+)
+
+
+# Lease owner id of this worker process
+_WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Cache key -> future resolving to the extracted fields, for extractions in flight
+_inflight_extractions: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+async def _acquire_lease(db: AsyncSession, key: str) -> bool:
+    """Claim the extraction of key for this worker unless another holds a live lease"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=settings.EXTRACTION_LEASE_SECONDS)
+    
+    # Take over a lease whose holder died or overran
+    result = await db.execute(
+        update(ExtractionLease)
+        .where(ExtractionLease.cache_key == key, ExtractionLease.expires_at < now)
+        .values(owner=_WORKER_ID, expires_at=expires_at)
+    )
+    acquired = result.rowcount > 0
+    if not acquired:
+        try:
+            async with db.begin_nested():
+                db.add(ExtractionLease(cache_key=key, owner=_WORKER_ID, expires_at=expires_at))
+            acquired = True
+        except IntegrityError:
+            acquired = False
+    # End the transaction either way; an open one would block the holder's writes
+    await db.commit()
+    return acquired
+
+
+async def _release_lease(db: AsyncSession, key: str) -> None:
+    await db.execute(
+        delete(ExtractionLease).where(
+            ExtractionLease.cache_key == key,
+            ExtractionLease.owner == _WORKER_ID,
+        )
+    )
+    await db.commit()
+
+
+async def _wait_for_lease(db: AsyncSession, key: str) -> None:
+    """Poll until another worker's lease on key is released or expires"""
+    extraction_cache.lease_waits += 1
+    while True:
+        await asyncio.sleep(settings.EXTRACTION_LEASE_POLL_SECONDS)
+        held = await db.scalar(
+            select(ExtractionLease.id).where(
+                ExtractionLease.cache_key == key,
+                ExtractionLease.expires_at >= datetime.utcnow(),
+            )
+        )
+        await db.commit()
+        if held is None:
+            return
+
+
+async def _extract_under_lease(db: AsyncSession, url: str, key: str, fresh: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract url while holding its lease, or reuse what the lease holder stored"""
+    while not await _acquire_lease(db, key):
+        await _wait_for_lease(db, key)
+        fresh, complete = await extraction_cache.lookup(db, url, use_memory=False)
+        if complete:
+            return fresh
+    
+    try:
+        fields = await extract_property_fields(url, known=fresh)
+        if fields.get(PARTIAL_RESULT):
+            # Caching it would hide the missing fields until the TTLs expire
+            return fields
+        # Fields carried over unchanged from the cache keep their original age
+        extracted = {name: value for name, value in fields.items() if name not in fresh or fresh[name] != value}
+        await extraction_cache.store(db, url, extracted)
+        return fields
+    finally:
+        await _release_lease(db, key)
+
+
+def _cancelling() -> bool:
+    task = asyncio.current_task()
+    return bool(task is not None and getattr(task, "cancelling", lambda: 0)())
+
+
+async def extract_property_cached(db: AsyncSession, url: str) -> ExtractedPropertyData:
+    """
+    Extract a listing, reusing cached fields that are still fresh
+    
+    Concurrent calls for the same listing share a single extraction.
+    """
+    fresh, complete = await extraction_cache.lookup(db, url)
+    if complete:
+        return build_extracted_property_data(fresh)
+    
+    key = listing_cache_key(url)
+    while True:
+        pending = _inflight_extractions.get(key)
+        if pending is None:
+            break
+        extraction_cache.coalesced += 1
+        try:
+            return build_extracted_property_data(await asyncio.shield(pending))
+        except asyncio.CancelledError:
+            # The first caller went away mid-extraction; take over unless this
+            # caller was cancelled too
+            if pending.cancelled() and not _cancelling():
+                continue
+            raise
+    
+    future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+    _inflight_extractions[key] = future
+    try:
+        fields = await _extract_under_lease(db, url, key, fresh)
+        future.set_result(fields)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when no other caller was waiting
+        raise
+    finally:
+        _inflight_extractions.pop(key, None)
+    return build_extracted_property_data(fields)
@@ -0,0 +1,183 @@
+"""
+Worker pool for job-mode listing extraction
+
+Jobs are rows in extraction_jobs; their ids go through a bounded in-memory
+queue to a fixed number of worker tasks. A worker claims a job by moving it
+from QUEUED to RUNNING in the table, so a job enqueued twice (or by two
+processes after a restart) still runs once. Jobs left QUEUED by a stopped
+process, and RUNNING jobs whose worker died, are picked up again on start.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.config import settings
+from app.database import async_session_maker
+from app.models.extraction_job import ExtractionJob, ExtractionJobStatus
+from app.services.extraction_cache import extract_property_cached
+from app.services.property_lookup import find_property_by_url, save_extracted_property
+
+
+TERMINAL_STATUSES = frozenset({ExtractionJobStatus.DONE, ExtractionJobStatus.FAILED})
+
+
+class ExtractionJobPool:
+    """Fixed set of worker tasks running extraction jobs from a bounded queue"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self._queue: Optional["asyncio.Queue[str]"] = None
+        self._tasks: List[asyncio.Task] = []
+        self._session_maker: async_sessionmaker = async_session_maker
+        self._changed = asyncio.Event()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    async def start(self, session_maker: Optional[async_sessionmaker] = None) -> None:
+        """Start the workers and re-queue jobs left unfinished by earlier processes"""
+        if self.started:
+            return
+        if session_maker is not None:
+            self._session_maker = session_maker
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._changed = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        stale = datetime.utcnow() - timedelta(seconds=settings.EXTRACTION_LEASE_SECONDS)
+        async with self._session_maker() as db:
+            await db.execute(
+                update(ExtractionJob)
+                .where(
+                    ExtractionJob.status == ExtractionJobStatus.RUNNING,
+                    ExtractionJob.started_at < stale,
+                )
+                .values(status=ExtractionJobStatus.QUEUED, started_at=None)
+            )
+            await db.commit()
+            result = await db.execute(
+                select(ExtractionJob.id)
+                .where(ExtractionJob.status == ExtractionJobStatus.QUEUED)
+                .order_by(ExtractionJob.created_at)
+                .limit(self.queue_size)
+            )
+            for job_id in result.scalars():
+                self.submit(job_id)
+
+    async def stop(self) -> None:
+        """Cancel the workers; interrupted jobs go back to QUEUED"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+
+    def submit(self, job_id: str) -> bool:
+        """Queue a job for the workers; False when the pool is stopped or full"""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def wait_for_change(self, timeout: float) -> None:
+        """Sleep until any job run by this process finishes, or timeout passes"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error running extraction job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        async with self._session_maker() as db:
+            # Claim the job; another worker may already have taken it
+            claimed = await db.execute(
+                update(ExtractionJob)
+                .where(ExtractionJob.id == job_id, ExtractionJob.status == ExtractionJobStatus.QUEUED)
+                .values(status=ExtractionJobStatus.RUNNING, started_at=datetime.utcnow())
+            )
+            await db.commit()
+            if claimed.rowcount == 0:
+                return
+            url = await db.scalar(select(ExtractionJob.url).where(ExtractionJob.id == job_id))
+
+            self.running += 1
+            try:
+                property_obj = await find_property_by_url(db, url)
+                if property_obj is None:
+                    extracted_data = await extract_property_cached(db, url)
+                    property_obj = await save_extracted_property(db, url, extracted_data)
+            except asyncio.CancelledError:
+                await db.rollback()
+                await _set_job(db, job_id, status=ExtractionJobStatus.QUEUED, started_at=None)
+                raise
+            except Exception as e:
+                await db.rollback()
+                await _set_job(
+                    db,
+                    job_id,
+                    status=ExtractionJobStatus.FAILED,
+                    error=str(e) or type(e).__name__,
+                    completed_at=datetime.utcnow(),
+                )
+                self.failed += 1
+            else:
+                await _set_job(
+                    db,
+                    job_id,
+                    status=ExtractionJobStatus.DONE,
+                    property_id=property_obj.id,
+                    completed_at=datetime.utcnow(),
+                )
+                self.completed += 1
+            finally:
+                self.running -= 1
+                self._notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and job outcomes, for monitoring"""
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+async def _set_job(db: AsyncSession, job_id: str, **values: Any) -> None:
+    await db.execute(update(ExtractionJob).where(ExtractionJob.id == job_id).values(**values))
+    await db.commit()
+
+
+extraction_jobs = ExtractionJobPool(
+    workers=settings.EXTRACTION_JOB_WORKERS,
+    queue_size=settings.EXTRACTION_JOB_QUEUE_SIZE,
+)
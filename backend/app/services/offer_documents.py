@@ -0,0 +1,398 @@
+"""
+Content-addressed storage of generated offer letter PDFs
+
+Offers whose normalized terms and contract template are identical share one
+PDF file in OFFERS_DIR. The file is rendered once, reused for later
+identical offers and reference counted so deleting an offer never removes a
+file another offer still points at.
+
+References are released in the transaction that deletes the offer, including
+offers deleted through the Property and User cascades (a session hook sees
+every deleted Offer). Files are only removed once that transaction commits.
+Rows deleted with plain SQL, bypassing the session, still leak their
+references.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import Counter
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.offer import Offer
+from app.models.offer_document import OfferDocument
+from app.utils.pdf_generator import (
+    OfferData,
+    generate_offer_letter_pdf,
+    generate_offer_letter_variants,
+    get_contract_template_path,
+)
+from app.utils.file_digest import file_sha256
+
+
+def _normalize(value):
+    """Normalize a field so cosmetic differences don't change the hash"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def compute_document_hash(offer_data: OfferData, property_type: Optional[str], template_hash: str) -> str:
+    """
+    Hash of everything that determines the generated PDF bytes
+    """
+    payload = {
+        "offer": {k: _normalize(v) for k, v in asdict(offer_data).items()},
+        "template": template_hash,
+        "output_mode": settings.PDF_OUTPUT_MODE,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def document_path(document: OfferDocument) -> str:
+    """Absolute path of a document's PDF file"""
+    return os.path.join(settings.OFFERS_DIR, document.file_name)
+
+
+def _write_atomically(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+async def acquire_offer_document(
+    db: AsyncSession,
+    offer_data: OfferData,
+    property_type: Optional[str] = None,
+) -> OfferDocument:
+    """
+    Get the PDF for these offer terms, rendering it only if no offer shares them
+    
+    Increments the document's reference count; it is released when the offer
+    is deleted (or with release_offer_document).
+    """
+    document = (await acquire_offer_documents(db, [(offer_data, property_type)]))[0]
+    if isinstance(document, Exception):
+        raise document
+    return document
+
+
+async def acquire_offer_documents(
+    db: AsyncSession,
+    items: List[Tuple[OfferData, Optional[str]]],
+    as_variants: bool = False,
+) -> List[Union[OfferDocument, Exception]]:
+    """
+    Batch form of acquire_offer_document
+    
+    Looks up every content hash in one query, renders each distinct missing
+    document once (concurrently, at most PDF_RENDER_WORKERS at a time) and
+    records all references in a single commit. Returns a document or the
+    error for each item, in order. Reference counts are incremented in SQL,
+    so concurrent requests for the same document don't overwrite each other.
+    
+    With as_variants, items are variants of one offer (same state and
+    property type) and the missing ones are rendered together in a single
+    call that shares one template load and fill plan.
+    """
+    results: List[Union[OfferDocument, Exception, None]] = [None] * len(items)
+    hashes: List[Optional[Tuple[str, str]]] = [None] * len(items)
+    for i, (offer_data, property_type) in enumerate(items):
+        template_path = get_contract_template_path(offer_data.state, property_type)
+        if not os.path.exists(template_path):
+            results[i] = FileNotFoundError(f"Template not found at {template_path}. Please ensure the template file exists.")
+            continue
+        template_hash = file_sha256(template_path)
+        hashes[i] = (compute_document_hash(offer_data, property_type, template_hash), template_hash)
+    
+    wanted = {h[0] for h in hashes if h}
+    documents: Dict[str, OfferDocument] = {}
+    if wanted:
+        result = await db.execute(
+            select(OfferDocument).where(OfferDocument.content_hash.in_(wanted))
+        )
+        documents = {doc.content_hash: doc for doc in result.scalars()}
+    
+    # Render each distinct document whose row or file is missing, once
+    to_render: Dict[str, int] = {}
+    for i, h in enumerate(hashes):
+        if not h or h[0] in to_render:
+            continue
+        document = documents.get(h[0])
+        if document is None or not os.path.exists(document_path(document)):
+            to_render[h[0]] = i
+    
+    semaphore = asyncio.Semaphore(max(1, settings.PDF_RENDER_WORKERS))
+    
+    async def render(content_hash: str, index: int) -> int:
+        offer_data, property_type = items[index]
+        async with semaphore:
+            pdf_bytes = await generate_offer_letter_pdf(offer_data, property_type)
+        _write_atomically(os.path.join(settings.OFFERS_DIR, f"offer-{content_hash}.pdf"), pdf_bytes)
+        return len(pdf_bytes)
+    
+    async def render_variants() -> Dict[str, Union[int, Exception]]:
+        property_type = items[next(iter(to_render.values()))][1]
+        try:
+            outputs = await generate_offer_letter_variants(
+                [items[i][0] for i in to_render.values()], property_type
+            )
+        except Exception as e:
+            return {content_hash: e for content_hash in to_render}
+        sizes: Dict[str, Union[int, Exception]] = {}
+        for content_hash, pdf_bytes in zip(to_render, outputs):
+            _write_atomically(os.path.join(settings.OFFERS_DIR, f"offer-{content_hash}.pdf"), pdf_bytes)
+            sizes[content_hash] = len(pdf_bytes)
+        return sizes
+    
+    if as_variants and to_render:
+        rendered = await render_variants()
+    else:
+        rendered = dict(zip(
+            to_render,
+            await asyncio.gather(*(render(h, i) for h, i in to_render.items()), return_exceptions=True),
+        ))
+    
+    references: Counter = Counter()
+    for i, h in enumerate(hashes):
+        if not h:
+            continue
+        content_hash, template_hash = h
+        outcome = rendered.get(content_hash)
+        if isinstance(outcome, Exception):
+            results[i] = outcome
+            continue
+        
+        document = documents.get(content_hash)
+        if document is None:
+            document = OfferDocument(
+                content_hash=content_hash,
+                file_name=f"offer-{content_hash}.pdf",
+                template_hash=template_hash,
+                size_bytes=outcome,
+                ref_count=0,
+                last_accessed_at=datetime.utcnow(),
+            )
+            try:
+                async with db.begin_nested():
+                    db.add(document)
+            except IntegrityError:
+                # A concurrent identical request inserted it first; share that row
+                result = await db.execute(
+                    select(OfferDocument).where(OfferDocument.content_hash == content_hash)
+                )
+                document = result.scalar_one()
+            documents[content_hash] = document
+        elif outcome is not None:
+            # Row survived but the file was removed - it has just been rewritten
+            document.size_bytes = outcome
+            document.last_accessed_at = datetime.utcnow()
+            document.evicted_at = None
+        
+        references[content_hash] += 1
+        results[i] = document
+    
+    for content_hash, count in references.items():
+        await db.execute(
+            update(OfferDocument)
+            .where(OfferDocument.content_hash == content_hash)
+            .values(ref_count=OfferDocument.ref_count + count)
+            .execution_options(synchronize_session="fetch")
+        )
+    await db.commit()
+    return results  # type: ignore[return-value]
+
+
+# Session.info key of the files to remove once the session commits
+_FILES_TO_REMOVE = "offer_document_files_to_remove"
+
+
+def _release_documents(session: Session, file_names: Iterable[str]) -> None:
+    """Drop one reference per file name, deleting rows (and, after commit, files) left unused"""
+    counts = Counter(file_names)
+    if not counts:
+        return
+    # Decremented and deleted in SQL, so a concurrent acquire is never lost
+    for file_name, count in counts.items():
+        session.execute(
+            update(OfferDocument)
+            .where(OfferDocument.file_name == file_name)
+            .values(ref_count=OfferDocument.ref_count - count)
+            .execution_options(synchronize_session="fetch")
+        )
+    unused = session.execute(
+        delete(OfferDocument)
+        .where(OfferDocument.file_name.in_(list(counts)), OfferDocument.ref_count <= 0)
+        .returning(OfferDocument.file_name)
+        .execution_options(synchronize_session="fetch")
+    ).scalars().all()
+    session.info.setdefault(_FILES_TO_REMOVE, []).extend(
+        os.path.join(settings.OFFERS_DIR, file_name) for file_name in unused
+    )
+
+
+async def release_offer_document(db: AsyncSession, file_name: str) -> None:
+    """
+    Drop one reference to a document, deleting its file when none remain
+    
+    Not committed: the change belongs to the caller's transaction, and the
+    file is removed when it commits.
+    """
+    await db.run_sync(_release_documents, [file_name])
+
+
+@event.listens_for(Session, "before_flush")
+def _release_documents_of_deleted_offers(session: Session, flush_context, instances) -> None:
+    file_names = [
+        os.path.basename(obj.offer_letter_url)
+        for obj in session.deleted
+        if isinstance(obj, Offer) and _offer_letter_path(obj.offer_letter_url)
+    ]
+    _release_documents(session, file_names)
+
+
+@event.listens_for(Session, "after_commit")
+def _remove_released_files(session: Session) -> None:
+    for path in session.info.pop(_FILES_TO_REMOVE, []):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@event.listens_for(Session, "after_rollback")
+def _keep_released_files(session: Session) -> None:
+    session.info.pop(_FILES_TO_REMOVE, None)
+
+
+# Accesses to a document closer together than this are recorded once
+ACCESS_RECORD_INTERVAL = timedelta(minutes=5)
+
+# Offer id -> future resolving to the offer letter URL, for renders in flight
+_inflight_renders: Dict[str, "asyncio.Future[str]"] = {}
+
+
+def _offer_letter_path(offer_letter_url: Optional[str]) -> Optional[str]:
+    if not offer_letter_url or not offer_letter_url.startswith('/offers/'):
+        return None
+    return os.path.join(settings.OFFERS_DIR, os.path.basename(offer_letter_url))
+
+
+async def enforce_offer_letter_cache_budget(db: AsyncSession, keep: Optional[str] = None) -> None:
+    """
+    Evict least recently used offer PDFs once OFFERS_DIR exceeds its byte budget
+    
+    Only used in lazy render mode, where any evicted file is rendered again
+    from the persisted offer inputs on its next access. Sizes and access
+    times come from the offer_documents table, so OFFERS_DIR isn't listed;
+    keep is the file name of the document just rendered.
+    """
+    budget = settings.OFFER_LETTER_CACHE_MAX_BYTES
+    if budget <= 0:
+        return
+    
+    on_disk = OfferDocument.evicted_at.is_(None)
+    total = (await db.execute(
+        select(func.coalesce(func.sum(OfferDocument.size_bytes), 0)).where(on_disk)
+    )).scalar_one()
+    if total <= budget:
+        return
+    
+    candidates = await db.stream_scalars(
+        select(OfferDocument)
+        .where(on_disk, OfferDocument.file_name != keep)
+        .order_by(func.coalesce(OfferDocument.last_accessed_at, OfferDocument.created_at))
+    )
+    evicted = []
+    async for document in candidates:
+        if total <= budget:
+            break
+        evicted.append(document)
+        total -= document.size_bytes
+    await candidates.close()
+    if not evicted:
+        return
+    
+    now = datetime.utcnow()
+    for document in evicted:
+        document.evicted_at = now
+    await db.commit()
+    # Files go after the commit, so a failed commit never leaves rows without files
+    for document in evicted:
+        try:
+            os.remove(document_path(document))
+        except FileNotFoundError:
+            pass
+
+
+async def materialize_offer_letter(
+    db: AsyncSession,
+    offer: Offer,
+    offer_data: OfferData,
+    property_type: Optional[str] = None,
+) -> str:
+    """
+    Make sure the offer's PDF is on disk, rendering it on first access
+    
+    Returns the offer letter URL. Concurrent calls for the same offer share a
+    single render instead of each starting their own.
+    """
+    path = _offer_letter_path(offer.offer_letter_url)
+    if path and os.path.exists(path):
+        # Eviction only needs a rough recency, so reads rarely become writes
+        file_name = os.path.basename(path)
+        now = datetime.utcnow()
+        last_accessed_at = await db.scalar(
+            select(OfferDocument.last_accessed_at).where(OfferDocument.file_name == file_name)
+        )
+        if last_accessed_at is None or now - last_accessed_at > ACCESS_RECORD_INTERVAL:
+            await db.execute(
+                update(OfferDocument)
+                .where(OfferDocument.file_name == file_name)
+                .values(last_accessed_at=now, updated_at=OfferDocument.updated_at)
+            )
+            await db.commit()
+        return offer.offer_letter_url
+    
+    pending = _inflight_renders.get(offer.id)
+    if pending is not None:
+        url = await asyncio.shield(pending)
+        offer.offer_letter_url = url
+        return url
+    
+    future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+    _inflight_renders[offer.id] = future
+    try:
+        previous_url = offer.offer_letter_url
+        document = await acquire_offer_document(db, offer_data, property_type)
+        url = f"/offers/{document.file_name}"
+        offer.offer_letter_url = url
+        # The offer already held a reference if its file had been evicted
+        previous_path = _offer_letter_path(previous_url)
+        if previous_path:
+            await release_offer_document(db, os.path.basename(previous_path))
+        await db.commit()
+        
+        await enforce_offer_letter_cache_budget(db, keep=document.file_name)
+        future.set_result(url)
+        return url
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when no other caller was waiting
+        raise
+    finally:
+        _inflight_renders.pop(offer.id, None)
@@ -0,0 +1,206 @@
+"""
+Finding and saving the properties of extracted listings
+
+Listing sites serve the same listing under many URLs (tracking parameters,
+mobile hosts, address slug changes), so properties are matched on the
+listing key parsed from the URL before falling back to the source URL, as
+given or in its canonical form.
+"""
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.property import Property
+from app.utils.listing_url import canonical_listing_url, listing_key
+from app.utils.property_extractor import ExtractedPropertyData, get_source_type
+
+
+async def find_property_by_url(db: AsyncSession, url: str) -> Optional[Property]:
+    """
+    Existing property for a listing URL
+    
+    Matches on listing key first, then on the source URL as given or in its
+    canonical form (no tracking parameters or trailing slash).
+    """
+    key = listing_key(url)
+    if key:
+        result = await db.execute(
+            select(Property).where(Property.listing_key == key).order_by(Property.created_at).limit(1)
+        )
+        property_obj = result.scalar_one_or_none()
+        if property_obj:
+            return property_obj
+    
+    result = await db.execute(
+        select(Property)
+        .where(Property.source_url.in_({url, canonical_listing_url(url)}))
+        .order_by(Property.created_at)
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def find_properties_by_urls(db: AsyncSession, urls: Iterable[str]) -> Dict[str, Property]:
+    """
+    Existing properties for many listing URLs, keyed by URL
+    
+    Same matching as find_property_by_url, with one query per match kind.
+    """
+    urls = list(dict.fromkeys(urls))
+    keys = {url: listing_key(url) for url in urls}
+    by_key: Dict[str, Property] = {}
+    wanted_keys = {key for key in keys.values() if key}
+    if wanted_keys:
+        result = await db.execute(
+            select(Property).where(Property.listing_key.in_(wanted_keys)).order_by(Property.created_at)
+        )
+        for property_obj in result.scalars():
+            by_key.setdefault(property_obj.listing_key, property_obj)
+    
+    found = {url: by_key[keys[url]] for url in urls if keys[url] in by_key}
+    remaining = [url for url in urls if url not in found]
+    if remaining:
+        canonical = {url: canonical_listing_url(url) for url in remaining}
+        result = await db.execute(
+            select(Property)
+            .where(Property.source_url.in_(set(remaining) | set(canonical.values())))
+            .order_by(Property.created_at)
+        )
+        by_url: Dict[str, Property] = {}
+        for property_obj in result.scalars():
+            by_url.setdefault(property_obj.source_url, property_obj)
+        for url in remaining:
+            property_obj = by_url.get(url) or by_url.get(canonical[url])
+            if property_obj:
+                found[url] = property_obj
+    return found
+
+
+async def save_extracted_property(
+    db: AsyncSession,
+    url: str,
+    extracted_data: ExtractedPropertyData
+) -> Property:
+    """
+    Create the property for an extracted listing, or update the one at its address
+    
+    Commits and returns the stored property.
+    """
+    source_type = get_source_type(url)
+    key = listing_key(url)
+    
+    # Check if a property with the same address already exists
+    result = await db.execute(
+        select(Property).where(
+            Property.address == extracted_data.address,
+            Property.city == extracted_data.city,
+            Property.state == extracted_data.state,
+            Property.zip_code == extracted_data.zip_code,
+        )
+    )
+    existing_property = result.scalar_one_or_none()
+    
+    if existing_property:
+        # Update the existing property with the new source URL if different
+        if existing_property.source_url != url:
+            existing_property.source_url = url
+            existing_property.listing_key = key
+            existing_property.source_type = source_type
+            existing_property.price = existing_property.price or extracted_data.price
+            existing_property.ai_fair_value = existing_property.ai_fair_value or extracted_data.ai_fair_value
+            existing_property.days_on_market = existing_property.days_on_market or extracted_data.days_on_market
+            existing_property.property_type = existing_property.property_type or extracted_data.property_type or "singlefamily"
+            existing_property.mls_number = existing_property.mls_number or extracted_data.mls_number
+            existing_property.listing_agent_name = existing_property.listing_agent_name or extracted_data.listing_agent_name
+            existing_property.listing_agent_email = existing_property.listing_agent_email or extracted_data.listing_agent_email
+            existing_property.listing_agent_phone = existing_property.listing_agent_phone or extracted_data.listing_agent_phone
+            existing_property.offer_deadline = existing_property.offer_deadline or extracted_data.offer_deadline
+            existing_property.has_hoa = existing_property.has_hoa if existing_property.has_hoa is not None else extracted_data.has_hoa
+            existing_property.built_before_1978 = existing_property.built_before_1978 if existing_property.built_before_1978 is not None else extracted_data.built_before_1978
+            
+            # Merge extracted data
+            current_data = existing_property.extracted_data or {}
+            current_data.update({
+                'bedrooms': extracted_data.bedrooms,
+                'bathrooms': extracted_data.bathrooms,
+                'square_feet': extracted_data.square_feet,
+                'lot_size': extracted_data.lot_size,
+                'year_built': extracted_data.year_built,
+            })
+            existing_property.extracted_data = current_data
+            
+            await db.commit()
+        
+        property_obj = existing_property
+    else:
+        # Create new property with extracted data
+        property_obj = Property(
+            source_url=url,
+            listing_key=key,
+            source_type=source_type,
+            address=extracted_data.address,
+            city=extracted_data.city,
+            state=extracted_data.state,
+            zip_code=extracted_data.zip_code,
+            price=extracted_data.price,
+            ai_fair_value=extracted_data.ai_fair_value,
+            days_on_market=extracted_data.days_on_market,
+            property_type=extracted_data.property_type or "singlefamily",
+            mls_number=extracted_data.mls_number,
+            listing_agent_name=extracted_data.listing_agent_name,
+            listing_agent_email=extracted_data.listing_agent_email,
+            listing_agent_phone=extracted_data.listing_agent_phone,
+            offer_deadline=extracted_data.offer_deadline,
+            has_hoa=extracted_data.has_hoa,
+            built_before_1978=extracted_data.built_before_1978,
+            extracted_data={
+                'bedrooms': extracted_data.bedrooms,
+                'bathrooms': extracted_data.bathrooms,
+                'square_feet': extracted_data.square_feet,
+                'lot_size': extracted_data.lot_size,
+                'year_built': extracted_data.year_built,
+            },
+        )
+        try:
+            async with db.begin_nested():
+                db.add(property_obj)
+        except IntegrityError:
+            # A concurrent request for the same URL created the property first
+            property_obj = await find_property_by_url(db, url)
+        await db.commit()
+        await db.refresh(property_obj)
+    
+    return property_obj
+
+
+async def backfill_listing_keys(db: AsyncSession, batch_size: int = 500) -> int:
+    """
+    Set listing_key on properties created before the column existed
+    
+    Returns the number of rows updated. Rows whose URL has no recognizable
+    listing id are left NULL.
+    """
+    updated = 0
+    last_id = ""
+    while True:
+        result = await db.execute(
+            select(Property)
+            .where(
+                Property.listing_key.is_(None),
+                Property.source_url.is_not(None),
+                Property.id > last_id,
+            )
+            .order_by(Property.id)
+            .limit(batch_size)
+        )
+        rows = result.scalars().all()
+        if not rows:
+            break
+        for property_obj in rows:
+            key = listing_key(property_obj.source_url)
+            if key:
+                property_obj.listing_key = key
+                updated += 1
+        last_id = rows[-1].id
+        await db.commit()
+    return updated
@@ -0,0 +1,213 @@
+"""
+Refreshing stored properties from their listing pages
+
+The page is re-fetched conditionally with the ETag / Last-Modified of the
+previous fetch. A 304, or a page whose visible text hashes the same as last
+time, means the listing hasn't changed and the LLM is not called. Otherwise
+the fields are re-extracted, with the property's static facts passed as
+known so only the volatile ones (price, days on market...) are asked for.
+
+The first refresh of a property has no stored hash to compare with, so it
+always re-extracts; the validators it stores make later ones conditional.
+
+A refresh is split into check_listing (network and LLM, no database) and
+apply_listing_check (no I/O besides the session), so the background
+refresher can check a batch and write it in one transaction.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.property import Property
+from app.services.extraction_cache import VOLATILE_FIELDS, extraction_cache
+from app.utils.http_client import RequestPriority
+from app.utils.property_extractor import (
+    LLM_FIELDS,
+    PARTIAL_RESULT,
+    ListingPage,
+    build_extracted_property_data,
+    extract_property_fields,
+    fetch_listing_page,
+    page_text_hash,
+)
+
+
+class RefreshOutcome(str, Enum):
+    """What a property refresh found"""
+    NOT_MODIFIED = "NOT_MODIFIED"
+    UNCHANGED = "UNCHANGED"
+    UPDATED = "UPDATED"
+
+
+# Fields a volatile-only refresh asks the LLM for, in prompt order
+VOLATILE_LLM_FIELDS = [name for name in LLM_FIELDS if name in VOLATILE_FIELDS]
+
+# Identifying fields given as context to volatile-only prompts
+_IDENTITY_FIELDS = ("address", "city", "state", "zipCode")
+
+
+@dataclass
+class ListingCheck:
+    """Result of re-reading a listing page, not yet applied to the property"""
+    outcome: RefreshOutcome
+    page: Optional[ListingPage] = None
+    text_hash: Optional[str] = None
+    known: Dict[str, Any] = field(default_factory=dict)
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+
+def _known_fields(property_obj: Property) -> Dict[str, Any]:
+    """Static facts of a property, keyed like the extractor's fields"""
+    details = property_obj.extracted_data or {}
+    fields = {
+        "address": property_obj.address,
+        "city": property_obj.city,
+        "state": property_obj.state,
+        "zipCode": property_obj.zip_code,
+        "propertyType": property_obj.property_type,
+        "mlsNumber": property_obj.mls_number,
+        "listingAgentName": property_obj.listing_agent_name,
+        "listingAgentEmail": property_obj.listing_agent_email,
+        "listingAgentPhone": property_obj.listing_agent_phone,
+        "hasHOA": property_obj.has_hoa,
+        "builtBefore1978": property_obj.built_before_1978,
+        "bedrooms": details.get("bedrooms"),
+        "bathrooms": details.get("bathrooms"),
+        "squareFeet": details.get("square_feet"),
+        "lotSize": details.get("lot_size"),
+        "yearBuilt": details.get("year_built"),
+    }
+    # Placeholders like "Address not found" are not facts
+    return {
+        name: value for name, value in fields.items()
+        if value is not None and name not in VOLATILE_FIELDS
+        and not (isinstance(value, str) and value.endswith(" not found"))
+    }
+
+
+def _volatile_fields(property_obj: Property) -> Dict[str, Any]:
+    fields = {
+        "price": property_obj.price,
+        "aiFairValue": property_obj.ai_fair_value,
+        "daysOnMarket": property_obj.days_on_market,
+        "offerDeadline": property_obj.offer_deadline.isoformat() if property_obj.offer_deadline else None,
+    }
+    return {name: value for name, value in fields.items() if value is not None}
+
+
+def _apply_fields(property_obj: Property, fields: Dict[str, Any]) -> None:
+    """Overwrite volatile values with newly extracted ones and fill missing facts"""
+    data = build_extracted_property_data(fields)
+
+    for attr in ("price", "ai_fair_value", "days_on_market", "offer_deadline"):
+        value = getattr(data, attr)
+        if value is not None:
+            setattr(property_obj, attr, value)
+    for attr in (
+        "mls_number",
+        "listing_agent_name",
+        "listing_agent_email",
+        "listing_agent_phone",
+        "has_hoa",
+        "built_before_1978",
+    ):
+        if getattr(property_obj, attr) is None:
+            setattr(property_obj, attr, getattr(data, attr))
+
+    details = dict(property_obj.extracted_data or {})
+    for attr in ("bedrooms", "bathrooms", "square_feet", "lot_size", "year_built"):
+        if details.get(attr) is None and getattr(data, attr) is not None:
+            details[attr] = getattr(data, attr)
+    # JSON columns only notice reassignment, not in-place mutation
+    property_obj.extracted_data = details
+
+
+async def check_listing(
+    property_obj: Property,
+    volatile_only: bool = False,
+    priority: RequestPriority = RequestPriority.INTERACTIVE,
+) -> ListingCheck:
+    """
+    Re-read a property's listing page, calling the LLM only if the page changed
+
+    volatile_only asks the LLM for the volatile fields alone, with a smaller
+    prompt (REFRESH_PROMPT_TOKEN_BUDGET). A background check whose fetch
+    fails raises instead of falling back to a URL-only prompt.
+    """
+    url = property_obj.source_url
+    if not url:
+        raise ValueError("Property has no source URL to refresh from")
+
+    try:
+        page = await fetch_listing_page(
+            url,
+            etag=property_obj.page_etag,
+            last_modified=property_obj.page_last_modified,
+            priority=priority,
+        )
+    except Exception as e:
+        if priority == RequestPriority.BACKGROUND:
+            raise
+        print(f"Warning: Conditional fetch of {url} failed, re-extracting: {e}")
+        page = None
+
+    if page is not None and page.not_modified:
+        return ListingCheck(RefreshOutcome.NOT_MODIFIED, page)
+    text_hash = page_text_hash(page.html) if page is not None else None
+    if text_hash is not None and text_hash == property_obj.page_text_hash:
+        return ListingCheck(RefreshOutcome.UNCHANGED, page, text_hash)
+
+    known = _known_fields(property_obj)
+    if volatile_only:
+        known = {name: known[name] for name in _IDENTITY_FIELDS if name in known}
+        fields = await extract_property_fields(
+            url,
+            known=known,
+            page=page,
+            fields=VOLATILE_LLM_FIELDS,
+            token_budget=settings.REFRESH_PROMPT_TOKEN_BUDGET,
+        )
+    else:
+        fields = await extract_property_fields(url, known=known, page=page)
+    return ListingCheck(RefreshOutcome.UPDATED, page, text_hash, known, fields)
+
+
+async def apply_listing_check(db: AsyncSession, property_obj: Property, check: ListingCheck) -> None:
+    """
+    Write a check's result to the property and the extraction cache, without committing
+
+    A partial result (the LLM was unavailable) is applied but neither cached
+    nor recorded as the page's baseline, so the next check extracts again.
+    """
+    partial = bool(check.fields.get(PARTIAL_RESULT))
+    if check.outcome == RefreshOutcome.UPDATED:
+        _apply_fields(property_obj, check.fields)
+        if check.page is not None and not partial:
+            property_obj.page_text_hash = check.text_hash
+    if check.page is not None and not partial:
+        property_obj.page_etag = check.page.etag
+        property_obj.page_last_modified = check.page.last_modified
+    property_obj.page_checked_at = datetime.utcnow()
+    if partial:
+        return
+
+    if check.outcome == RefreshOutcome.UPDATED:
+        cached = {name: value for name, value in check.fields.items() if check.known.get(name) != value}
+    else:
+        # The stored volatile values were just confirmed; keep the cache in step
+        cached = _volatile_fields(property_obj)
+    await extraction_cache.store(db, property_obj.source_url, cached, commit=False)
+
+
+async def refresh_property(db: AsyncSession, property_obj: Property, volatile_only: bool = False) -> RefreshOutcome:
+    """
+    Refresh one property from its listing page
+
+    Commits the property and returns what the refresh found.
+    """
+    check = await check_listing(property_obj, volatile_only=volatile_only)
+    await apply_listing_check(db, property_obj, check)
+    await db.commit()
+    return check.outcome
@@ -0,0 +1,170 @@
+"""
+Background refresh of volatile listing fields
+
+Prices, days on market and offer deadlines go stale after extraction while
+buyers are still writing offers. Every REFRESH_INTERVAL_SECONDS the
+refresher picks properties that have an open offer or were viewed within
+REFRESH_VIEW_WINDOW_SECONDS and weren't checked for REFRESH_STALE_AFTER_SECONDS,
+stalest first. Each one is re-checked with a conditional fetch and, if the
+page changed, a small prompt for the volatile fields only; a batch is
+written in one transaction.
+
+Checks are spaced to stay within REFRESH_MAX_PER_HOUR, and each waits until
+no other LLM call is in flight, so interactive extractions never queue
+behind the refresher; its page fetches are background requests, which
+give way to interactive fetches of the same site.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import exists, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.config import settings
+from app.database import async_session_maker
+from app.models.offer import Offer, OfferStatus
+from app.models.property import Property
+from app.services.property_refresh import ListingCheck, apply_listing_check, check_listing
+from app.utils.circuit_breaker import CircuitState
+from app.utils.http_client import RequestPriority
+from app.utils.llm_client import llm_client
+
+
+class PropertyRefresher:
+    """Periodic, rate-limited refresh of properties buyers are acting on"""
+
+    def __init__(
+        self,
+        interval: float,
+        batch_size: int,
+        max_per_hour: int,
+        stale_after: float,
+        view_window: float,
+    ):
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.min_spacing = 3600.0 / max(1, max_per_hour)
+        self.stale_after = stale_after
+        self.view_window = view_window
+        self._session_maker: async_sessionmaker = async_session_maker
+        self._task: Optional[asyncio.Task] = None
+        self._next_check_at = 0.0
+        self.cycles = 0
+        self.outcomes: Dict[str, int] = {}
+        self.failed = 0
+        self.busy_waits = 0
+        self.skipped_cycles = 0
+        self.last_cycle_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, session_maker: Optional[async_sessionmaker] = None) -> None:
+        """Start the refresh loop (no-op if running)"""
+        if self.running:
+            return
+        if session_maker is not None:
+            self._session_maker = session_maker
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error refreshing properties: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def select_due(self, db: AsyncSession) -> List[Property]:
+        """Properties with an open offer or a recent view that are due a refresh, stalest first"""
+        now = datetime.utcnow()
+        last_checked = func.coalesce(Property.page_checked_at, Property.created_at)
+        open_offer = exists().where(
+            Offer.property_id == Property.id,
+            Offer.status != OfferStatus.COMPLETED,
+        )
+        result = await db.execute(
+            select(Property)
+            .where(
+                Property.source_url.is_not(None),
+                or_(open_offer, Property.last_viewed_at >= now - timedelta(seconds=self.view_window)),
+                last_checked < now - timedelta(seconds=self.stale_after),
+            )
+            .order_by(last_checked)
+            .limit(self.batch_size)
+        )
+        return list(result.scalars())
+
+    async def _wait_for_turn(self) -> None:
+        """Sleep until the rate budget allows a check and no other LLM call is running"""
+        delay = self._next_check_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        while llm_client.in_flight > 0:
+            self.busy_waits += 1
+            await asyncio.sleep(1.0)
+        self._next_check_at = time.monotonic() + self.min_spacing
+
+    async def run_once(self) -> int:
+        """Refresh one batch of due properties; returns how many were checked"""
+        if llm_client.breaker.state != CircuitState.CLOSED:
+            # Leave the LLM's recovery probe to interactive requests
+            self.skipped_cycles += 1
+            return 0
+        async with self._session_maker() as db:
+            properties = await self.select_due(db)
+            # Nothing is written until the batch is checked; don't hold the read open
+            await db.commit()
+
+            checks: List[Tuple[Property, ListingCheck]] = []
+            for property_obj in properties:
+                await self._wait_for_turn()
+                try:
+                    check = await check_listing(property_obj, volatile_only=True, priority=RequestPriority.BACKGROUND)
+                    checks.append((property_obj, check))
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Error refreshing property {property_obj.id}: {e}")
+                    # Move it to the back of the queue instead of retrying every cycle
+                    property_obj.page_checked_at = datetime.utcnow()
+
+            for property_obj, check in checks:
+                await apply_listing_check(db, property_obj, check)
+                self.outcomes[check.outcome.value] = self.outcomes.get(check.outcome.value, 0) + 1
+            await db.commit()
+
+        self.cycles += 1
+        self.last_cycle_at = datetime.utcnow()
+        return len(properties)
+
+    def stats(self) -> Dict[str, Any]:
+        """Refresh counts, for monitoring"""
+        return {
+            "running": self.running,
+            "cycles": self.cycles,
+            "outcomes": dict(self.outcomes),
+            "failed": self.failed,
+            "busy_waits": self.busy_waits,
+            "skipped_cycles": self.skipped_cycles,
+            "max_per_hour": round(3600.0 / self.min_spacing),
+            "last_cycle_at": self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+        }
+
+
+property_refresher = PropertyRefresher(
+    interval=settings.REFRESH_INTERVAL_SECONDS,
+    batch_size=settings.REFRESH_BATCH_SIZE,
+    max_per_hour=settings.REFRESH_MAX_PER_HOUR,
+    stale_after=settings.REFRESH_STALE_AFTER_SECONDS,
+    view_window=settings.REFRESH_VIEW_WINDOW_SECONDS,
+)
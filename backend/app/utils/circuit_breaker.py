@@ -0,0 +1,121 @@
+"""
+Circuit breaker over a rolling window of call outcomes and latencies
+"""
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, Tuple
+
+
+class CircuitState(str, Enum):
+    """Whether calls are let through"""
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing or answering slowly
+
+    Outcomes of the calls made in the last window_seconds are kept. Once
+    there are at least min_calls of them, the circuit opens when the share of
+    failures reaches failure_ratio, or the share of calls slower than
+    slow_call_seconds reaches slow_call_ratio. An open circuit rejects calls
+    for open_seconds, then lets a single probe through: the circuit closes if
+    it succeeds and opens again if it doesn't.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        min_calls: int,
+        failure_ratio: float,
+        slow_call_seconds: float,
+        slow_call_ratio: float,
+        open_seconds: float,
+    ):
+        self.window_seconds = window_seconds
+        self.min_calls = max(1, min_calls)
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_ratio = slow_call_ratio
+        self.open_seconds = open_seconds
+        self.state = CircuitState.CLOSED
+        # (finished at, succeeded, latency) per call
+        self._window: Deque[Tuple[float, bool, float]] = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _trim(self, now: float) -> None:
+        while self._window and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through"""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may be made now; a granted half-open probe must be recorded or abandoned"""
+        if self.state == CircuitState.OPEN and self.retry_after == 0:
+            self.state = CircuitState.HALF_OPEN
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def _open(self, now: float) -> None:
+        self.state = CircuitState.OPEN
+        self._opened_at = now
+        self.times_opened += 1
+
+    def record(self, succeeded: bool, latency: float) -> None:
+        """Record the outcome of an allowed call"""
+        now = time.monotonic()
+        if self.state == CircuitState.HALF_OPEN:
+            self._probing = False
+            if succeeded and latency < self.slow_call_seconds:
+                self.state = CircuitState.CLOSED
+                self._window.clear()
+            else:
+                self._open(now)
+            return
+
+        self._window.append((now, succeeded, latency))
+        self._trim(now)
+        if self.state != CircuitState.CLOSED or len(self._window) < self.min_calls:
+            return
+        calls = len(self._window)
+        failures = sum(1 for _, ok, _ in self._window if not ok)
+        slow = sum(1 for _, _, latency in self._window if latency >= self.slow_call_seconds)
+        if failures / calls >= self.failure_ratio or slow / calls >= self.slow_call_ratio:
+            self._open(now)
+
+    def abandon(self) -> None:
+        """Forget an allowed call that ended without an outcome (cancelled)"""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """State and the current window, for monitoring"""
+        self._trim(time.monotonic())
+        latencies = sorted(latency for _, _, latency in self._window)
+        calls = len(latencies)
+        return {
+            "state": self.state.value,
+            "retry_after": round(self.retry_after, 1),
+            "window_calls": calls,
+            "window_failures": sum(1 for _, ok, _ in self._window if not ok),
+            "window_slow_calls": sum(1 for latency in latencies if latency >= self.slow_call_seconds),
+            "window_p50_seconds": round(latencies[calls // 2], 3) if calls else None,
+            "window_p95_seconds": round(latencies[min(calls - 1, int(calls * 0.95))], 3) if calls else None,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,36 @@
+"""
+Cancel request work when the HTTP client goes away
+"""
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import Request
+
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client closed the connection before the work finished"""
+    pass
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Await awaitable, cancelling it if the client disconnects in the meantime
+
+    Only for routes whose request body has already been read, since polling
+    for the disconnect consumes incoming ASGI messages.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the work unwind (e.g. abort its upstream call) before returning
+            await asyncio.wait({task})
@@ -0,0 +1,35 @@
+"""
+Memoized content hashes of files on disk
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+
+_digests: Dict[str, Tuple[int, int, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """
+    SHA-256 of a file, re-hashed only when its mtime or size changes
+    
+    Used for template versions and download ETags, where the same few files
+    are hashed over and over.
+    """
+    stat = os.stat(path)
+    with _digests_lock:
+        memo = _digests.get(path)
+        if memo is not None and memo[0] == stat.st_mtime_ns and memo[1] == stat.st_size:
+            return memo[2]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    hexdigest = digest.hexdigest()
+    
+    with _digests_lock:
+        _digests[path] = (stat.st_mtime_ns, stat.st_size, hexdigest)
+    return hexdigest
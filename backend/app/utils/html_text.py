@@ -0,0 +1,127 @@
+"""
+Single-pass HTML-to-text conversion for LLM prompts
+"""
+import re
+import string
+from html import unescape
+from typing import Dict, List, Pattern
+
+
+DEFAULT_MAX_CHARS = 50000
+
+# Elements whose content is never visible page text, plus comments
+_SKIPPED_ELEMENTS = ("script", "style", "svg", "noscript", "template")
+_SKIPPED_START_RE = re.compile(rf"<({'|'.join(_SKIPPED_ELEMENTS)})\b|<!--", re.IGNORECASE)
+_SKIPPED_END_RE: Dict[str, Pattern[str]] = {
+    name: re.compile(rf"</{name}\s*>", re.IGNORECASE) for name in _SKIPPED_ELEMENTS
+}
+# "<" only starts a tag when followed by a name, "/", "!" or "?"; a bare "<"
+# (e.g. "price < 500k") is text
+_TAG_START_CHARS = frozenset(string.ascii_letters + "/!?")
+# Tags that start or end a block of text, kept as line breaks when asked to
+_BLOCK_TAG_RE = re.compile(
+    r"<(?:br|/?(?:p|div|li|ul|ol|dl|dt|dd|tr|table|section|article|header|footer"
+    r"|nav|aside|main|form|blockquote|figure|figcaption|h[1-6]))\b[^>]*>",
+    re.IGNORECASE,
+)
+# Text between skipped elements is normalized this many characters at a time
+_WINDOW = 64 * 1024
+
+
+def _append_text(parts: List[str], length: int, chunk: str, blocks: bool) -> int:
+    """
+    Unescape and collapse the whitespace of chunk (keeping line breaks with
+    blocks), append it to parts and return the new text length
+    """
+    if "&" in chunk:
+        chunk = unescape(chunk)
+    if blocks:
+        text = "\n".join(filter(None, (" ".join(line.split()) for line in chunk.split("\n"))))
+    else:
+        text = " ".join(chunk.split())
+    if not text:
+        return length
+    if length:
+        parts.append("\n" if blocks else " ")
+        length += 1
+    parts.append(text)
+    return length + len(text)
+
+
+def html_to_text(html: str, max_chars: int = DEFAULT_MAX_CHARS, blocks: bool = False) -> str:
+    """
+    Visible text of an HTML page with whitespace collapsed, at most max_chars long
+
+    The page is scanned once, left to right. script/style/svg/noscript/template
+    elements and comments are jumped over with a single search for their end,
+    and in the markup in between each tag is found with one search for its
+    "<" and one for its ">" (tags become spaces, whitespace runs collapse,
+    a window at a time). No character is scanned more than twice, and
+    scanning stops once the budget is filled, so a multi-megabyte page costs
+    no more than the prefix that produced the text.
+
+    With blocks=True, block-level elements (paragraphs, list items, table
+    rows, headings...) end up on lines of their own.
+    """
+    parts: List[str] = []
+    length = 0
+    pos = 0
+    size = len(html)
+    skipped = _SKIPPED_START_RE.search(html)
+
+    while pos < size and length < max_chars:
+        if skipped is not None and skipped.start() < pos:
+            skipped = _SKIPPED_START_RE.search(html, pos)
+        stop = size if skipped is None else skipped.start()
+
+        if stop > pos:
+            # Tags are found with one search for "<" and one for ">" each;
+            # without a ">" before stop, the rest is text and isn't rescanned
+            pieces: List[str] = []
+            pending = 0
+            cur = pos
+            while cur < stop:
+                lt = html.find("<", cur, stop)
+                gt = -1
+                if lt != -1 and lt + 1 < stop and html[lt + 1] in _TAG_START_CHARS:
+                    gt = html.find(">", lt + 2, stop)
+                    if gt == -1:
+                        lt = -1
+                if lt == -1:
+                    pieces.append(html[cur:stop])
+                    cur = stop
+                elif gt == -1:
+                    # A bare "<" is text
+                    pieces.append(html[cur:lt + 1])
+                    pending += lt + 1 - cur
+                    cur = lt + 1
+                else:
+                    pieces.append(html[cur:lt])
+                    pieces.append("\n" if blocks and _BLOCK_TAG_RE.match(html, lt, gt + 1) else " ")
+                    pending += gt + 1 - cur
+                    cur = gt + 1
+                    # Normalized after a tag, so no word is split
+                    if pending >= _WINDOW:
+                        length = _append_text(parts, length, "".join(pieces), blocks)
+                        pieces, pending = [], 0
+                        if length >= max_chars:
+                            break
+            length = _append_text(parts, length, "".join(pieces), blocks)
+            pos = cur
+            continue
+
+        # pos is at the start of a skipped element or comment
+        name = skipped.group(1)
+        if name is None:
+            end = html.find("-->", pos + 4)
+            pos = size if end == -1 else end + 3
+            continue
+        tag_end = html.find(">", skipped.end())
+        if tag_end == -1:
+            break
+        pos = tag_end + 1
+        if html[tag_end - 1] != "/":
+            closing = _SKIPPED_END_RE[name.lower()].search(html, pos)
+            pos = size if closing is None else closing.end()
+
+    return "".join(parts)[:max_chars]
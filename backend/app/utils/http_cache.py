@@ -0,0 +1,164 @@
+"""
+Conditional and partial (Range) responses for generated files
+"""
+import os
+import re
+from urllib.parse import quote
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from app.utils.file_digest import file_sha256
+
+
+# Generated offer PDFs are written once under a content-derived name and
+# never modified in place, so the browser may keep them indefinitely. They
+# are paid documents served without auth, so shared caches must not.
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Authorized downloads must not be stored by shared caches, but the browser
+# can keep them and revalidate cheaply with the ETag.
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def strong_etag(path: str) -> str:
+    """Strong ETag derived from the file's SHA-256"""
+    return f'"{file_sha256(path)}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for it)"""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into an inclusive (start, end)
+
+    Returns None for headers we don't serve partially (other units or
+    multiple ranges) and raises ValueError for unsatisfiable ranges.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def _iter_file_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def conditional_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    cache_control: str = PRIVATE_CACHE_CONTROL,
+) -> Response:
+    """
+    Serve a file honoring If-None-Match (304), Range/If-Range (206/416)
+    """
+    etag = strong_etag(path)
+    size = os.path.getsize(path)
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+    # Content-Disposition is set by FileResponse from filename
+    headers.pop("Content-Disposition", None)
+    return FileResponse(path=path, media_type=media_type, filename=filename, headers=headers)
+
+
+def offload_file_response(
+    mode: str,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    internal_location: str = "/internal/offers",
+    cache_control: str = PRIVATE_CACHE_CONTROL,
+) -> Response:
+    """
+    Empty response telling the front proxy to send the file itself
+
+    mode is "x-accel-redirect" (nginx; the file is addressed through an
+    internal location aliased to its directory) or "x-sendfile" (Apache
+    mod_xsendfile, lighttpd; the file is addressed by absolute path). The
+    proxy handles Range, conditional requests and the actual byte transfer.
+    """
+    headers: Dict[str, str] = {"Cache-Control": cache_control}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if mode == "x-accel-redirect":
+        headers["X-Accel-Redirect"] = f"{internal_location.rstrip('/')}/{quote(os.path.basename(path))}"
+    elif mode == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(path)
+    else:
+        raise ValueError(f"Unknown download offload mode: {mode}")
+    return Response(status_code=200, media_type=media_type, headers=headers)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for content-addressed files, which never change once written"""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,358 @@
+"""
+Shared, pooled HTTP client for fetching listing pages
+"""
+import asyncio
+import importlib.util
+import random
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import httpx
+from app.config import settings
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+# HTTP/2 needs the h2 package and "br" decoding needs brotli (httpx[http2,brotli])
+HTTP2_AVAILABLE = _has_module("h2")
+BROTLI_AVAILABLE = _has_module("brotli") or _has_module("brotlicffi")
+
+# Only advertise encodings that httpx can actually decode
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI_AVAILABLE else "gzip, deflate"
+
+# Answers listing sites give to bursty traffic; retried after a back-off
+THROTTLE_STATUSES = {403, 429, 503}
+
+
+class RequestPriority(IntEnum):
+    """Order in which requests waiting on the same host are let through"""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class _HostLimiter:
+    """
+    Token bucket, concurrency cap and cool-down for one host
+
+    Waiters are let through by priority: a background request never goes
+    ahead of a waiting interactive one, and never takes the host's last free
+    slot.
+    """
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self.tokens = float(self.burst)
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        # Requests using the limiter, including ones sleeping before a retry
+        self.users = 0
+        self.waiting: List[int] = [0] * len(RequestPriority)
+        self._changed = asyncio.Condition()
+
+    def _slots(self, priority: RequestPriority) -> int:
+        if priority == RequestPriority.BACKGROUND and self.max_concurrency > 1:
+            return self.max_concurrency - 1
+        return self.max_concurrency
+
+    def _delay(self, priority: RequestPriority) -> Optional[float]:
+        """Seconds until a request may start; None while it has to wait for a slot"""
+        if any(self.waiting[p] for p in range(priority)) or self.in_flight >= self._slots(priority):
+            return None
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        token_wait = (1 - self.tokens) / self.rate if self.rate > 0 and self.tokens < 1 else 0.0
+        return max(0.0, self.blocked_until - now, token_wait)
+
+    async def acquire(self, priority: RequestPriority) -> bool:
+        """Wait for a token and a slot; returns whether the request was held back"""
+        throttled = False
+        async with self._changed:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    delay = self._delay(priority)
+                    if delay == 0:
+                        break
+                    throttled = True
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self.waiting[priority] -= 1
+                # Lower priorities may have been waiting on this one
+                self._changed.notify_all()
+            if self.rate > 0:
+                self.tokens -= 1
+            self.in_flight += 1
+        return throttled
+
+    async def release(self) -> None:
+        # Counted before taking the lock, so a cancelled release doesn't leak a slot
+        self.in_flight -= 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    def block_for(self, seconds: float) -> None:
+        """Hold back every request to the host for seconds"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def blocked_for(self) -> float:
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    @property
+    def idle(self) -> bool:
+        """No request uses the limiter and the host isn't held back"""
+        return self.users == 0 and self.blocked_for == 0
+
+
+class PooledHttpClient:
+    """
+    One keep-alive httpx.AsyncClient shared by every listing fetch
+
+    Repeated fetches against the same few listing sites reuse pooled
+    connections instead of paying DNS, TCP and TLS setup per URL. httpx only
+    bounds connections globally, so a semaphore per host keeps one site from
+    occupying the whole pool.
+
+    Each host also has a token bucket (rate_per_host requests per second,
+    bursts of burst_per_host). Throttling answers (403, 429, 503) and
+    connection errors are retried up to max_retries times after the
+    server's Retry-After or a jittered exponential back-off; a throttling
+    answer also holds back the host's other requests for that long.
+    Retry-After waits longer than max_retry_after are not retried.
+
+    Limiters and counters are kept for at most max_hosts hosts: past that,
+    the least recently used idle hosts are forgotten.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        max_connections_per_host: int,
+        keepalive_expiry: float,
+        http2: bool,
+        rate_per_host: float = 0.0,
+        burst_per_host: int = 1,
+        max_retries: int = 0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_retry_after: float = 60.0,
+        max_hosts: int = 1024,
+    ):
+        self.max_connections = max(1, max_connections)
+        self.max_keepalive_connections = max(0, max_keepalive_connections)
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.rate_per_host = max(0.0, rate_per_host)
+        self.burst_per_host = max(1, burst_per_host)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.max_hosts = max(1, max_hosts)
+        self._client: Optional[httpx.AsyncClient] = None
+        # Least recently used first
+        self._host_limits: "OrderedDict[str, _HostLimiter]" = OrderedDict()
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.throttled: Dict[str, int] = defaultdict(int)
+        self.rate_limited: Dict[str, int] = defaultdict(int)
+        self.retries: Dict[str, int] = defaultdict(int)
+        self.total_requests = 0
+        self.errors = 0
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None
+
+    def start(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        """Create the pooled client (transport is only overridden in tests)"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    async def close(self) -> None:
+        """Close every pooled connection"""
+        client, self._client = self._client, None
+        self._host_limits.clear()
+        if client is not None:
+            await client.aclose()
+
+    def _host_limit(self, host: str) -> _HostLimiter:
+        """The host's limiter, forgetting idle hosts beyond max_hosts"""
+        limit = self._host_limits.get(host)
+        if limit is not None:
+            self._host_limits.move_to_end(host)
+            return limit
+        limit = self._host_limits[host] = _HostLimiter(
+            self.rate_per_host, self.burst_per_host, self.max_connections_per_host
+        )
+        if len(self._host_limits) > self.max_hosts:
+            for old_host, old_limit in list(self._host_limits.items())[:-1]:
+                if not old_limit.idle:
+                    continue
+                del self._host_limits[old_host]
+                for counters in (self._in_flight, self.requests, self.throttled, self.rate_limited, self.retries):
+                    counters.pop(old_host, None)
+                if len(self._host_limits) <= self.max_hosts:
+                    break
+        return limit
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential back-off before retry number attempt + 1"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def get(
+        self,
+        url: str,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """
+        GET url through the shared pool, waiting for its host's rate limit
+
+        Throttled or failed requests are retried (see the class docstring);
+        the last response is returned, or the last error raised, once retries
+        run out. The client is created on first use when the app lifespan
+        didn't start it (scripts, tests).
+        """
+        if self._client is None:
+            self.start()
+        host = urlparse(url).netloc.lower()
+        limit = self._host_limit(host)
+        limit.users += 1
+        try:
+            return await self._get(url, host, limit, priority, **kwargs)
+        finally:
+            limit.users -= 1
+
+    async def _get(
+        self,
+        url: str,
+        host: str,
+        limit: _HostLimiter,
+        priority: RequestPriority,
+        **kwargs: Any
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            if await limit.acquire(priority):
+                self.throttled[host] += 1
+            self._in_flight[host] += 1
+            self.requests[host] += 1
+            self.total_requests += 1
+            try:
+                response = await self._client.get(url, **kwargs)
+            except httpx.TransportError:
+                self.errors += 1
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+            else:
+                if response.status_code not in THROTTLE_STATUSES:
+                    return response
+                self.rate_limited[host] += 1
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                limit.block_for(min(delay, self.max_retry_after))
+                if attempt == self.max_retries or delay > self.max_retry_after:
+                    return response
+            finally:
+                self._in_flight[host] -= 1
+                await limit.release()
+
+            self.retries[host] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool configuration, open connections and per-host request counters"""
+        # httpcore's pool exposes its connections; httpx keeps the pool private
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        return {
+            "started": self.started,
+            "http2": self.http2,
+            "brotli": BROTLI_AVAILABLE,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "max_connections_per_host": self.max_connections_per_host,
+            "rate_per_host": self.rate_per_host,
+            "burst_per_host": self.burst_per_host,
+            "max_retries": self.max_retries,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "requests": self.total_requests,
+            "tracked_hosts": len(self._host_limits),
+            "errors": self.errors,
+            "hosts": {
+                host: {
+                    "requests": count,
+                    "in_flight": self._in_flight[host],
+                    "throttled": self.throttled[host],
+                    "rate_limited": self.rate_limited[host],
+                    "retries": self.retries[host],
+                    "blocked_for": round(self._host_limits[host].blocked_for, 1) if host in self._host_limits else 0.0,
+                }
+                for host, count in self.requests.items()
+            },
+        }
+
+
+http_client = PooledHttpClient(
+    max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+    max_connections_per_host=settings.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST,
+    keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    http2=settings.HTTP_CLIENT_HTTP2,
+    rate_per_host=settings.HTTP_CLIENT_RATE_PER_HOST,
+    burst_per_host=settings.HTTP_CLIENT_BURST_PER_HOST,
+    max_retries=settings.HTTP_CLIENT_MAX_RETRIES,
+    backoff_base=settings.HTTP_CLIENT_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.HTTP_CLIENT_BACKOFF_MAX_SECONDS,
+    max_retry_after=settings.HTTP_CLIENT_MAX_RETRY_AFTER_SECONDS,
+    max_hosts=settings.HTTP_CLIENT_MAX_TRACKED_HOSTS,
+)
@@ -0,0 +1,67 @@
+"""
+Listing URL normalization
+"""
+import re
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+
+# Listing id patterns by site; the id survives slug, host and tracking changes
+_LISTING_ID_PATTERNS = {
+    "zillow.com": ("zillow", re.compile(r"(\d+)_zpid")),
+    "redfin.com": ("redfin", re.compile(r"/home/(\d+)")),
+    "realtor.com": ("realtor", re.compile(r"(?:^|[_/])(M\d+-\d+)")),
+}
+
+
+def canonical_listing_url(url: str) -> str:
+    """
+    Normalized form of a listing URL, used as a cache and dedup key
+
+    Scheme and host are lower-cased, "www." is dropped, and the query string,
+    fragment and trailing slash are removed, since listing sites only use them
+    for tracking and navigation state.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, "", ""))
+
+
+def parse_listing_id(url: str) -> Optional[Tuple[str, str]]:
+    """
+    (source, listing id) of a Zillow, Redfin or realtor.com listing URL
+
+    The id is the zpid, the Redfin home id or the realtor.com property id,
+    which stay the same across mobile hosts, address slug changes and
+    tracking parameters. Returns None for other sites and for pages that
+    aren't a single listing (searches, building pages).
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for domain, (source, pattern) in _LISTING_ID_PATTERNS.items():
+        if host != domain and not host.endswith("." + domain):
+            continue
+        match = pattern.search(parts.path)
+        if match:
+            return source, match.group(1)
+        if source == "zillow":
+            # Shared and app links sometimes carry the id as ?zpid=
+            zpid = parse_qs(parts.query).get("zpid", [""])[0]
+            if zpid.isdigit():
+                return source, zpid
+        return None
+    return None
+
+
+def listing_key(url: str) -> Optional[str]:
+    """"source:id" key of a listing URL, or None when it has no recognizable id"""
+    parsed = parse_listing_id(url)
+    return f"{parsed[0]}:{parsed[1]}" if parsed else None
+
+
+def listing_cache_key(url: str) -> str:
+    """The listing key when there is one, otherwise the canonical URL"""
+    return listing_key(url) or canonical_listing_url(url)
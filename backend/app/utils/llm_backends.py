@@ -0,0 +1,221 @@
+"""
+LLM backends used by the shared LLM client
+
+GeminiBackend calls Google's API. HttpStandInBackend calls the local stand-in
+server (python -m benchmarks.llm_standin), which answers with recorded
+responses and configurable latency and errors, for load tests without an API
+key. CassetteBackend wraps either one to record every response to a JSONL
+cassette, or to answer from the recordings without calling anything, for
+deterministic offline runs.
+"""
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import httpx
+from app.config import settings
+
+
+@dataclass
+class LLMResult:
+    """Response text and the billed prompt tokens when the backend reports them"""
+    text: str
+    prompt_tokens: Optional[int] = None
+
+
+class LLMBackend(ABC):
+    """Interface of the backends; generate() may raise any error on failure"""
+    name = "backend"
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    def configure(self) -> None:
+        """Prepare the backend (no-op once done); raises when it can't be used"""
+        pass
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> LLMResult:
+        """Answer the prompt"""
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "configured": self.configured}
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini model configured once and called through its async API"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.name = f"gemini:{model_name}"
+        self._model = None
+
+    @property
+    def configured(self) -> bool:
+        return self._model is not None
+
+    def configure(self) -> None:
+        if self._model is not None:
+            return
+        api_key = settings.ai_api_key
+        if not api_key:
+            raise Exception("GOOGLE_AI_API_KEY or GEMINI_API_KEY environment variable is not set")
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise Exception("google-generativeai package is not installed")
+
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config={
+                'temperature': 0.1,
+                'response_mime_type': 'application/json',
+            }
+        )
+
+    async def generate(self, prompt: str) -> LLMResult:
+        self.configure()
+        response = await self._model.generate_content_async(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResult(response.text, getattr(usage, "prompt_token_count", None))
+
+
+class HttpStandInBackend(LLMBackend):
+    """
+    The local stand-in server
+
+    POSTs {"prompt": ...} to {base_url}/generate and expects {"text": ...};
+    any other status is an error, like a failing provider.
+    """
+
+    def __init__(self, base_url: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.name = f"standin:{self.base_url}"
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def generate(self, prompt: str) -> LLMResult:
+        if self._client is None:
+            # Timeouts are the LLM client's; the stand-in may hang on purpose
+            self._client = httpx.AsyncClient(timeout=None, transport=self._transport)
+        response = await self._client.post(f"{self.base_url}/generate", json={"prompt": prompt})
+        if response.status_code != 200:
+            raise Exception(f"LLM stand-in answered {response.status_code}: {response.text[:200]}")
+        data = response.json()
+        return LLMResult(data["text"], data.get("promptTokens"))
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode for a prompt that was never recorded"""
+    pass
+
+
+def prompt_key(prompt: str) -> str:
+    """Cassette key of a prompt"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def load_cassette(path: str) -> Dict[str, dict]:
+    """Recordings of a cassette by prompt key; the last one of a prompt wins"""
+    recordings: Dict[str, dict] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["key"]] = entry
+    return recordings
+
+
+class CassetteBackend(LLMBackend):
+    """
+    Records a backend's responses, or replays them without calling it
+
+    A cassette is a JSONL file with one {"key", "text", "promptTokens"} line
+    per prompt, keyed by prompt_key(). Replaying an unrecorded prompt raises
+    CassetteMissError.
+    """
+
+    def __init__(self, inner: Optional[LLMBackend], path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording needs a backend to record from")
+        self.inner = inner
+        self.path = path
+        self.mode = mode
+        self.name = f"{mode}:{path}" if inner is None else f"{mode}:{path}:{inner.name}"
+        self._recordings: Optional[Dict[str, dict]] = None
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+
+    @property
+    def configured(self) -> bool:
+        if self.mode == "replay":
+            return self._recordings is not None
+        return self.inner.configured
+
+    def configure(self) -> None:
+        if self.mode == "replay":
+            if self._recordings is None:
+                self._recordings = load_cassette(self.path)
+        else:
+            self.inner.configure()
+
+    async def generate(self, prompt: str) -> LLMResult:
+        key = prompt_key(prompt)
+        if self.mode == "replay":
+            self.configure()
+            entry = self._recordings.get(key)
+            if entry is None:
+                self.missed += 1
+                raise CassetteMissError(f"No recording for prompt {key[:12]} in {self.path}")
+            self.replayed += 1
+            return LLMResult(entry["text"], entry.get("promptTokens"))
+
+        result = await self.inner.generate(prompt)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "text": result.text, "promptTokens": result.prompt_tokens}) + "\n")
+        self.recorded += 1
+        return result
+
+    async def close(self) -> None:
+        if self.inner is not None:
+            await self.inner.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "missed": self.missed,
+        }
+
+
+def backend_from_settings() -> LLMBackend:
+    """The backend selected by LLM_BACKEND, wrapped per LLM_CASSETTE_MODE"""
+    if settings.LLM_BACKEND == "standin":
+        backend: LLMBackend = HttpStandInBackend(settings.LLM_STANDIN_URL)
+    elif settings.LLM_BACKEND == "gemini":
+        backend = GeminiBackend(settings.LLM_MODEL)
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {settings.LLM_BACKEND}")
+
+    if settings.LLM_CASSETTE_MODE == "off":
+        return backend
+    # Replay never calls the backend, so it doesn't need a key
+    inner = None if settings.LLM_CASSETTE_MODE == "replay" else backend
+    return CassetteBackend(inner, settings.LLM_CASSETTE_PATH, settings.LLM_CASSETTE_MODE)
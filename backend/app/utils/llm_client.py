@@ -0,0 +1,160 @@
+"""
+Shared LLM client for property extraction
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.llm_backends import LLMBackend, backend_from_settings
+from app.utils.prompt_compaction import estimate_tokens
+
+
+class LLMTimeoutError(Exception):
+    """Raised when the LLM does not answer within LLM_TIMEOUT_SECONDS"""
+    pass
+
+
+class LLMUnavailableError(Exception):
+    """Raised without calling the LLM while its circuit breaker is open"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def breaker_from_settings() -> CircuitBreaker:
+    return CircuitBreaker(
+        window_seconds=settings.LLM_BREAKER_WINDOW_SECONDS,
+        min_calls=settings.LLM_BREAKER_MIN_CALLS,
+        failure_ratio=settings.LLM_BREAKER_FAILURE_RATIO,
+        slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        slow_call_ratio=settings.LLM_BREAKER_SLOW_CALL_RATIO,
+        open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+    )
+
+
+class LLMClient:
+    """
+    LLM backend configured once and called without blocking the event loop
+
+    The backend (Gemini, the local stand-in, or a cassette; see
+    llm_backends) is configured at start-up and reused, so requests don't
+    repeat that work. A semaphore bounds how many calls run at once and each
+    one is cancelled when it exceeds the timeout or its caller is cancelled.
+
+    Every call's outcome and latency feed a circuit breaker; while it is open,
+    calls fail at once with LLMUnavailableError instead of waiting on a
+    provider that is down or too slow.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        timeout: float,
+        max_concurrency: int,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.prompt_tokens = 0
+        self.breaker = breaker or breaker_from_settings()
+
+    @property
+    def configured(self) -> bool:
+        return self.backend.configured
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def configure(self) -> None:
+        """Configure the backend (no-op once done); raises when it can't be used"""
+        self.backend.configure()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    async def generate_json(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Send prompt to the model and return the response text
+
+        timeout shortens the client's timeout for this call, including the
+        wait for a free slot. Raises LLMTimeoutError when the call takes
+        longer, and LLMUnavailableError while the circuit breaker is open.
+        """
+        self.configure()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if not self.breaker.allow():
+            retry_after = self.breaker.retry_after
+            raise LLMUnavailableError(
+                f"LLM is unavailable after repeated failures; retry in {retry_after:.0f} seconds",
+                retry_after,
+            )
+
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            # Busy, not failing: says nothing about the provider
+            self.breaker.abandon()
+            self.timeouts += 1
+            raise LLMTimeoutError(f"LLM did not respond within {timeout:g} seconds")
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+
+        self._in_flight += 1
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(
+                self.backend.generate(prompt),
+                timeout=max(0.0, deadline - started),
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.record(False, time.monotonic() - started)
+            raise LLMTimeoutError(f"LLM did not respond within {timeout:g} seconds")
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            self.breaker.abandon()
+            raise
+        except Exception:
+            self.breaker.record(False, time.monotonic() - started)
+            raise
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+        self.breaker.record(True, time.monotonic() - started)
+        # Billed count when the backend reports it, otherwise the estimate
+        self.prompt_tokens += result.prompt_tokens or estimate_tokens(prompt)
+        return result.text
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counters, for monitoring"""
+        return {
+            "backend": self.backend.stats(),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "prompt_tokens": self.prompt_tokens,
+            "circuit_breaker": self.breaker.stats(),
+        }
+
+
+llm_client = LLMClient(
+    backend=backend_from_settings(),
+    timeout=settings.LLM_TIMEOUT_SECONDS,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+)
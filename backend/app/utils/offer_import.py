@@ -0,0 +1,119 @@
+"""
+Parsing of bulk offer uploads (CSV or NDJSON)
+"""
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+
+# CSV columns folded into the nested OfferCreate dictionaries
+TIMELINE_COLUMNS = {"closingDate", "moveInDate", "flexibility"}
+CONCESSION_COLUMNS = {"sellerCredits", "repairs", "other"}
+CONTINGENCY_COLUMNS = {"inspection", "appraisal", "financing"}
+JSON_COLUMNS = {"contingencies", "timelinePreferences", "concessions"}
+
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+
+RowResult = Tuple[int, Union[Dict[str, Any], Exception]]
+
+
+class UploadFormatError(Exception):
+    """Raised when an upload can't be read at all (not UTF-8, malformed CSV)"""
+    pass
+
+
+def detect_upload_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Return "csv" or "ndjson" from the upload's file name or content type"""
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    return None
+
+
+def _csv_row_to_offer(row: Dict[str, str]) -> Dict[str, Any]:
+    """Turn a flat CSV row into the camelCase shape OfferCreate accepts"""
+    offer: Dict[str, Any] = {}
+    timeline: Dict[str, Any] = {}
+    concessions: Dict[str, Any] = {}
+    contingencies: Dict[str, Any] = {}
+    
+    for column, value in row.items():
+        if column is None or value is None:
+            continue
+        column = column.strip()
+        value = value.strip()
+        if value == "":
+            continue
+        if column in JSON_COLUMNS:
+            offer[column] = json.loads(value)
+            if not isinstance(offer[column], dict):
+                raise ValueError(f"{column} must be a JSON object")
+        elif column in TIMELINE_COLUMNS:
+            timeline[column] = value
+        elif column in CONCESSION_COLUMNS:
+            concessions[column] = value
+        elif column in CONTINGENCY_COLUMNS:
+            contingencies[column] = value.lower() in TRUE_VALUES
+        else:
+            offer[column] = value
+    
+    if timeline:
+        offer["timelinePreferences"] = {**timeline, **offer.get("timelinePreferences", {})}
+    if concessions:
+        offer["concessions"] = {**concessions, **offer.get("concessions", {})}
+    offer["contingencies"] = {**contingencies, **offer.get("contingencies", {})}
+    return offer
+
+
+def parse_offer_rows(data: bytes, upload_format: str, max_rows: int) -> List[RowResult]:
+    """
+    Decode an uploaded file into (row number, offer dict) pairs
+    
+    Rows that cannot be decoded carry their exception instead of a dict so
+    one bad line doesn't fail the whole upload. Row numbers are 1-based data
+    rows (the CSV header is not counted). Parsing stops after max_rows + 1
+    rows, enough for the caller to tell the upload is too long. Raises
+    UploadFormatError when the file itself can't be read.
+    
+    Synchronous and CPU-bound: run it off the event loop.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise UploadFormatError("Upload is not valid UTF-8 text")
+    
+    rows: List[RowResult] = []
+    try:
+        for row in _iter_rows(io.StringIO(text, newline=""), upload_format):
+            rows.append(row)
+            if len(rows) > max_rows:
+                break
+    except csv.Error as e:
+        raise UploadFormatError(f"Malformed CSV: {e}")
+    return rows
+
+
+def _iter_rows(text: TextIO, upload_format: str) -> Iterator[RowResult]:
+    if upload_format == "ndjson":
+        row_number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                value = json.loads(line)
+                if not isinstance(value, dict):
+                    raise ValueError("Each NDJSON line must be a JSON object")
+                yield row_number, value
+            except ValueError as e:
+                yield row_number, e
+    else:
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            try:
+                yield row_number, _csv_row_to_offer(row)
+            except ValueError as e:
+                yield row_number, e
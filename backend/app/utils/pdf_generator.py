@@ -2,11 +2,14 @@
 PDF generation utilities for filling contract templates
 """
 import os
-from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 from pathlib import Path
 from app.config import settings
+from app.utils.template_cache import CachedTemplate, template_cache
+from app.utils.pdf_renderer import render_pool
+from app.utils.pdf_incremental import IncrementalUpdateUnsupported, write_incremental_fill
 
 
 @dataclass
@@ -33,19 +36,23 @@ class OfferData:
     seller_name: Optional[str] = None
 
 
-def get_contract_template_path(state: str, property_type: Optional[str] = None) -> str:
+def get_contract_template_filename(property_type: Optional[str] = None) -> str:
     """
-    Get the path to the contract template based on state and property type
+    Get the contract template file name for a property type
     """
-    state_lower = state.lower()
-    
-    template_filename = 'singlefamily-resale.pdf'
     if property_type:
         prop_type_lower = property_type.lower()
         if 'condo' in prop_type_lower or 'condominium' in prop_type_lower:
-            template_filename = 'condo-resale.pdf'
-    
-    template_path = os.path.join(settings.TEMPLATES_DIR, state_lower, template_filename)
+            return 'condo-resale.pdf'
+    return 'singlefamily-resale.pdf'
+
+
+def get_contract_template_path(state: str, property_type: Optional[str] = None) -> str:
+    """
+    Get the path to the contract template based on state and property type
+    """
+    template_filename = get_contract_template_filename(property_type)
+    template_path = os.path.join(settings.TEMPLATES_DIR, state.lower(), template_filename)
     return template_path
 
 
@@ -157,61 +164,256 @@ def get_tx_condo_field_mappings(offer_data: 'OfferData') -> Dict[str, str]:
     return mappings
 
 
-async def generate_offer_letter_pdf(
+def get_field_mappings(offer_data: OfferData, property_type: Optional[str] = None) -> Dict[str, str]:
+    """
+    Get the field mappings for the offer's state and property type
+    """
+    is_condo = property_type and ('condo' in property_type.lower() or 'condominium' in property_type.lower())
+    
+    if offer_data.state.upper() == 'TX':
+        if is_condo:
+            return get_tx_condo_field_mappings(offer_data)
+        return get_tx_singlefamily_field_mappings(offer_data)
+    
+    # For other states, use generic mappings (fallback)
+    return get_tx_singlefamily_field_mappings(offer_data)
+
+
+@dataclass
+class FillPlan:
+    """
+    Precompiled index of a template's form widgets
+    
+    Maps each field name (partial /T and fully qualified name) to the
+    (page index, annotation index) of every widget that displays it, so
+    filling only visits pages that actually carry the mapped fields.
+    """
+    widgets: Dict[str, List[Tuple[int, int]]] = field(default_factory=dict)
+    
+    def group_by_page(self, values: Dict[str, str]) -> Dict[int, Dict[str, str]]:
+        """Split field values into one dict per page that holds those fields"""
+        pages: Dict[int, Dict[str, str]] = {}
+        for field_name, value in values.items():
+            for page_index, _ in self.widgets.get(field_name, ()):
+                pages.setdefault(page_index, {})[field_name] = value
+        return pages
+    
+    def unmatched(self, field_names) -> List[str]:
+        """Return the field names that match no widget in the template"""
+        return [name for name in field_names if name not in self.widgets]
+
+
+def _qualified_field_name(field_obj: Any) -> str:
+    """Build the dotted name of a form field by walking its /Parent chain"""
+    parts = []
+    while field_obj is not None:
+        if "/T" in field_obj:
+            parts.append(str(field_obj["/T"]))
+        parent = field_obj.get("/Parent")
+        field_obj = parent.get_object() if parent is not None else None
+    return ".".join(reversed(parts))
+
+
+def build_fill_plan(reader: Any) -> FillPlan:
+    """
+    Index every widget annotation of a template by field name
+    """
+    plan = FillPlan()
+    for page_index, page in enumerate(reader.pages):
+        annots = page.get("/Annots")
+        if annots is None:
+            continue
+        for annot_index, annot in enumerate(annots.get_object()):
+            annot = annot.get_object()
+            if annot.get("/Subtype") != "/Widget":
+                continue
+            if "/FT" in annot and "/T" in annot:
+                field_obj = annot
+            else:
+                parent = annot.get("/Parent")
+                if parent is None:
+                    continue
+                field_obj = parent.get_object()
+            
+            location = (page_index, annot_index)
+            names = {_qualified_field_name(field_obj)}
+            if "/T" in field_obj:
+                names.add(str(field_obj["/T"]))
+            for name in names:
+                locations = plan.widgets.setdefault(name, [])
+                if location not in locations:
+                    locations.append(location)
+    return plan
+
+
+def get_template_fill_plan(template: CachedTemplate) -> FillPlan:
+    """
+    Get the fill plan for a cached template, building it on first use
+    """
+    if template.fill_plan is None:
+        template.fill_plan = build_fill_plan(template.reader)
+    return template.fill_plan
+
+
+def get_unmatched_field_mappings(state: str, property_type: Optional[str] = None) -> List[str]:
+    """
+    Report mapping keys that match no form field in the contract template
+    
+    Useful when a template revision renames fields: those values would
+    otherwise be dropped silently.
+    """
+    template_path = get_contract_template_path(state, property_type)
+    template = template_cache.get(
+        (state.lower(), get_contract_template_filename(property_type)),
+        template_path,
+    )
+    placeholder = OfferData(
+        property_address="",
+        city="",
+        state=state,
+        zip_code="",
+        offer_price=0.0,
+        closing_date="",
+    )
+    mappings = get_field_mappings(placeholder, property_type)
+    return get_template_fill_plan(template).unmatched(mappings.keys())
+
+
+def render_offer_letter_pdf(
     offer_data: OfferData,
     property_type: Optional[str] = None
 ) -> bytes:
     """
-    Generate a filled PDF offer letter from a template
+    Fill the contract template synchronously
+    
+    CPU-bound; called on a render pool worker by generate_offer_letter_pdf.
     """
-    try:
-        from pypdf import PdfReader, PdfWriter
-    except ImportError:
-        from PyPDF2 import PdfReader, PdfWriter
+    return render_offer_letter_variants([offer_data], property_type)[0]
+
+
+def render_offer_letter_variants(
+    variants: List[OfferData],
+    property_type: Optional[str] = None
+) -> List[bytes]:
+    """
+    Fill several variants of one offer from a single template load and fill plan
+    
+    All variants must share a state. In full output mode the template is
+    cloned once; after the first variant each following one only updates
+    the fields whose values differ before being written out.
+    """
+    if not variants:
+        return []
+    state = variants[0].state
+    if any(v.state.lower() != state.lower() for v in variants):
+        raise ValueError("All offer variants must use the same state")
     
     # Get the template path
-    template_path = get_contract_template_path(offer_data.state, property_type)
+    template_path = get_contract_template_path(state, property_type)
     
     # Check if template exists
     if not os.path.exists(template_path):
         raise FileNotFoundError(f"Template not found at {template_path}. Please ensure the template file exists.")
     
-    # Read the PDF template
-    reader = PdfReader(template_path)
+    # Get the parsed template from the in-memory cache
+    template = template_cache.get(
+        (state.lower(), get_contract_template_filename(property_type)),
+        template_path,
+    )
+    fill_plan = get_template_fill_plan(template)
+    
+    # Get the appropriate field mappings based on state and property type
+    values_list = []
+    for offer_data in variants:
+        field_mappings = get_field_mappings(offer_data, property_type)
+        values_list.append({name: str(value) for name, value in field_mappings.items() if value})
+    
+    if settings.PDF_OUTPUT_MODE == "incremental":
+        try:
+            return [write_incremental_fill(template, fill_plan, values) for values in values_list]
+        except IncrementalUpdateUnsupported as e:
+            print(f"Warning: incremental PDF update not possible, writing full document: {e}")
+    
+    return _write_full_fills(template, fill_plan, values_list)
+
+
+def _write_full_fills(
+    template: CachedTemplate,
+    fill_plan: FillPlan,
+    values_list: List[Dict[str, str]]
+) -> List[bytes]:
+    """
+    Clone the whole template into a writer once, then fill and re-serialize
+    it for each set of values, touching only the fields that changed
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        from PyPDF2 import PdfWriter
+    from io import BytesIO
+    
     writer = PdfWriter()
     
     # Clone the document to preserve form fields
-    writer.clone_document_from_reader(reader)
+    writer.clone_document_from_reader(template.reader)
     
-    # Get the appropriate field mappings based on state and property type
-    is_condo = property_type and ('condo' in property_type.lower() or 'condominium' in property_type.lower())
+    outputs = []
+    current: Dict[str, str] = {}
+    for values in values_list:
+        changes = {name: value for name, value in values.items() if current.get(name) != value}
+        # Blank out fields the previous variant filled but this one doesn't
+        changes.update({name: "" for name in current if name not in values})
+        
+        # Update form fields - only on the pages that hold them
+        for page_index, page_values in fill_plan.group_by_page(changes).items():
+            writer.update_page_form_field_values(writer.pages[page_index], page_values)
+        current = values
+        
+        # Write to bytes
+        output = BytesIO()
+        writer.write(output)
+        outputs.append(output.getvalue())
+    return outputs
+
+
+def warm_template_cache() -> None:
+    """
+    Parse every contract template and build its fill plan
     
-    if offer_data.state.upper() == 'TX':
-        if is_condo:
-            field_mappings = get_tx_condo_field_mappings(offer_data)
-        else:
-            field_mappings = get_tx_singlefamily_field_mappings(offer_data)
-    else:
-        # For other states, use generic mappings (fallback)
-        field_mappings = get_tx_singlefamily_field_mappings(offer_data)
-    
-    # Update form fields - try on all pages
-    for page_num in range(len(writer.pages)):
-        for field_name, value in field_mappings.items():
-            if value:  # Only set if value is not empty
-                try:
-                    writer.update_page_form_field_values(
-                        writer.pages[page_num],
-                        {field_name: str(value)}
-                    )
-                except Exception:
-                    pass  # Field doesn't exist on this page, skip it
-    
-    # Write to bytes
-    from io import BytesIO
-    output = BytesIO()
-    writer.write(output)
-    return output.getvalue()
+    Runs as the render pool initializer so workers start with hot caches.
+    """
+    if not os.path.isdir(settings.TEMPLATES_DIR):
+        return
+    for state in sorted(os.listdir(settings.TEMPLATES_DIR)):
+        state_dir = os.path.join(settings.TEMPLATES_DIR, state)
+        if not os.path.isdir(state_dir):
+            continue
+        for filename in sorted(os.listdir(state_dir)):
+            if filename.endswith('.pdf'):
+                template = template_cache.get((state, filename), os.path.join(state_dir, filename))
+                get_template_fill_plan(template)
+
+
+async def generate_offer_letter_pdf(
+    offer_data: OfferData,
+    property_type: Optional[str] = None
+) -> bytes:
+    """
+    Generate a filled PDF offer letter from a template
+    
+    Rendering runs on the PDF render pool so the event loop stays free.
+    """
+    return await render_pool.run(render_offer_letter_pdf, offer_data, property_type)
+
+
+async def generate_offer_letter_variants(
+    variants: List[OfferData],
+    property_type: Optional[str] = None
+) -> List[bytes]:
+    """
+    Generate filled PDFs for several variants of one offer in a single render
+    """
+    return await render_pool.run(render_offer_letter_variants, variants, property_type)
 
 
 async def save_pdf_to_file(pdf_bytes: bytes, output_path: str) -> None:
@@ -0,0 +1,262 @@
+"""
+PDF incremental-update writer for filled contract forms
+
+Instead of re-serializing the whole template, the untouched template bytes
+are copied verbatim and followed by an update section that holds only the
+changed field/widget dictionaries, their new appearance streams, the
+AcroForm dictionary and a cross-reference section pointing back at the
+original one (ISO 32000-1, 7.5.6). Write cost scales with the number of
+filled fields rather than with the size of the document.
+"""
+import re
+import struct
+from io import BytesIO
+from typing import Any, Dict, List, Tuple
+
+
+class IncrementalUpdateUnsupported(Exception):
+    """Raised when a template cannot be filled with an incremental update"""
+    pass
+
+
+_DA_FONT_RE = re.compile(r"/([^\s/]+)\s+([\d.]+)\s+Tf")
+_DEFAULT_DA = "/Helv 0 Tf 0 g"
+
+
+def _generic():
+    try:
+        from pypdf import generic
+    except ImportError:
+        from PyPDF2 import generic
+    return generic
+
+
+def _find_startxref(data: bytes) -> int:
+    """Offset of the last cross-reference section of the original file"""
+    marker = data.rfind(b"startxref")
+    if marker == -1:
+        raise IncrementalUpdateUnsupported("startxref not found in template")
+    match = re.match(rb"startxref\s+(\d+)", data[marker:])
+    if not match:
+        raise IncrementalUpdateUnsupported("Malformed startxref in template")
+    return int(match.group(1))
+
+
+def _escape_pdf_text(text: str) -> bytes:
+    """Encode text as the body of a PDF literal string for a content stream"""
+    raw = text.replace("\r", " ").replace("\n", " ").encode("latin-1", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _build_text_appearance(
+    text: str,
+    rect: List[float],
+    default_appearance: str,
+    font_resources: Any,
+) -> Any:
+    """
+    Build a single-line /Tx appearance stream for a widget
+
+    Auto-sized fonts (size 0 in /DA) are fitted to the widget height and width.
+    """
+    generic = _generic()
+    width = abs(float(rect[2]) - float(rect[0]))
+    height = abs(float(rect[3]) - float(rect[1]))
+
+    match = _DA_FONT_RE.search(default_appearance)
+    font_name, font_size = (match.group(1), float(match.group(2))) if match else ("Helv", 0.0)
+    if font_size == 0:
+        font_size = max(4.0, min(12.0, (height - 2) * 0.8))
+        # Rough Helvetica advance width of half an em per character
+        if text and len(text) * font_size * 0.5 > width - 4:
+            font_size = max(4.0, (width - 4) / (len(text) * 0.5))
+    color_ops = _DA_FONT_RE.sub("", default_appearance).strip()
+    baseline = max(1.0, (height - font_size) / 2 + font_size * 0.22)
+
+    content = b"/Tx BMC\nq\n1 1 %.2f %.2f re W n\nBT\n/%s %.2f Tf %s\n2 %.2f Td\n(%s) Tj\nET\nQ\nEMC" % (
+        max(0.0, width - 2),
+        max(0.0, height - 2),
+        font_name.encode("latin-1"),
+        font_size,
+        color_ops.encode("latin-1"),
+        baseline,
+        _escape_pdf_text(text),
+    )
+
+    stream = generic.DecodedStreamObject()
+    stream.set_data(content)
+    stream[generic.NameObject("/Type")] = generic.NameObject("/XObject")
+    stream[generic.NameObject("/Subtype")] = generic.NameObject("/Form")
+    stream[generic.NameObject("/BBox")] = generic.ArrayObject(
+        [generic.FloatObject(0), generic.FloatObject(0), generic.FloatObject(width), generic.FloatObject(height)]
+    )
+    if font_resources is not None:
+        stream[generic.NameObject("/Resources")] = generic.DictionaryObject(
+            {generic.NameObject("/Font"): font_resources}
+        )
+    return stream
+
+
+def _serialize_object(out: BytesIO, idnum: int, generation: int, obj: Any) -> None:
+    out.write(b"%d %d obj\n" % (idnum, generation))
+    obj.write_to_stream(out, None)
+    out.write(b"\nendobj\n")
+
+
+def _index_runs(ids: List[int]) -> List[Tuple[int, int]]:
+    """Group sorted object numbers into (first, count) runs for xref subsections"""
+    runs: List[Tuple[int, int]] = []
+    for idnum in ids:
+        if runs and runs[-1][0] + runs[-1][1] == idnum:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((idnum, 1))
+    return runs
+
+
+def write_incremental_fill(template: Any, fill_plan: Any, values: Dict[str, str]) -> bytes:
+    """Fill text fields of a cached template and return original bytes plus an update"""
+    return b"".join((template.data, build_incremental_update(template, fill_plan, values)))
+
+
+def build_incremental_update(template: Any, fill_plan: Any, values: Dict[str, str]) -> bytes:
+    """
+    Fill text fields of a cached template and return only the update section
+
+    The section is meant to follow template.data verbatim; its offsets count
+    from the start of the template, so the template bytes are never copied here.
+
+    template is a CachedTemplate and fill_plan its FillPlan. The cached reader
+    is never mutated: every changed dictionary is copied before editing.
+    """
+    generic = _generic()
+    NameObject = generic.NameObject
+    reader = template.reader
+    data: bytes = template.data
+
+    if reader.is_encrypted:
+        raise IncrementalUpdateUnsupported("Encrypted templates are not supported")
+
+    trailer = reader.trailer
+    root_ref = trailer.raw_get("/Root")
+    acro_form_ref = root_ref.get_object().raw_get("/AcroForm")
+    if not isinstance(acro_form_ref, generic.IndirectObject):
+        raise IncrementalUpdateUnsupported("AcroForm dictionary is not an indirect object")
+    acro_form = acro_form_ref.get_object()
+    form_da = str(acro_form.get("/DA", _DEFAULT_DA))
+    form_fonts = acro_form.get("/DR", generic.DictionaryObject()).get("/Font")
+
+    # (idnum, generation) -> copied object to write in the update section
+    changed: Dict[Tuple[int, int], Any] = {}
+    next_id = int(trailer["/Size"])
+    new_objects: List[Tuple[int, Any]] = []
+
+    def editable(ref: Any) -> Any:
+        key = (ref.idnum, ref.generation)
+        if key not in changed:
+            changed[key] = generic.DictionaryObject(ref.get_object())
+        return changed[key]
+
+    for field_name, value in values.items():
+        for page_index, annot_index in fill_plan.widgets.get(field_name, ()):
+            annots = reader.pages[page_index].raw_get("/Annots").get_object()
+            annot_ref = annots[annot_index]
+            if not isinstance(annot_ref, generic.IndirectObject):
+                raise IncrementalUpdateUnsupported(f"Widget for {field_name!r} is not an indirect object")
+            annot = editable(annot_ref)
+
+            if "/FT" in annot and "/T" in annot:
+                field_obj = annot
+            else:
+                parent_ref = annot.raw_get("/Parent")
+                if not isinstance(parent_ref, generic.IndirectObject):
+                    raise IncrementalUpdateUnsupported(f"Field {field_name!r} has no indirect parent")
+                field_obj = editable(parent_ref)
+
+            if field_obj.get("/FT") not in ("/Tx", "/Ch"):
+                raise IncrementalUpdateUnsupported(f"Field {field_name!r} is not a text field")
+            field_obj[NameObject("/V")] = generic.TextStringObject(value)
+
+            default_appearance = str(annot.get("/DA", field_obj.get("/DA", form_da)))
+            font_resources = form_fonts
+            widget_dr = annot.get("/DR")
+            if widget_dr is not None and "/Font" in widget_dr:
+                font_resources = widget_dr["/Font"]
+            appearance = _build_text_appearance(value, annot["/Rect"], default_appearance, font_resources)
+
+            appearance_id = next_id
+            next_id += 1
+            new_objects.append((appearance_id, appearance))
+            annot[NameObject("/AP")] = generic.DictionaryObject(
+                {NameObject("/N"): generic.IndirectObject(appearance_id, 0, reader)}
+            )
+
+    # Ask viewers to regenerate appearances, as PdfWriter's fill does
+    form = editable(acro_form_ref)
+    form[NameObject("/NeedAppearances")] = generic.BooleanObject(True)
+
+    prev_xref = _find_startxref(data)
+    out = BytesIO()
+    if not data.endswith(b"\n"):
+        out.write(b"\n")
+
+    def position() -> int:
+        # Offset in the whole file: the update follows the template bytes
+        return len(data) + out.tell()
+
+    offsets: Dict[int, Tuple[int, int]] = {}
+    for (idnum, generation), obj in changed.items():
+        offsets[idnum] = (position(), generation)
+        _serialize_object(out, idnum, generation, obj)
+    for idnum, obj in new_objects:
+        offsets[idnum] = (position(), 0)
+        _serialize_object(out, idnum, 0, obj)
+
+    trailer_entries = {
+        NameObject("/Root"): root_ref,
+        NameObject("/Prev"): generic.NumberObject(prev_xref),
+    }
+    for key in ("/Info", "/ID"):
+        if key in trailer:
+            trailer_entries[NameObject(key)] = trailer.raw_get(key)
+
+    uses_xref_stream = not data[prev_xref:prev_xref + 4] == b"xref"
+    if uses_xref_stream:
+        # The original ends with a cross-reference stream; keep the same kind
+        xref_id = next_id
+        next_id += 1
+        xref_offset = position()
+        offsets[xref_id] = (xref_offset, 0)
+        ids = sorted(offsets)
+        rows = b"".join(
+            struct.pack(">BIH", 1, offsets[i][0], offsets[i][1]) for i in ids
+        )
+        xref_stream = generic.DecodedStreamObject()
+        xref_stream.set_data(rows)
+        xref_stream.update(trailer_entries)
+        xref_stream[NameObject("/Type")] = NameObject("/XRef")
+        xref_stream[NameObject("/Size")] = generic.NumberObject(next_id)
+        xref_stream[NameObject("/W")] = generic.ArrayObject(
+            [generic.NumberObject(1), generic.NumberObject(4), generic.NumberObject(2)]
+        )
+        xref_stream[NameObject("/Index")] = generic.ArrayObject(
+            [generic.NumberObject(n) for run in _index_runs(ids) for n in run]
+        )
+        _serialize_object(out, xref_id, 0, xref_stream)
+    else:
+        xref_offset = position()
+        ids = sorted(offsets)
+        out.write(b"xref\n")
+        for first, count in _index_runs(ids):
+            out.write(b"%d %d\n" % (first, count))
+            for idnum in range(first, first + count):
+                offset, generation = offsets[idnum]
+                out.write(b"%010d %05d n\r\n" % (offset, generation))
+        trailer_dict = generic.DictionaryObject(trailer_entries)
+        trailer_dict[NameObject("/Size")] = generic.NumberObject(next_id)
+        out.write(b"trailer\n")
+        trailer_dict.write_to_stream(out, None)
+        out.write(b"\n")
+
+    out.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+    return out.getvalue()
@@ -0,0 +1,128 @@
+"""
+Process pool for CPU-bound PDF rendering
+
+pypdf work is synchronous and holds the GIL, so running it on the event loop
+stalls every other request on the worker. The pool runs render functions in
+separate processes whose template caches are warmed when they start.
+"""
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+from app.config import settings
+
+
+class RenderQueueFullError(Exception):
+    """Raised when too many renders are already waiting for a worker"""
+    pass
+
+
+def _noop() -> None:
+    """Submitted once per worker at start-up to force the processes to spawn"""
+    return None
+
+
+class PdfRenderPool:
+    """
+    Bounded ProcessPoolExecutor wrapper
+
+    Until start() is called (or when PDF_RENDER_MODE is "inline") render
+    functions run in-process, which keeps tests and scripts simple.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._initializer: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self, initializer: Optional[Callable[[], None]] = None) -> None:
+        """Spawn the worker processes and wait until each has run initializer"""
+        if self._executor is not None:
+            return
+        self._initializer = initializer
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=initializer,
+        )
+        # Submitting one task per worker makes the executor spawn them all now
+        # instead of on the first offer request.
+        warmups = [self._executor.submit(_noop) for _ in range(self.workers)]
+        for future in warmups:
+            future.result()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) on a worker process, or inline if the pool is not running
+
+        Raises RenderQueueFullError when max_queue renders are already in flight.
+        """
+        if self._executor is None:
+            return fn(*args)
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise RenderQueueFullError(
+                    f"PDF render queue is full ({self.max_queue} renders in flight)"
+                )
+            self._pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, fn, *args)
+            self.completed += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); replace the pool so later renders work
+            self._restart()
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _restart(self) -> None:
+        with self._lock:
+            executor = self._executor
+            if executor is None:
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=self._initializer,
+            )
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool state, for monitoring"""
+        return {
+            "mode": "process" if self.started else "inline",
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+render_pool = PdfRenderPool(
+    workers=settings.PDF_RENDER_WORKERS,
+    max_queue=settings.PDF_RENDER_MAX_QUEUE,
+)
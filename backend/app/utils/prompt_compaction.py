@@ -0,0 +1,139 @@
+"""
+Relevance-based compaction of listing page text for LLM prompts
+
+Listing pages are mostly navigation, footers and "similar homes" carousels.
+Instead of sending the first N characters, the page text (one block per
+line, see html_to_text(blocks=True)) is split into segments: runs of fact-like
+lines (numbers, labels, listing signals) are grouped so a label stays with its
+value, and other lines stand alone. Each segment is scored by listing-fact
+signals, and the best ones are kept in page order until the token budget is
+filled.
+"""
+import math
+import re
+from typing import List, NamedTuple, Tuple
+
+
+# Rough ratio for English page text; avoids a tokenizer round trip per page
+CHARS_PER_TOKEN = 4
+
+# Runs of fact-like lines are grouped into segments of about this size
+_SEGMENT_CHARS = 400
+
+# Lines that can be part of a fact run even without a listing signal:
+# numbers ("1972"), labels ("Year built:") and yes/no values
+_FACT_LINE_RE = re.compile(r"\d|:$|^(?:yes|no|none)$", re.IGNORECASE)
+
+# (pattern, weight): each kind of fact counts once per segment, with a small
+# bonus for repeats so one price-heavy carousel can't outrank the fact sheet
+_SIGNALS: List[Tuple["re.Pattern[str]", float]] = [
+    (re.compile(r"\$\s?\d[\d,]*(?:\.\d+)?\s?[kKmM]?\b"), 3.0),
+    (re.compile(r"\b\d+(?:\.\d+)?\s*(?:bd|bds|beds?|bedrooms?|ba|baths?|bathrooms?)\b", re.IGNORECASE), 3.0),
+    (re.compile(r"\b(?:sq\.?\s?ft|sqft|square\s+f(?:ee|oo)t|acres?)\b", re.IGNORECASE), 2.5),
+    (re.compile(r"\bMLS\b|\bMLS\s*#|\blisting\s+id\b", re.IGNORECASE), 3.0),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), 2.5),
+    (re.compile(r"\(?\b\d{3}\)?[-.\s]\d{3}[-.\s]\d{4}\b"), 2.0),
+    (re.compile(r"\b(?:listed\s+by|listing\s+(?:agent|broker|provided)|presented\s+by|brokerage)\b", re.IGNORECASE), 2.5),
+    (re.compile(r"\b(?:year\s+built|built\s+in|HOA|lot\s+size|days\s+on|time\s+on|zestimate|estimate|offer(?:s)?\s+(?:due|deadline)|price\s+per|property\s+type)\b", re.IGNORECASE), 2.0),
+    (re.compile(r"\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b"), 2.0),
+]
+
+# Boilerplate and other listings
+_NOISE_RE = re.compile(
+    r"\b(?:similar\s+homes|nearby\s+homes|homes\s+for\s+sale\s+near|you\s+may\s+also\s+like|recently\s+sold"
+    r"|sign\s+in|log\s+in|privacy|terms\s+of\s+(?:use|service)|cookie|all\s+rights\s+reserved|equal\s+housing)\b",
+    re.IGNORECASE,
+)
+
+
+class CompactedText(NamedTuple):
+    """Page text reduced to a token budget"""
+    text: str
+    tokens: int
+    original_tokens: int
+    kept_segments: int
+    total_segments: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _has_signal(line: str) -> bool:
+    return any(pattern.search(line) for pattern, _ in _SIGNALS)
+
+
+def split_segments(text: str) -> List[str]:
+    """
+    Split text into segments: runs of fact-like lines of up to about
+    _SEGMENT_CHARS characters, and every other line on its own
+    """
+    segments: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        fact_like = (
+            _FACT_LINE_RE.search(line) is not None
+            or (current and current[-1].endswith(":"))
+            or _has_signal(line)
+        )
+        if not fact_like or (current and size + len(line) > _SEGMENT_CHARS):
+            if current:
+                segments.append("\n".join(current))
+            current, size = [], 0
+        if not fact_like:
+            segments.append(line)
+            continue
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        segments.append("\n".join(current))
+    return segments
+
+
+def score_segment(segment: str) -> float:
+    """Listing-fact signal strength of a segment (0 for pure boilerplate)"""
+    score = 0.0
+    for pattern, weight in _SIGNALS:
+        count = len(pattern.findall(segment))
+        if count:
+            score += weight + 0.25 * weight * math.log(count)
+    if score and _NOISE_RE.search(segment):
+        score *= 0.3
+    return score
+
+
+def compact_page_text(text: str, token_budget: int) -> CompactedText:
+    """
+    The most listing-relevant parts of text that fit in token_budget, in page order
+
+    Text that already fits is returned unchanged. Otherwise segments are
+    taken by score (earlier segments win ties, since listing pages lead with
+    the fact sheet) and segments without any signal are dropped.
+    """
+    original_tokens = estimate_tokens(text)
+    segments = split_segments(text)
+    if original_tokens <= token_budget:
+        return CompactedText(text, original_tokens, original_tokens, len(segments), len(segments))
+
+    ranked = sorted(
+        ((score_segment(segment), index) for index, segment in enumerate(segments)),
+        key=lambda item: (-item[0], item[1]),
+    )
+    kept: List[int] = []
+    tokens = 0
+    for score, index in ranked:
+        if score <= 0:
+            break
+        cost = estimate_tokens(segments[index]) + 1
+        if tokens + cost > token_budget:
+            continue
+        kept.append(index)
+        tokens += cost
+
+    compacted = "\n".join(segments[index] for index in sorted(kept))
+    return CompactedText(compacted, estimate_tokens(compacted), original_tokens, len(kept), len(segments))
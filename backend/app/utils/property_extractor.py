@@ -1,12 +1,19 @@
 """
 Property extraction utilities using LLM to extract structured data from real estate URLs
 """
+import asyncio
+import hashlib
 import json
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from dataclasses import dataclass
-import httpx
 from app.config import settings
+from app.utils.html_text import html_to_text
+from app.utils.http_client import ACCEPT_ENCODING, RequestPriority, http_client
+from app.utils.llm_client import LLMTimeoutError, LLMUnavailableError, llm_client
+from app.utils.prompt_compaction import CompactedText, compact_page_text, estimate_tokens
+from app.utils.structured_data import extract_structured_fields
 
 
 @dataclass
@@ -34,9 +41,27 @@ class ExtractedPropertyData:
     property_type: Optional[str] = None
 
 
-async def fetch_webpage_content(url: str) -> str:
+@dataclass
+class ListingPage:
+    """A fetched listing page and the validators to re-fetch it conditionally"""
+    html: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+
+
+async def fetch_listing_page(
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    priority: RequestPriority = RequestPriority.INTERACTIVE
+) -> ListingPage:
     """
-    Fetches the HTML content from a URL with realistic browser headers
+    Fetches a listing page with realistic browser headers
+    
+    With validators from an earlier fetch the request is conditional; a 304
+    answer gives a page with not_modified set and no HTML. Background
+    fetches give way to interactive ones on the same site.
     """
     from urllib.parse import urlparse
     
@@ -47,9 +72,8 @@ async def fetch_webpage_content(url: str) -> str:
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
         'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
+        'Accept-Encoding': ACCEPT_ENCODING,
         'DNT': '1',
-        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
         'Sec-Fetch-Dest': 'document',
         'Sec-Fetch-Mode': 'navigate',
@@ -58,136 +82,236 @@ async def fetch_webpage_content(url: str) -> str:
         'Cache-Control': 'max-age=0',
         'Referer': origin,
     }
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
     
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        response = await client.get(url, headers=headers, timeout=30.0)
-        
-        if response.status_code == 403:
-            raise Exception(
-                f"Access forbidden (403). The website may be blocking automated requests. "
-                f"This is common with real estate sites. Consider using a proxy service or browser automation tool."
-            )
-        
-        response.raise_for_status()
-        return response.text
+    # Keep-alive and connection reuse come from the shared pool; a Connection
+    # header would also be rejected on HTTP/2 connections
+    response = await http_client.get(url, priority=priority, headers=headers, timeout=30.0)
+    
+    if response.status_code == 304:
+        return ListingPage(
+            html="",
+            etag=response.headers.get('etag') or etag,
+            last_modified=response.headers.get('last-modified') or last_modified,
+            not_modified=True,
+        )
+    
+    if response.status_code == 403:
+        raise Exception(
+            f"Access forbidden (403), also after retrying. The website may be blocking automated requests. "
+            f"This is common with real estate sites. Consider using a proxy service or browser automation tool."
+        )
+    
+    response.raise_for_status()
+    return ListingPage(
+        html=response.text,
+        etag=response.headers.get('etag'),
+        last_modified=response.headers.get('last-modified'),
+    )
 
 
-async def extract_property_from_url(url: str) -> ExtractedPropertyData:
+async def fetch_webpage_content(url: str) -> str:
     """
-    Extracts property data from a URL using LLM
-    Uses Gemini's capability to analyze webpage content
+    Fetches the HTML content from a URL with realistic browser headers
     """
-    import re
-    
-    api_key = settings.ai_api_key
-    if not api_key:
-        raise Exception("GOOGLE_AI_API_KEY or GEMINI_API_KEY environment variable is not set")
-    
-    # Try to import Google AI
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=api_key)
-    except ImportError:
-        raise Exception("google-generativeai package is not installed")
-    
-    # Try to fetch webpage content directly
-    text_content: Optional[str] = None
-    fetch_error: Optional[Exception] = None
-    
-    try:
-        html_content = await fetch_webpage_content(url)
-        # Clean HTML content - remove script/style tags and get text
-        text_content = re.sub(r'<script\b[^<]*(?:(?!</script>)<[^<]*)*</script>', '', html_content, flags=re.IGNORECASE)
-        text_content = re.sub(r'<style\b[^<]*(?:(?!</style>)<[^<]*)*</style>', '', text_content, flags=re.IGNORECASE)
-        text_content = re.sub(r'<[^>]+>', ' ', text_content)
-        text_content = re.sub(r'\s+', ' ', text_content)
-        text_content = text_content.strip()[:50000]  # Limit to avoid token limits
-    except Exception as e:
-        fetch_error = e
-        print(f"Warning: Direct fetch failed, will attempt extraction with URL only: {e}")
-    
-    # Create prompt for the LLM
+    return (await fetch_listing_page(url)).html
+
+
+def page_text(html: str) -> str:
+    """Visible text of a listing page, one block per line, as read for the LLM"""
+    return html_to_text(html, max_chars=settings.LLM_PAGE_TEXT_MAX_CHARS, blocks=True)
+
+
+def page_text_hash(html: str) -> str:
+    """Hash of a listing page's visible text, unaffected by markup-only changes"""
+    return hashlib.sha256(page_text(html).encode("utf-8")).hexdigest()
+
+
+# Fields requested from the LLM, in prompt order, with their JSON description
+LLM_FIELDS: Dict[str, str] = {
+    "address": '"full street address"',
+    "city": '"city name"',
+    "state": '"state abbreviation (2 letters)"',
+    "zipCode": '"zip code"',
+    "price": 'number or null',
+    "aiFairValue": 'number or null',
+    "daysOnMarket": 'number or null',
+    "mlsNumber": '"MLS number string or null"',
+    "listingAgentName": '"agent name or null"',
+    "listingAgentEmail": '"agent email or null"',
+    "listingAgentPhone": '"agent phone or null"',
+    "offerDeadline": '"ISO date string or null"',
+    "hasHOA": 'boolean or null',
+    "builtBefore1978": 'boolean or null',
+    "bedrooms": 'number or null',
+    "bathrooms": 'number or null',
+    "squareFeet": 'number or null',
+    "lotSize": 'number or null',
+    "yearBuilt": 'number or null',
+    "propertyType": '"property type string or null"',
+}
+
+# When the page's structured data holds all of these, the LLM is not called
+REQUIRED_FIELDS = ("address", "city", "state", "zipCode", "price", "aiFairValue")
+
+# When the LLM is unavailable or out of time, structured data holding these is
+# returned on its own, marked with PARTIAL_RESULT (and not cached)
+DEGRADED_MIN_FIELDS = ("address", "city", "state")
+PARTIAL_RESULT = "partialResult"
+
+
+def _fields_schema(fields: List[str]) -> str:
+    lines = ",\n".join(f'  "{name}": {LLM_FIELDS[name]}' for name in fields)
+    return "{\n" + lines + "\n}"
+
+
+def build_extraction_prompt(
+    url: str,
+    text_content: Optional[str],
+    fields: List[str],
+    known: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Prompt asking the LLM for fields, given the page text if it could be fetched
+
+    known holds values already taken from the page's structured data; they are
+    given as context and not requested again.
+    """
+    schema = _fields_schema(fields)
     if text_content:
-        prompt = f"""You are a real estate data extraction expert. Extract property information from web pages and return structured JSON data. Always return valid JSON only.
+        known_section = ""
+        if known:
+            known_section = f"""
+Already known from the page's structured data (do not repeat these):
+{json.dumps(known, default=str)}
+"""
+        fair_value_note = ""
+        if "aiFairValue" in fields:
+            fair_value_note = """
+IMPORTANT: For "aiFairValue", analyze the property details (price, location, size, condition, market trends, comparable properties) and generate a reasonable fair market value that would be appropriate for making an offer.
+"""
+        return f"""You are a real estate data extraction expert. Extract property information from web pages and return structured JSON data. Always return valid JSON only.
 
 Extract property information from the following real estate listing page content. 
 Return a JSON object with the following structure. Use null for any fields you cannot find.
 
 URL: {url}
-
+{known_section}
 Page content:
 {text_content}
 
 Extract and return a JSON object with these exact fields:
-{{
-  "address": "full street address",
-  "city": "city name",
-  "state": "state abbreviation (2 letters)",
-  "zipCode": "zip code",
-  "price": number or null,
-  "aiFairValue": number or null,
-  "daysOnMarket": number or null,
-  "mlsNumber": "MLS number string or null",
-  "listingAgentName": "agent name or null",
-  "listingAgentEmail": "agent email or null",
-  "listingAgentPhone": "agent phone or null",
-  "offerDeadline": "ISO date string or null",
-  "hasHOA": boolean or null,
-  "builtBefore1978": boolean or null,
-  "bedrooms": number or null,
-  "bathrooms": number or null,
-  "squareFeet": number or null,
-  "lotSize": number or null,
-  "yearBuilt": number or null,
-  "propertyType": "property type string or null"
-}}
-
-IMPORTANT: For "aiFairValue", analyze the property details (price, location, size, condition, market trends, comparable properties) and generate a reasonable fair market value that would be appropriate for making an offer.
-
+{schema}
+{fair_value_note}
 Return ONLY valid JSON, no other text."""
-    else:
-        prompt = f"""You are a real estate data extraction expert. I need you to extract property information from a real estate listing URL.
+    
+    return f"""You are a real estate data extraction expert. I need you to extract property information from a real estate listing URL.
 
 IMPORTANT: Please visit this URL and extract the property information: {url}
 
 If you cannot access the URL directly, please inform me in your response. Otherwise, extract and return a JSON object with these exact fields:
-{{
-  "address": "full street address",
-  "city": "city name",
-  "state": "state abbreviation (2 letters)",
-  "zipCode": "zip code",
-  "price": number or null,
-  "aiFairValue": number or null,
-  "daysOnMarket": number or null,
-  "mlsNumber": "MLS number string or null",
-  "listingAgentName": "agent name or null",
-  "listingAgentEmail": "agent email or null",
-  "listingAgentPhone": "agent phone or null",
-  "offerDeadline": "ISO date string or null",
-  "hasHOA": boolean or null,
-  "builtBefore1978": boolean or null,
-  "bedrooms": number or null,
-  "bathrooms": number or null,
-  "squareFeet": number or null,
-  "lotSize": number or null,
-  "yearBuilt": number or null,
-  "propertyType": "property type string or null"
-}}
+{schema}
 
 Return ONLY valid JSON, no other text. If you cannot access the URL, return a JSON object with all fields set to null and include an "error" field explaining the issue."""
+
+
+def build_extracted_property_data(extracted_data: Dict[str, Any]) -> ExtractedPropertyData:
+    """Validate and convert a camelCase field dict (LLM JSON or structured data)"""
+    offer_deadline = None
+    if extracted_data.get('offerDeadline'):
+        try:
+            offer_deadline = datetime.fromisoformat(extracted_data['offerDeadline'].replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            pass
+    
+    return ExtractedPropertyData(
+        address=extracted_data.get('address') or 'Address not found',
+        city=extracted_data.get('city') or 'City not found',
+        state=extracted_data.get('state') or 'State not found',
+        zip_code=extracted_data.get('zipCode') or 'Zip not found',
+        price=extracted_data.get('price') if isinstance(extracted_data.get('price'), (int, float)) else None,
+        ai_fair_value=extracted_data.get('aiFairValue') if isinstance(extracted_data.get('aiFairValue'), (int, float)) else None,
+        days_on_market=extracted_data.get('daysOnMarket') if isinstance(extracted_data.get('daysOnMarket'), int) else None,
+        mls_number=extracted_data.get('mlsNumber'),
+        listing_agent_name=extracted_data.get('listingAgentName'),
+        listing_agent_email=extracted_data.get('listingAgentEmail'),
+        listing_agent_phone=extracted_data.get('listingAgentPhone'),
+        offer_deadline=offer_deadline,
+        has_hoa=extracted_data.get('hasHOA') if isinstance(extracted_data.get('hasHOA'), bool) else None,
+        built_before_1978=extracted_data.get('builtBefore1978') if isinstance(extracted_data.get('builtBefore1978'), bool) else None,
+        bedrooms=extracted_data.get('bedrooms') if isinstance(extracted_data.get('bedrooms'), int) else None,
+        bathrooms=extracted_data.get('bathrooms') if isinstance(extracted_data.get('bathrooms'), (int, float)) else None,
+        square_feet=extracted_data.get('squareFeet') if isinstance(extracted_data.get('squareFeet'), int) else None,
+        lot_size=extracted_data.get('lotSize') if isinstance(extracted_data.get('lotSize'), (int, float)) else None,
+        year_built=extracted_data.get('yearBuilt') if isinstance(extracted_data.get('yearBuilt'), int) else None,
+        property_type=extracted_data.get('propertyType'),
+    )
+
+
+async def extract_property_fields(
+    url: str,
+    known: Optional[Dict[str, Any]] = None,
+    page: Optional[ListingPage] = None,
+    fields: Optional[List[str]] = None,
+    token_budget: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Extracts listing fields from a URL, keyed like the LLM's JSON response
+    
+    Fields embedded as structured data (JSON-LD, OpenGraph, page state) are
+    read directly; Gemini is only asked for whatever is still missing, and not
+    at all when the structured data covers REQUIRED_FIELDS. known holds fields
+    that are still valid from an earlier extraction; fresh structured data
+    takes precedence over them. page is used instead of fetching the URL when
+    the caller already has it.
+    
+    fields narrows the extraction to those LLM_FIELDS (the LLM is skipped when
+    structured data has them all), and token_budget overrides
+    LLM_PROMPT_TOKEN_BUDGET, for small targeted prompts.
+    
+    Fetching and the LLM call share EXTRACTION_DEADLINE_SECONDS. When the LLM
+    times out or its circuit breaker is open, the structured data is returned
+    alone if it has DEGRADED_MIN_FIELDS; otherwise the error is raised.
+    """
+    deadline = time.monotonic() + settings.EXTRACTION_DEADLINE_SECONDS
+    # Try to fetch webpage content directly
+    compacted: Optional[CompactedText] = None
+    fetch_error: Optional[Exception] = None
+    structured: Dict[str, Any] = dict(known or {})
     
     try:
-        # Use Gemini model
-        model = genai.GenerativeModel(
-            model_name='gemini-1.5-flash',
-            generation_config={
-                'temperature': 0.1,
-                'response_mime_type': 'application/json',
-            }
+        if page is not None:
+            html_content = page.html
+        else:
+            html_content = await asyncio.wait_for(fetch_webpage_content(url), settings.EXTRACTION_DEADLINE_SECONDS)
+        # Visible text only, reduced to the most listing-relevant blocks
+        # that fit the prompt token budget
+        compacted = compact_page_text(page_text(html_content), token_budget or settings.LLM_PROMPT_TOKEN_BUDGET)
+        structured.update(extract_structured_fields(html_content, get_source_type(url)))
+    except Exception as e:
+        fetch_error = e
+        print(f"Warning: Direct fetch failed, will attempt extraction with URL only: {e}")
+    
+    if all(structured.get(name) is not None for name in fields or REQUIRED_FIELDS):
+        return structured
+    
+    missing = [name for name in fields or LLM_FIELDS if structured.get(name) is None]
+    prompt = build_extraction_prompt(url, compacted.text if compacted else None, missing, structured)
+    if compacted:
+        print(
+            f"LLM extraction for {url}: ~{estimate_tokens(prompt)} prompt tokens "
+            f"(page text {compacted.tokens}/{compacted.original_tokens} tokens, "
+            f"{compacted.kept_segments}/{compacted.total_segments} segments)"
         )
-        
-        response = model.generate_content(prompt)
-        response_text = response.text
+    else:
+        print(f"LLM extraction for {url}: ~{estimate_tokens(prompt)} prompt tokens (URL only)")
+    
+    try:
+        # Awaited on the shared client so the event loop keeps serving other requests
+        response_text = await llm_client.generate_json(prompt, timeout=max(0.0, deadline - time.monotonic()))
         
         if not response_text:
             raise Exception("No response from LLM")
@@ -202,55 +326,39 @@ Return ONLY valid JSON, no other text. If you cannot access the URL, return a JS
                 f"This often happens when websites block automated requests."
             )
         
-        # Convert and validate the data
-        offer_deadline = None
-        if extracted_data.get('offerDeadline'):
-            try:
-                offer_deadline = datetime.fromisoformat(extracted_data['offerDeadline'].replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                pass
-        
-        property_data = ExtractedPropertyData(
-            address=extracted_data.get('address') or 'Address not found',
-            city=extracted_data.get('city') or 'City not found',
-            state=extracted_data.get('state') or 'State not found',
-            zip_code=extracted_data.get('zipCode') or 'Zip not found',
-            price=extracted_data.get('price') if isinstance(extracted_data.get('price'), (int, float)) else None,
-            ai_fair_value=extracted_data.get('aiFairValue') if isinstance(extracted_data.get('aiFairValue'), (int, float)) else None,
-            days_on_market=extracted_data.get('daysOnMarket') if isinstance(extracted_data.get('daysOnMarket'), int) else None,
-            mls_number=extracted_data.get('mlsNumber'),
-            listing_agent_name=extracted_data.get('listingAgentName'),
-            listing_agent_email=extracted_data.get('listingAgentEmail'),
-            listing_agent_phone=extracted_data.get('listingAgentPhone'),
-            offer_deadline=offer_deadline,
-            has_hoa=extracted_data.get('hasHOA') if isinstance(extracted_data.get('hasHOA'), bool) else None,
-            built_before_1978=extracted_data.get('builtBefore1978') if isinstance(extracted_data.get('builtBefore1978'), bool) else None,
-            bedrooms=extracted_data.get('bedrooms') if isinstance(extracted_data.get('bedrooms'), int) else None,
-            bathrooms=extracted_data.get('bathrooms') if isinstance(extracted_data.get('bathrooms'), (int, float)) else None,
-            square_feet=extracted_data.get('squareFeet') if isinstance(extracted_data.get('squareFeet'), int) else None,
-            lot_size=extracted_data.get('lotSize') if isinstance(extracted_data.get('lotSize'), (int, float)) else None,
-            year_built=extracted_data.get('yearBuilt') if isinstance(extracted_data.get('yearBuilt'), int) else None,
-            property_type=extracted_data.get('propertyType'),
-        )
+        # Structured data is authoritative for the fields it has
+        extracted_data.update(structured)
         
         # If we couldn't fetch the page and got minimal data, warn about it
-        if fetch_error and (not property_data.address or property_data.address == 'Address not found'):
+        if fetch_error and not extracted_data.get('address'):
             raise Exception(
                 f"Could not fetch property page ({fetch_error}). "
                 f"The website may be blocking automated requests. "
                 f"Consider using a browser automation tool (like Playwright) or a proxy service for production use."
             )
         
-        return property_data
+        return extracted_data
         
     except json.JSONDecodeError as e:
         raise Exception(f"Failed to parse LLM response as JSON: {e}")
+    except (LLMTimeoutError, LLMUnavailableError) as e:
+        if all(structured.get(name) is not None for name in DEGRADED_MIN_FIELDS):
+            print(f"Warning: {e}; using structured data only for {url}")
+            return {**structured, PARTIAL_RESULT: True}
+        raise
     except Exception as e:
         if 'Could not fetch' in str(e) or 'LLM could not access' in str(e):
             raise
         raise Exception(f"Failed to extract property data: {e}")
 
 
+async def extract_property_from_url(url: str) -> ExtractedPropertyData:
+    """
+    Extracts property data from a URL using structured data and the LLM
+    """
+    return build_extracted_property_data(await extract_property_fields(url))
+
+
 def get_source_type(url: str) -> str:
     """Determine the source type from the URL"""
     if 'zillow.com' in url:
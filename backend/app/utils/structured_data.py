@@ -0,0 +1,310 @@
+"""
+Structured listing data (JSON-LD, OpenGraph, page state) for the extraction fast path
+
+Listing pages embed most of what the LLM would otherwise be asked for. The
+parsers here return fields under the same camelCase keys as the LLM's JSON
+response, so both results can be merged and converted the same way.
+"""
+import json
+import re
+from html import unescape
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+_SCRIPT_OPEN_RE = re.compile(r"<script\b([^>]*)>", re.IGNORECASE)
+_SCRIPT_CLOSE_RE = re.compile(r"</script\s*>", re.IGNORECASE)
+_META_RE = re.compile(r"<meta\b([^>]*)>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([a-zA-Z_:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_MLS_RE = re.compile(r"MLS\s*#?\s*:?\s*([A-Za-z0-9-]+)", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+# schema.org types that describe the home itself
+_RESIDENCE_TYPES = {
+    "singlefamilyresidence", "house", "residence", "apartment", "condominium",
+    "accommodation", "place", "product", "realestatelisting",
+}
+
+
+class PageData:
+    """The structured parts of a listing page, parsed once"""
+
+    def __init__(self, html: str):
+        self.json_ld: List[Dict[str, Any]] = []
+        self.meta: Dict[str, str] = {}
+        self.scripts: Dict[str, str] = {}  # script id -> content
+
+        for match in _SCRIPT_OPEN_RE.finditer(html):
+            attrs = _parse_attrs(match.group(1))
+            close = _SCRIPT_CLOSE_RE.search(html, match.end())
+            if close is None:
+                break
+            content = html[match.end():close.start()]
+            if attrs.get("type", "").lower() == "application/ld+json":
+                self.json_ld.extend(_flatten_json_ld(_load_json(content)))
+            elif attrs.get("id"):
+                self.scripts[attrs["id"]] = content
+
+        for match in _META_RE.finditer(html):
+            attrs = _parse_attrs(match.group(1))
+            key = attrs.get("property") or attrs.get("name")
+            if key and "content" in attrs:
+                self.meta.setdefault(key.lower(), attrs["content"])
+
+    def script_json(self, script_id: str) -> Any:
+        content = self.scripts.get(script_id)
+        return _load_json(content) if content else None
+
+
+def _parse_attrs(raw: str) -> Dict[str, str]:
+    attrs = {}
+    for name, double, single, bare in _ATTR_RE.findall(raw):
+        attrs[name.lower()] = unescape(double or single or bare)
+    return attrs
+
+
+def _load_json(text: Optional[str]) -> Any:
+    if not text:
+        return None
+    try:
+        return json.loads(text.strip())
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+def _flatten_json_ld(data: Any) -> Iterator[Dict[str, Any]]:
+    """Every JSON-LD node, unwrapping lists and @graph containers"""
+    if isinstance(data, list):
+        for item in data:
+            yield from _flatten_json_ld(item)
+    elif isinstance(data, dict):
+        if "@graph" in data:
+            yield from _flatten_json_ld(data["@graph"])
+        yield data
+
+
+def _types(node: Dict[str, Any]) -> List[str]:
+    value = node.get("@type", [])
+    return [t.lower() for t in (value if isinstance(value, list) else [value]) if isinstance(t, str)]
+
+
+def _number(value: Any) -> Optional[float]:
+    """Numbers from JSON numbers or display strings like "$1,250,000" or "2,100 sqft\""""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        return _number(value.get("value"))
+    if isinstance(value, str):
+        match = _NUMBER_RE.search(value)
+        if match:
+            return float(match.group().replace(",", ""))
+    return None
+
+
+def _integer(value: Any) -> Optional[int]:
+    number = _number(value)
+    return int(number) if number is not None else None
+
+
+def _text(value: Any) -> Optional[str]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def _dig(data: Any, *path: str) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _find_dict(data: Any, predicate: Callable[[Dict[str, Any]], bool], depth: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    First nested dict satisfying predicate (depth-first)
+
+    Strings that hold JSON objects are decoded on the way, since several sites
+    embed their state caches as serialized JSON inside the page JSON.
+    """
+    if depth > 12:
+        return None
+    if isinstance(data, str):
+        if data[:1] == "{" and len(data) > 2:
+            return _find_dict(_load_json(data), predicate, depth + 1)
+        return None
+    if isinstance(data, dict):
+        if predicate(data):
+            return data
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None
+    for child in children:
+        found = _find_dict(child, predicate, depth + 1)
+        if found is not None:
+            return found
+    return None
+
+
+def _set(fields: Dict[str, Any], key: str, value: Any) -> None:
+    """Keep the first non-empty value found for a field"""
+    if value is not None and fields.get(key) is None:
+        fields[key] = value
+
+
+def parse_json_ld(page: PageData) -> Dict[str, Any]:
+    """Fields from schema.org residence, offer and postal address nodes"""
+    fields: Dict[str, Any] = {}
+    for node in page.json_ld:
+        types = _types(node)
+        if not any(t in _RESIDENCE_TYPES or t == "offer" for t in types):
+            continue
+
+        address = node.get("address")
+        if isinstance(address, dict):
+            _set(fields, "address", _text(address.get("streetAddress")))
+            _set(fields, "city", _text(address.get("addressLocality")))
+            _set(fields, "state", _text(address.get("addressRegion")))
+            _set(fields, "zipCode", _text(address.get("postalCode")))
+
+        offers = node.get("offers")
+        if isinstance(offers, list):
+            offers = offers[0] if offers else None
+        for offer in (node if "offer" in types else None, offers):
+            if isinstance(offer, dict):
+                _set(fields, "price", _number(offer.get("price")))
+
+        _set(fields, "bedrooms", _integer(node.get("numberOfBedrooms") or node.get("numberOfRooms")))
+        _set(fields, "bathrooms", _number(node.get("numberOfBathroomsTotal") or node.get("numberOfFullBathrooms")))
+        _set(fields, "squareFeet", _integer(node.get("floorSize")))
+        _set(fields, "yearBuilt", _integer(node.get("yearBuilt")))
+        residence_type = next((t for t in types if t in _RESIDENCE_TYPES - {"product", "realestatelisting", "place"}), None)
+        if residence_type == "singlefamilyresidence":
+            residence_type = "singlefamily"
+        _set(fields, "propertyType", residence_type)
+    return fields
+
+
+def parse_open_graph(page: PageData) -> Dict[str, Any]:
+    """Fields from OpenGraph/real-estate meta tags and MLS numbers in titles"""
+    meta = page.meta
+    fields: Dict[str, Any] = {}
+    _set(fields, "address", _text(meta.get("og:street-address") or meta.get("og:street_address")))
+    _set(fields, "city", _text(meta.get("og:locality")))
+    _set(fields, "state", _text(meta.get("og:region")))
+    _set(fields, "zipCode", _text(meta.get("og:postal-code") or meta.get("og:postal_code")))
+    _set(fields, "price", _number(meta.get("product:price:amount") or meta.get("og:price:amount")))
+    for key in ("og:title", "og:description", "description"):
+        match = _MLS_RE.search(meta.get(key, ""))
+        if match:
+            _set(fields, "mlsNumber", match.group(1))
+    return fields
+
+
+def parse_zillow_state(page: PageData) -> Dict[str, Any]:
+    """Fields from the property record in Zillow's __NEXT_DATA__ cache"""
+    home = _find_dict(
+        page.script_json("__NEXT_DATA__"),
+        lambda d: "zpid" in d and ("streetAddress" in d or "address" in d) and "price" in d,
+    )
+    if home is None:
+        return {}
+    address = home.get("address") if isinstance(home.get("address"), dict) else home
+    attribution = home.get("attributionInfo") or {}
+    reso = home.get("resoFacts") or {}
+    fields: Dict[str, Any] = {}
+    _set(fields, "address", _text(address.get("streetAddress")))
+    _set(fields, "city", _text(address.get("city")))
+    _set(fields, "state", _text(address.get("state")))
+    _set(fields, "zipCode", _text(address.get("zipcode")))
+    _set(fields, "price", _number(home.get("price")))
+    _set(fields, "aiFairValue", _number(home.get("zestimate")))
+    _set(fields, "daysOnMarket", _integer(home.get("daysOnZillow")))
+    _set(fields, "mlsNumber", _text(attribution.get("mlsId")))
+    _set(fields, "listingAgentName", _text(attribution.get("agentName")))
+    _set(fields, "listingAgentEmail", _text(attribution.get("agentEmail")))
+    _set(fields, "listingAgentPhone", _text(attribution.get("agentPhoneNumber")))
+    _set(fields, "bedrooms", _integer(home.get("bedrooms")))
+    _set(fields, "bathrooms", _number(home.get("bathrooms")))
+    _set(fields, "squareFeet", _integer(home.get("livingArea")))
+    _set(fields, "lotSize", _number(home.get("lotAreaValue") or home.get("lotSize")))
+    _set(fields, "yearBuilt", _integer(home.get("yearBuilt")))
+    _set(fields, "propertyType", _text(home.get("homeType")))
+    if isinstance(reso.get("hasAssociation"), bool):
+        _set(fields, "hasHOA", reso["hasAssociation"])
+    elif _number(home.get("monthlyHoaFee")) is not None:
+        _set(fields, "hasHOA", _number(home.get("monthlyHoaFee")) > 0)
+    return fields
+
+
+def parse_realtor_state(page: PageData) -> Dict[str, Any]:
+    """Fields from the property record in realtor.com's __NEXT_DATA__"""
+    home = _find_dict(
+        page.script_json("__NEXT_DATA__"),
+        lambda d: "list_price" in d and isinstance(d.get("location"), dict),
+    )
+    if home is None:
+        return {}
+    address = _dig(home, "location", "address") or {}
+    description = home.get("description") or {}
+    advertisers = home.get("advertisers") or [{}]
+    agent = advertisers[0] if isinstance(advertisers[0], dict) else {}
+    phones = agent.get("phones") or [{}]
+    fields: Dict[str, Any] = {}
+    _set(fields, "address", _text(address.get("line")))
+    _set(fields, "city", _text(address.get("city")))
+    _set(fields, "state", _text(address.get("state_code")))
+    _set(fields, "zipCode", _text(address.get("postal_code")))
+    _set(fields, "price", _number(home.get("list_price")))
+    _set(fields, "mlsNumber", _text(_dig(home, "source", "listing_id")))
+    _set(fields, "listingAgentName", _text(agent.get("name")))
+    _set(fields, "listingAgentEmail", _text(agent.get("email")))
+    _set(fields, "listingAgentPhone", _text(phones[0].get("number") if isinstance(phones[0], dict) else None))
+    _set(fields, "bedrooms", _integer(description.get("beds")))
+    _set(fields, "bathrooms", _number(description.get("baths_consolidated") or description.get("baths")))
+    _set(fields, "squareFeet", _integer(description.get("sqft")))
+    _set(fields, "lotSize", _number(description.get("lot_sqft")))
+    _set(fields, "yearBuilt", _integer(description.get("year_built")))
+    _set(fields, "propertyType", _text(description.get("type")))
+    hoa_fee = _number(_dig(home, "hoa", "fee"))
+    if hoa_fee is not None:
+        _set(fields, "hasHOA", hoa_fee > 0)
+    return fields
+
+
+# Per-source parsers, most specific first; keyed by get_source_type()
+SOURCE_PARSERS: Dict[str, List[Callable[[PageData], Dict[str, Any]]]] = {
+    "zillow": [parse_zillow_state, parse_json_ld, parse_open_graph],
+    "redfin": [parse_json_ld, parse_open_graph],
+    "realtor": [parse_realtor_state, parse_json_ld, parse_open_graph],
+    "unknown": [parse_json_ld, parse_open_graph],
+}
+
+
+def extract_structured_fields(html: str, source_type: str) -> Dict[str, Any]:
+    """
+    Listing fields found in the page's structured data, keyed like the LLM JSON
+
+    Only fields that were found are present. A parser failing on an unexpected
+    page layout is skipped rather than failing the extraction.
+    """
+    page = PageData(html)
+    fields: Dict[str, Any] = {}
+    for parser in SOURCE_PARSERS.get(source_type, SOURCE_PARSERS["unknown"]):
+        try:
+            found = parser(page)
+        except Exception as e:
+            print(f"Warning: {parser.__name__} failed: {e}")
+            continue
+        for key, value in found.items():
+            _set(fields, key, value)
+
+    year_built = fields.get("yearBuilt")
+    if year_built:
+        _set(fields, "builtBefore1978", year_built < 1978)
+    return fields
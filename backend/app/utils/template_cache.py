@@ -0,0 +1,136 @@
+"""
+In-memory cache of parsed PDF contract templates
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+from app.config import settings
+
+
+TemplateKey = Tuple[str, str]  # (state, template filename)
+
+
+@dataclass
+class CachedTemplate:
+    """A parsed template kept in memory, ready to be cloned into a writer"""
+    key: TemplateKey
+    path: str
+    data: bytes
+    sha256: str
+    mtime_ns: int
+    size: int
+    reader: Any  # pypdf PdfReader with all objects already resolved
+    fill_plan: Optional[Any] = None  # FillPlan, built on first fill
+
+
+def _open_reader(data: bytes) -> Any:
+    """Parse template bytes and resolve every object so clones skip the parser"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+
+    reader = PdfReader(BytesIO(data))
+    # Walking the pages resolves the page tree, annotations and form fields,
+    # which is what clone_document_from_reader touches afterwards.
+    for page in reader.pages:
+        annots = page.get("/Annots")
+        if annots is not None:
+            for annot in annots:
+                annot.get_object()
+    return reader
+
+
+class TemplateCache:
+    """
+    LRU cache of parsed templates keyed by (state, template file)
+
+    Each lookup stats the file; a changed mtime or size triggers a re-hash, and
+    the template is only re-parsed when the content hash actually differs.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[TemplateKey, CachedTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key: TemplateKey, path: str) -> CachedTemplate:
+        """Return the cached template for key, loading or refreshing it if needed"""
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.path == path:
+                if entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.path == path and entry.sha256 == digest:
+                # Touched but unchanged - keep the parsed reader
+                entry.mtime_ns = stat.st_mtime_ns
+                entry.size = stat.st_size
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self.invalidations += 1
+            self.misses += 1
+
+        entry = CachedTemplate(
+            key=key,
+            path=path,
+            data=data,
+            sha256=digest,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            reader=_open_reader(data),
+        )
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        """Drop every cached template (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current contents, for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "templates": [
+                    {"state": k[0], "template": k[1], "sha256": e.sha256}
+                    for k, e in self._entries.items()
+                ],
+            }
+
+
+template_cache = TemplateCache(max_entries=settings.TEMPLATE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,104 @@
+"""
+Throughput benchmark: concurrent listing extractions through the LLM client
+
+Usage (from backend/):
+    # Record the LLM's answers once (needs GOOGLE_AI_API_KEY)
+    LLM_CASSETTE_MODE=record python -m benchmarks.bench_extraction saved-listing.html ...
+    # Deterministic and offline: the same pages answered from the cassette
+    LLM_CASSETTE_MODE=replay python -m benchmarks.bench_extraction saved-listing.html ...
+    # Provider latency and failures from the stand-in server
+    python -m benchmarks.llm_standin --cassette cassettes/llm.jsonl --latency 0.8 --error-rate 0.05 &
+    LLM_BACKEND=standin python -m benchmarks.bench_extraction --requests 200 --concurrency 16
+
+Without page arguments synthetic listing pages are used. Pages are given to
+the extractor directly, so nothing is fetched; each page always has the same
+URL, so its prompt is the same from run to run and replays from a cassette.
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Tuple
+
+from app.utils.llm_client import llm_client
+from app.utils.property_extractor import PARTIAL_RESULT, ListingPage, extract_property_fields
+
+
+def synthetic_pages(count: int = 20) -> List[Tuple[str, str]]:
+    """Listing pages without structured data, so every one needs the LLM"""
+    nav = "".join(f"<li><a href='/nav/{i}'>Menu item {i}</a></li>" for i in range(60))
+    pages = []
+    for n in range(count):
+        facts = "".join(
+            f"<li>{label}: {value}</li>"
+            for label, value in (
+                ("Bedrooms", 2 + n % 4),
+                ("Bathrooms", 1 + n % 3),
+                ("Square feet", f"{1200 + 75 * n:,}"),
+                ("Year built", 1950 + n * 3),
+                ("HOA", "None" if n % 2 else "$150/month"),
+                ("Days on market", n + 1),
+            )
+        )
+        html = (
+            f"<html><head><title>{n + 1} Benchmark Ave, Austin, TX 78701</title></head><body>"
+            f"<nav><ul>{nav}</ul></nav>"
+            f"<h1>{n + 1} Benchmark Ave</h1><p>Austin, TX 78701</p><p>List price ${400 + n * 10},000</p>"
+            f"<ul>{facts}</ul><p>Listed by Pat Agent, pat@example.com</p>"
+            f"<footer>{'Terms and privacy. ' * 50}</footer></body></html>"
+        )
+        pages.append((f"https://example.com/benchmark/{n + 1}", html))
+    return pages
+
+
+async def run(pages: List[Tuple[str, str]], requests: int, concurrency: int) -> None:
+    llm_client.configure()
+    limit = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "partial": 0}
+
+    async def extract(i: int) -> None:
+        url, html = pages[i % len(pages)]
+        async with limit:
+            started = time.perf_counter()
+            try:
+                fields = await extract_property_fields(url, page=ListingPage(html=html))
+                outcomes["partial" if fields.get(PARTIAL_RESULT) else "ok"] += 1
+            except Exception as e:
+                name = type(e).__name__
+                outcomes[name] = outcomes.get(name, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(extract(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await llm_client.close()
+
+    latencies.sort()
+    stats = llm_client.stats()
+    print(f"backend:      {stats['backend']['name']}")
+    print(f"extractions:  {requests} ({len(pages)} pages) at concurrency {concurrency}")
+    print(f"throughput:   {requests / elapsed:.1f}/s in {elapsed:.2f}s")
+    print(
+        f"latency:      p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+        f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:.0f} ms"
+    )
+    print(f"outcomes:     {outcomes}")
+    print(f"LLM calls:    {stats['calls']}, {stats['prompt_tokens']} prompt tokens, {stats['timeouts']} timeouts")
+    print(f"breaker:      {stats['circuit_breaker']['state']}, rejected {stats['circuit_breaker']['rejected']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent listing extraction benchmark")
+    parser.add_argument("pages", nargs="*", help="saved listing pages (HTML)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for path in args.pages:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((f"https://example.com/saved/{path}", f.read()))
+    else:
+        pages = synthetic_pages()
+    asyncio.run(run(pages, args.requests, args.concurrency))
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: streaming html_to_text vs. the previous regex cleanup
+
+Usage (from backend/):
+    python -m benchmarks.bench_html_text saved-zillow.html saved-redfin.html ...
+
+Without arguments a synthetic multi-megabyte listing page is used. Save real
+listing pages with your browser ("Save page as... HTML only") to benchmark
+against them.
+"""
+import re
+import sys
+import timeit
+from typing import List, Tuple
+
+from app.utils.html_text import html_to_text
+
+
+def regex_to_text(html_content: str) -> str:
+    """The cleanup extract_property_from_url used before html_to_text"""
+    text_content = re.sub(r'<script\b[^<]*(?:(?!</script>)<[^<]*)*</script>', '', html_content, flags=re.IGNORECASE)
+    text_content = re.sub(r'<style\b[^<]*(?:(?!</style>)<[^<]*)*</style>', '', text_content, flags=re.IGNORECASE)
+    text_content = re.sub(r'<[^>]+>', ' ', text_content)
+    text_content = re.sub(r'\s+', ' ', text_content)
+    return text_content.strip()[:50000]
+
+
+def synthetic_pages() -> List[Tuple[str, str]]:
+    """Pages shaped like listings: large state blobs, inline SVG icons, long text"""
+    state = '{"props":{"listing":{"price":500000,"beds":3,"photos":[%s]}}}' % ",".join(
+        '"https://photos.example.com/%d.jpg"' % i for i in range(20000)
+    )
+    icon = '<svg viewBox="0 0 24 24"><path d="%s"/></svg>' % ("M0 0L24 24 " * 50)
+    facts = "".join(
+        f"<li><span>Fact {i}</span> <b>value {i}</b> {icon}</li>\n" for i in range(4000)
+    )
+    head = (
+        "<html><head><title>123 Main St, Austin, TX 78701 | Listing</title>"
+        "<style>" + ".c{color:red}\n" * 5000 + "</style>"
+    )
+    return [
+        # More text than the budget: conversion can stop early
+        ("synthetic: long fact list", (
+            head + f'<script id="__NEXT_DATA__" type="application/json">{state}</script>'
+            "</head><body><h1>123 Main St</h1><ul>" + facts + "</ul></body></html>"
+        )),
+        # Little text, state blob at the end: the whole page must be scanned
+        ("synthetic: state blob last", (
+            head + "</head><body><h1>123 Main St</h1><ul>" + facts[:20000] + "</ul>"
+            f'<script id="__NEXT_DATA__" type="application/json">{state}</script></body></html>'
+        )),
+        # Unterminated <script> openings make the nested-lookahead regex rescan
+        # to the end of the page for each one
+        ("synthetic: unclosed script tags", (
+            head + "</head><body>" + "<p>Listing text</p><script" * 2000 + "</body></html>"
+        )),
+        # "<" followed by a name but never a ">": each one must not rescan the rest
+        ("synthetic: unclosed tags", (
+            head + "</head><body><p>Listing text</p>" + "<x" * 200_000 + "</body></html>"
+        )),
+    ]
+
+
+def run(pages: List[Tuple[str, str]], repeat: int = 5) -> None:
+    print(f"{'page':40} {'size':>10} {'regex ms':>10} {'stream ms':>10} {'speedup':>8}")
+    for name, html in pages:
+        regex_s = min(timeit.repeat(lambda: regex_to_text(html), number=1, repeat=repeat))
+        stream_s = min(timeit.repeat(lambda: html_to_text(html), number=1, repeat=repeat))
+        print(
+            f"{name[-40:]:40} {len(html):>10} {regex_s * 1000:>10.1f} "
+            f"{stream_s * 1000:>10.1f} {regex_s / stream_s:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((path, f.read()))
+    else:
+        pages = synthetic_pages()
+    run(pages)
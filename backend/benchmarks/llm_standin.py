@@ -0,0 +1,136 @@
+"""
+Local stand-in for the LLM provider, for load tests without an API key
+
+Usage (from backend/):
+    python -m benchmarks.llm_standin --cassette cassettes/llm.jsonl --latency 0.8 --jitter 0.4 \
+        --error-rate 0.05 --hang-rate 0.01 --seed 1
+
+and run the app or a benchmark with LLM_BACKEND=standin. Prompts recorded in
+the cassette (LLM_CASSETTE_MODE=record) get their recorded response; others
+get a generic listing, or a 404 with --strict. Every answer is delayed by
+latency plus up to jitter seconds; error_rate of them fail with error_status
+and hang_rate of them hang for hang_seconds, like an overloaded provider.
+GET /stats returns the counts.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.utils.llm_backends import load_cassette, prompt_key
+
+
+# Answer to prompts that aren't in the cassette
+FALLBACK_TEXT = json.dumps({
+    "address": "1 Stand-in St",
+    "city": "Austin",
+    "state": "TX",
+    "zipCode": "78701",
+    "price": 500000,
+    "aiFairValue": 505000,
+    "daysOnMarket": 10,
+    "bedrooms": 3,
+    "bathrooms": 2,
+    "squareFeet": 1800,
+    "yearBuilt": 1995,
+    "propertyType": "singlefamily",
+})
+
+
+@dataclass
+class StandInProfile:
+    """Latency and failures of the stand-in's answers"""
+    latency: float = 0.5
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    hang_rate: float = 0.0
+    hang_seconds: float = 120.0
+    strict: bool = False
+    seed: Optional[int] = None
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+
+
+def create_app(recordings: Dict[str, dict], profile: StandInProfile) -> FastAPI:
+    """Stand-in app answering from recordings (keyed by prompt_key) with profile"""
+    app = FastAPI(title="LLM stand-in")
+    rng = random.Random(profile.seed)
+    counts = {"requests": 0, "recorded": 0, "fallback": 0, "missed": 0, "errors": 0, "hangs": 0}
+
+    @app.post("/generate")
+    async def generate(request: GenerateRequest):
+        counts["requests"] += 1
+        # Drawn up front so a seeded run makes the same choices in order
+        roll = rng.random()
+        delay = profile.latency + rng.uniform(0, profile.jitter)
+
+        if roll < profile.hang_rate:
+            counts["hangs"] += 1
+            await asyncio.sleep(profile.hang_seconds)
+        else:
+            await asyncio.sleep(delay)
+        if roll >= 1 - profile.error_rate:
+            counts["errors"] += 1
+            return JSONResponse({"error": "stand-in error"}, status_code=profile.error_status)
+
+        entry = recordings.get(prompt_key(request.prompt))
+        if entry is not None:
+            counts["recorded"] += 1
+            return {"text": entry["text"], "promptTokens": entry.get("promptTokens")}
+        if profile.strict:
+            counts["missed"] += 1
+            return JSONResponse({"error": "prompt not recorded"}, status_code=404)
+        counts["fallback"] += 1
+        return {"text": FALLBACK_TEXT, "promptTokens": None}
+
+    @app.get("/stats")
+    async def stats():
+        return dict(counts)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--cassette", help="JSONL cassette recorded with LLM_CASSETTE_MODE=record")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds added to every answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--strict", action="store_true", help="404 for prompts not in the cassette")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    recordings = load_cassette(args.cassette) if args.cassette and os.path.exists(args.cassette) else {}
+    profile = StandInProfile(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        strict=args.strict,
+        seed=args.seed,
+    )
+    print(f"LLM stand-in: {len(recordings)} recorded prompts, {profile}")
+
+    import uvicorn
+    uvicorn.run(create_app(recordings, profile), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
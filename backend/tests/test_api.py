@@ -68,3 +68,384 @@ async def test_get_offer_not_found(client: AsyncClient):
     """Test getting a non-existent offer"""
     response = await client.get("/api/offer/nonexistent-id")
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_identical_offers_share_one_pdf(client: AsyncClient, test_db, tmp_path, monkeypatch):
+    """Test that resubmitted terms reuse the PDF and deletes are reference counted"""
+    import os
+    from sqlalchemy import select
+    from app.config import settings
+    from app.models.offer import Offer
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    offer_data = {
+        "address": "123 Test Street",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78701",
+        "financingType": "conventional",
+        "offerPrice": 500000.0,
+        "contingencies": {"inspection": True},
+        "timelinePreferences": {"closingDate": "2024-03-01"},
+    }
+
+    first = (await client.post("/api/offer/create", json=offer_data)).json()["offerId"]
+    second = (await client.post("/api/offer/create", json=offer_data)).json()["offerId"]
+
+    offers = (await test_db.execute(select(Offer).where(Offer.id.in_([first, second])))).scalars().all()
+    urls = {offer.offer_letter_url for offer in offers}
+    assert len(urls) == 1
+    pdf_path = os.path.join(str(tmp_path), os.path.basename(urls.pop()))
+    assert os.listdir(tmp_path) == [os.path.basename(pdf_path)]
+
+    by_id = {offer.id: offer for offer in offers}
+    await test_db.delete(by_id[first])
+    await test_db.commit()
+    assert os.path.exists(pdf_path)
+
+    await test_db.delete(by_id[second])
+    await test_db.commit()
+    assert not os.path.exists(pdf_path)
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_property_releases_its_offer_letters(client: AsyncClient, test_db, tmp_path, monkeypatch):
+    """Test that offers removed by the property cascade release their PDF"""
+    import os
+    from sqlalchemy import select
+    from app.config import settings
+    from app.models.offer import Offer
+    from app.models.offer_document import OfferDocument
+    from app.models.property import Property
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    offer_data = {
+        "address": "789 Cascade Court",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78701",
+        "financingType": "cash",
+        "offerPrice": 410000.0,
+        "contingencies": {"inspection": True},
+        "timelinePreferences": {"closingDate": "2024-03-01"},
+    }
+    offer_id = (await client.post("/api/offer/create", json=offer_data)).json()["offerId"]
+    offer = (await test_db.execute(select(Offer).where(Offer.id == offer_id))).scalar_one()
+    pdf_path = os.path.join(str(tmp_path), os.path.basename(offer.offer_letter_url))
+    assert os.path.exists(pdf_path)
+
+    property = (await test_db.execute(select(Property).where(Property.id == offer.property_id))).scalar_one()
+    await test_db.delete(property)
+    await test_db.commit()
+
+    assert not os.path.exists(pdf_path)
+    assert (await test_db.execute(select(OfferDocument))).scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_lazy_offer_letter_renders_on_first_access(client: AsyncClient, test_db, tmp_path, monkeypatch):
+    """Test that lazy mode defers the PDF until the letter itself is fetched"""
+    import os
+    from app.config import settings
+    from app.models.offer import Offer
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "OFFER_LETTER_RENDER_MODE", "lazy")
+    offer_data = {
+        "address": "456 Lazy Lane",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78702",
+        "financingType": "cash",
+        "offerPrice": 350000.0,
+        "contingencies": {},
+    }
+
+    offer_id = (await client.post("/api/offer/create", json=offer_data)).json()["offerId"]
+    offer = await test_db.get(Offer, offer_id)
+    assert offer.offer_letter_url is None
+    assert os.listdir(tmp_path) == []
+
+    # The offer JSON alone doesn't render; its URL renders when fetched
+    response = await client.get(f"/api/offer/{offer_id}")
+    assert response.status_code == 200
+    letter_url = response.json()["offerLetterUrl"]
+    assert letter_url == f"/api/offer/{offer_id}/letter"
+    assert os.listdir(tmp_path) == []
+
+    response = await client.get(letter_url)
+    assert response.status_code == 307
+    assert response.headers["location"] == offer.offer_letter_url
+    pdf_path = os.path.join(str(tmp_path), os.path.basename(offer.offer_letter_url))
+    assert os.path.exists(pdf_path)
+    assert (await client.get(f"/api/offer/{offer_id}")).json()["offerLetterUrl"] == offer.offer_letter_url
+
+    # An evicted file is rendered again on the next access
+    os.remove(pdf_path)
+    await client.get(letter_url)
+    assert os.path.exists(pdf_path)
+
+
+@pytest.mark.asyncio
+async def test_create_offer_batch_from_csv(client: AsyncClient, tmp_path, monkeypatch):
+    """Test the bulk upload endpoint with valid, duplicate and invalid rows"""
+    import os
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    csv_body = (
+        "address,city,state,zipCode,financingType,offerPrice,closingDate,sellerCredits,inspection\n"
+        "1 Batch Rd,Austin,TX,78701,conventional,400000,2024-04-01,2500,yes\n"
+        "1 Batch Rd,Austin,TX,78701,conventional,400000,2024-04-01,2500,yes\n"
+        "2 Batch Rd,Austin,TX,78701,cash,not-a-price,,,\n"
+    )
+
+    response = await client.post(
+        "/api/offer/batch",
+        files={"file": ("offers.csv", csv_body, "text/csv")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["totalRows"] == 3
+    assert data["succeededRows"] == 2
+    assert data["failedRows"] == 1
+    assert [r["row"] for r in data["results"]] == [1, 2, 3]
+    assert "offerPrice" in data["results"][2]["error"]
+    assert data["results"][0]["offerLetterUrl"] == data["results"][1]["offerLetterUrl"]
+    assert len(os.listdir(tmp_path)) == 1
+
+    job = await client.get(f"/api/offer/batch/{data['jobId']}")
+    assert job.status_code == 200
+    assert job.json()["results"] == data["results"]
+
+
+@pytest.mark.asyncio
+async def test_create_offer_batch_from_ndjson(client: AsyncClient, tmp_path, monkeypatch):
+    """Test NDJSON uploads, including a line that isn't valid JSON"""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    ndjson_body = (
+        '{"address": "3 Batch Rd", "city": "Austin", "state": "TX", "zipCode": "78701",'
+        ' "financingType": "fha", "offerPrice": 300000, "contingencies": {"financing": true}}\n'
+        '{not json}\n'
+    )
+
+    response = await client.post(
+        "/api/offer/batch",
+        files={"file": ("offers.ndjson", ndjson_body, "application/x-ndjson")},
+    )
+    data = response.json()
+    assert data["succeededRows"] == 1
+    assert data["results"][1]["error"].startswith("Invalid row")
+
+
+@pytest.mark.asyncio
+async def test_create_offer_variants(client: AsyncClient, test_db, tmp_path, monkeypatch):
+    """Test creating a price ladder of offers in one call"""
+    import os
+    from app.config import settings
+    from app.models.offer import Offer
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    request = {
+        "address": "5 Ladder Ln",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78704",
+        "financingType": "conventional",
+        "offerPrice": 500000.0,
+        "contingencies": {"inspection": True},
+        "timelinePreferences": {"closingDate": "2024-06-01"},
+        "variants": [
+            {"offerPrice": 490000.0},
+            {"offerPrice": 500000.0, "sellerCredits": 5000},
+            {"offerPrice": 510000.0, "closingDate": "2024-06-15"},
+        ],
+    }
+
+    response = await client.post("/api/offer/variants", json=request)
+    assert response.status_code == 200
+    offer_ids = response.json()["offerIds"]
+    assert len(offer_ids) == 3
+
+    offers = [await test_db.get(Offer, offer_id) for offer_id in offer_ids]
+    assert [o.offer_price for o in offers] == [490000.0, 500000.0, 510000.0]
+    assert offers[1].concessions == {"sellerCredits": "5000.0"}
+    assert offers[2].timeline_preferences == {"closingDate": "2024-06-15"}
+    assert all(o.offer_letter_url for o in offers)
+    # The seller credits and closing date variants produce distinct letters
+    assert len(os.listdir(tmp_path)) == 3
+
+
+@pytest.mark.asyncio
+async def test_full_render_queue_answers_503(client: AsyncClient, test_db, tmp_path, monkeypatch):
+    """Test that a saturated render pool reaches the client instead of a PDF-less offer"""
+    import os
+    from sqlalchemy import select
+    from app.config import settings
+    from app.models.offer import Offer
+    from app.models.offer_batch import OfferBatchJob
+    from app.utils.pdf_renderer import render_pool
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    # Every render slot is taken
+    monkeypatch.setattr(render_pool, "_executor", object())
+    monkeypatch.setattr(render_pool, "_pending", render_pool.max_queue)
+    offer_data = {
+        "address": "11 Busy Blvd",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78701",
+        "financingType": "cash",
+        "offerPrice": 350000.0,
+        "contingencies": {},
+    }
+
+    response = await client.post("/api/offer/create", json=offer_data)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+    response = await client.post("/api/offer/variants", json={**offer_data, "variants": [{"offerPrice": 340000.0}]})
+    assert response.status_code == 503
+
+    csv_body = "address,city,state,zipCode,financingType,offerPrice\n11 Busy Blvd,Austin,TX,78701,cash,350000\n"
+    response = await client.post("/api/offer/batch", files={"file": ("offers.csv", csv_body, "text/csv")})
+    assert response.status_code == 503
+
+    assert (await test_db.execute(select(Offer))).scalars().all() == []
+    assert (await test_db.execute(select(OfferBatchJob))).scalars().all() == []
+    assert os.listdir(tmp_path) == []
+
+
+async def create_paid_offer(client: AsyncClient, test_db) -> str:
+    """Create an offer with a completed download payment and return its id"""
+    from app.models.offer import Offer
+    from app.models.payment import Payment, PaymentStatus, PaymentType
+
+    offer_data = {
+        "address": "9 Range Road",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78705",
+        "financingType": "cash",
+        "offerPrice": 420000.0,
+        "contingencies": {},
+    }
+    offer_id = (await client.post("/api/offer/create", json=offer_data)).json()["offerId"]
+    offer = await test_db.get(Offer, offer_id)
+    test_db.add(Payment(
+        user_id=offer.user_id,
+        offer_id=offer_id,
+        amount=9.99,
+        status=PaymentStatus.COMPLETED,
+        payment_type=PaymentType.SINGLE_DOWNLOAD,
+    ))
+    await test_db.commit()
+    return offer_id
+
+
+@pytest.mark.asyncio
+async def test_download_supports_conditional_and_range_requests(client: AsyncClient, test_db, tmp_path, monkeypatch):
+    """Test ETag revalidation and byte-range downloads of a paid offer letter"""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    offer_id = await create_paid_offer(client, test_db)
+    url = f"/api/offer/{offer_id}/download"
+
+    full = await client.get(url)
+    assert full.status_code == 200
+    assert full.content.startswith(b"%PDF")
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+
+    partial = await client.get(url, headers={"Range": "bytes=0-99", "If-Range": etag})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 0-99/{len(full.content)}"
+    assert partial.content == full.content[:100]
+
+    tail = await client.get(url, headers={"Range": "bytes=-10"})
+    assert tail.content == full.content[-10:]
+
+    # A stale If-Range validator gets the whole file instead of a fragment
+    stale = await client.get(url, headers={"Range": "bytes=0-99", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == full.content
+
+    unsatisfiable = await client.get(url, headers={"Range": f"bytes={len(full.content)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(full.content)}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode, header", [
+    ("x-accel-redirect", "x-accel-redirect"),
+    ("x-sendfile", "x-sendfile"),
+])
+async def test_download_offload_mode(client: AsyncClient, test_db, tmp_path, monkeypatch, mode, header):
+    """Test that offload modes only authorize and leave the bytes to the proxy"""
+    import os
+    from app.config import settings
+    from app.models.offer import Offer
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "OFFER_DOWNLOAD_MODE", mode)
+
+    unpaid = (await client.post("/api/offer/create", json={
+        "address": "10 Proxy Place",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78705",
+        "financingType": "cash",
+        "offerPrice": 300000.0,
+        "contingencies": {},
+    })).json()["offerId"]
+    response = await client.get(f"/api/offer/{unpaid}/download")
+    assert response.status_code == 403
+    assert header not in response.headers
+
+    offer_id = await create_paid_offer(client, test_db)
+    file_name = os.path.basename((await test_db.get(Offer, offer_id)).offer_letter_url)
+    response = await client.get(f"/api/offer/{offer_id}/download")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-type"] == "application/pdf"
+    assert f"offer-letter-{offer_id}.pdf" in response.headers["content-disposition"]
+    if mode == "x-accel-redirect":
+        assert response.headers[header] == f"/internal/offers/{file_name}"
+    else:
+        assert response.headers[header] == os.path.join(str(tmp_path), file_name)
+
+
+@pytest.mark.asyncio
+async def test_create_offer_batch_rejects_unreadable_uploads(client: AsyncClient, tmp_path, monkeypatch):
+    """Test that undecodable or oversized uploads are rejected and non-object JSON cells a row error"""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    header = "address,city,state,zipCode,financingType,offerPrice,contingencies\n"
+
+    response = await client.post(
+        "/api/offer/batch",
+        files={"file": ("offers.csv", header.encode() + b"4 Batch Rd,Austin,TX,78701,cash,1\xff\n", "text/csv")},
+    )
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+
+    response = await client.post(
+        "/api/offer/batch",
+        files={"file": ("offers.csv", header + '4 Batch Rd,Austin,TX,78701,cash,300000,[1]\n', "text/csv")},
+    )
+    assert response.status_code == 200
+    assert response.json()["results"][0]["error"] == "Invalid row: contingencies must be a JSON object"
+
+    monkeypatch.setattr(settings, "OFFER_BATCH_MAX_BYTES", len(header))
+    response = await client.post(
+        "/api/offer/batch",
+        files={"file": ("offers.csv", header + '4 Batch Rd,Austin,TX,78701,cash,300000,\n', "text/csv")},
+    )
+    assert response.status_code == 413
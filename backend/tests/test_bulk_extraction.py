@@ -0,0 +1,92 @@
+"""
+Bulk extraction tests
+"""
+import asyncio
+import json
+from collections import Counter
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.database import Base, get_session_maker
+from app.main import app
+from app.models.property import Property
+from app.services import bulk_extraction
+from app.utils.listing_url import listing_key
+from app.utils.property_extractor import ExtractedPropertyData
+
+
+@pytest.mark.asyncio
+async def test_bulk_extraction_streams_ndjson(tmp_path, monkeypatch):
+    """Test dedup, existing listings, per-site limits and streamed results"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bulk.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    existing_url = "https://www.zillow.com/homedetails/x/100_zpid/"
+    async with session_maker() as db:
+        existing = Property(source_url=existing_url, listing_key=listing_key(existing_url), address="100 Old St",
+                            city="Austin", state="TX", zip_code="78701", property_type="singlefamily")
+        db.add(existing)
+        await db.commit()
+
+    active = Counter()
+    peak = Counter()
+    calls = []
+
+    async def extract_property_cached(db, url):
+        domain = bulk_extraction.listing_domain(url)
+        calls.append(url)
+        active[domain] += 1
+        peak[domain] = max(peak[domain], active[domain])
+        await asyncio.sleep(0.02)
+        active[domain] -= 1
+        if "broken" in url:
+            raise ValueError("Could not extract listing")
+        return ExtractedPropertyData(address=url.rsplit("/", 1)[-1], city="Austin", state="TX", zip_code="78701")
+
+    monkeypatch.setattr(bulk_extraction, "extract_property_cached", extract_property_cached)
+    monkeypatch.setattr(settings, "BULK_EXTRACT_PER_DOMAIN_CONCURRENCY", 2)
+    app.dependency_overrides[get_session_maker] = lambda: session_maker
+
+    urls = [f"https://www.redfin.com/TX/Austin/home/{n}" for n in range(6)]
+    urls += [
+        "https://m.zillow.com/homedetails/100_zpid?utm_source=share",
+        "https://www.redfin.com/TX/Austin/other-slug/home/0/",
+        "https://example.com/broken",
+        "",
+    ]
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/property/extract/bulk", json={"urls": urls})
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["index"]: line for line in lines}
+    assert sorted(results) == list(range(len(urls)))
+
+    assert results[6] == {"index": 6, "url": urls[6], "status": "existing", "propertyId": existing.id, "error": None}
+    assert results[7]["status"] == "extracted"
+    assert results[7]["propertyId"] == results[0]["propertyId"]
+    assert results[8]["status"] == "failed"
+    assert results[8]["error"] == "Could not extract listing"
+    assert results[9]["status"] == "failed"
+
+    # Each listing was extracted once, never more than two at a time per site
+    assert len(calls) == 7
+    assert peak["redfin.com"] == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_extraction_rejects_too_many_urls(client: AsyncClient, monkeypatch):
+    """Test the per-request URL limit"""
+    monkeypatch.setattr(settings, "BULK_EXTRACT_MAX_URLS", 2)
+    response = await client.post("/api/property/extract/bulk", json={"urls": ["a", "b", "c"]})
+    assert response.status_code == 400
@@ -0,0 +1,190 @@
+"""
+Extraction cache tests
+"""
+import time
+import pytest
+
+from app.services import extraction_cache as cache_module
+from app.services.extraction_cache import ExtractionCache
+
+
+FIELDS = {
+    "address": "1 Cache Ct",
+    "city": "Austin",
+    "state": "TX",
+    "zipCode": "78701",
+    "price": 450000,
+    "aiFairValue": 455000,
+    "squareFeet": 1800,
+    "listingAgentEmail": None,
+}
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_is_served_from_memory_and_table(test_db):
+    """Test that a stored extraction is a complete hit, also after the memory tier is dropped"""
+    cache = ExtractionCache(max_entries=4, static_ttl=3600, volatile_ttl=60)
+    await cache.store(test_db, "https://www.zillow.com/homedetails/1-Cache-Ct/1_zpid/?utm_source=x", FIELDS)
+
+    fresh, complete = await cache.lookup(test_db, "https://zillow.com/homedetails/1-Cache-Ct/1_zpid")
+    assert complete
+    assert fresh["squareFeet"] == 1800
+    assert "listingAgentEmail" not in fresh
+
+    cache.clear()
+    fresh, complete = await cache.lookup(test_db, "https://zillow.com/homedetails/1-Cache-Ct/1_zpid/")
+    assert complete
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["memory_hits"] == 1
+    assert stats["hit_ratio"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_volatile_fields_expire_first(test_db, monkeypatch):
+    """Test that expired price fields leave the static facts usable"""
+    cache = ExtractionCache(max_entries=4, static_ttl=3600, volatile_ttl=60)
+    await cache.store(test_db, "https://redfin.com/TX/Austin/home/1", FIELDS)
+
+    later = time.time() + 120
+    monkeypatch.setattr(cache_module.time, "time", lambda: later)
+    fresh, complete = await cache.lookup(test_db, "https://redfin.com/TX/Austin/home/1")
+
+    assert not complete
+    assert fresh["address"] == "1 Cache Ct"
+    assert "price" not in fresh
+    assert cache.stats()["partial_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_extraction_skips_fetch_and_llm(test_db, monkeypatch):
+    """Test that only the first of two extractions does any work"""
+    calls = []
+
+    async def extract_property_fields(url, known=None):
+        calls.append(known)
+        return dict(FIELDS)
+
+    monkeypatch.setattr(cache_module, "extract_property_fields", extract_property_fields)
+    monkeypatch.setattr(cache_module, "extraction_cache", ExtractionCache(4, 3600, 60))
+
+    first = await cache_module.extract_property_cached(test_db, "https://realtor.com/realestateandhomes-detail/1")
+    second = await cache_module.extract_property_cached(test_db, "https://realtor.com/realestateandhomes-detail/1")
+
+    assert first == second
+    assert second.address == "1 Cache Ct"
+    assert calls == [{}]
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    """Sessions on a file database, so concurrent callers can each have one"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from app.database import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'extract.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_extractions_are_coalesced(session_maker, monkeypatch):
+    """Test that simultaneous requests for one listing run a single extraction"""
+    import asyncio
+
+    calls = []
+
+    async def extract_property_fields(url, known=None):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return dict(FIELDS)
+
+    monkeypatch.setattr(cache_module, "extract_property_fields", extract_property_fields)
+    monkeypatch.setattr(cache_module, "extraction_cache", ExtractionCache(4, 3600, 60))
+
+    async def extract(url):
+        async with session_maker() as db:
+            return await cache_module.extract_property_cached(db, url)
+
+    results = await asyncio.gather(
+        extract("https://www.zillow.com/homedetails/1_zpid/"),
+        extract("https://zillow.com/homedetails/1_zpid?utm_source=share"),
+        extract("https://zillow.com/homedetails/1_zpid"),
+    )
+
+    assert len(calls) == 1
+    assert all(r.address == "1 Cache Ct" for r in results)
+    assert cache_module.extraction_cache.stats()["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_first_caller_is_cancelled(session_maker, monkeypatch):
+    """Test that a disconnecting first caller doesn't fail the callers waiting on it"""
+    import asyncio
+
+    calls = []
+
+    async def extract_property_fields(url, known=None):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return dict(FIELDS)
+
+    monkeypatch.setattr(cache_module, "extract_property_fields", extract_property_fields)
+    monkeypatch.setattr(cache_module, "extraction_cache", ExtractionCache(4, 3600, 60))
+
+    async def extract():
+        async with session_maker() as db:
+            return await cache_module.extract_property_cached(db, "https://redfin.com/home/2")
+
+    first = asyncio.ensure_future(extract())
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(extract())
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert (await second).address == "1 Cache Ct"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_waits_for_lease_held_by_another_worker(session_maker, monkeypatch):
+    """Test that a listing leased by another process is read from the cache it fills"""
+    import asyncio
+    from datetime import datetime, timedelta
+    from sqlalchemy import delete
+    from app.config import settings
+    from app.models.extraction_lease import ExtractionLease
+    from app.utils.listing_url import listing_cache_key
+
+    async def extract_property_fields(url, known=None):
+        raise AssertionError("The lease holder's result should be reused")
+
+    cache = ExtractionCache(4, 3600, 60)
+    monkeypatch.setattr(cache_module, "extract_property_fields", extract_property_fields)
+    monkeypatch.setattr(cache_module, "extraction_cache", cache)
+    monkeypatch.setattr(settings, "EXTRACTION_LEASE_POLL_SECONDS", 0.01)
+
+    url = "https://realtor.com/realestateandhomes-detail/3"
+    key = listing_cache_key(url)
+    async with session_maker() as other_worker:
+        other_worker.add(ExtractionLease(
+            cache_key=key,
+            owner="other-worker",
+            expires_at=datetime.utcnow() + timedelta(seconds=60),
+        ))
+        await other_worker.commit()
+
+        async with session_maker() as db:
+            waiter = asyncio.ensure_future(cache_module.extract_property_cached(db, url))
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+
+            # The other worker finishes: its result lands in the table, not in our memory tier
+            await ExtractionCache(4, 3600, 60).store(other_worker, url, FIELDS)
+            await other_worker.execute(delete(ExtractionLease).where(ExtractionLease.cache_key == key))
+            await other_worker.commit()
+
+            assert (await asyncio.wait_for(waiter, 2)).address == "1 Cache Ct"
+    assert cache.stats()["lease_waits"] == 1
@@ -0,0 +1,113 @@
+"""
+Job-mode extraction tests
+"""
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base, get_db
+from app.main import app
+from app.models.extraction_job import ExtractionJob, ExtractionJobStatus
+from app.services import extraction_jobs as jobs_module
+from app.services.extraction_jobs import ExtractionJobPool
+from app.utils.property_extractor import ExtractedPropertyData
+
+
+@pytest.fixture
+async def job_env(tmp_path, monkeypatch):
+    """A started worker pool and an API client sharing one file database"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    pool = ExtractionJobPool(workers=2, queue_size=10)
+    monkeypatch.setattr(jobs_module, "extraction_jobs", pool)
+    monkeypatch.setattr("app.api.property.extraction_jobs", pool)
+    app.dependency_overrides[get_db] = override_get_db
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client, pool, session_maker
+
+    await pool.stop()
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+def fake_extraction(monkeypatch, delay=0.0, error=None):
+    calls = []
+
+    async def extract_property_cached(db, url):
+        calls.append(url)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return ExtractedPropertyData(address=f"{len(calls)} Job St", city="Austin", state="TX", zip_code="78701")
+
+    monkeypatch.setattr(jobs_module, "extract_property_cached", extract_property_cached)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background_and_long_polls(job_env, monkeypatch):
+    """Test that a job is accepted at once and its status can be long-polled"""
+    client, pool, session_maker = job_env
+    fake_extraction(monkeypatch, delay=0.1)
+    await pool.start(session_maker)
+
+    response = await client.post("/api/property/extract/jobs", json={"url": "https://www.zillow.com/homedetails/7_zpid/"})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] in ("QUEUED", "RUNNING")
+    assert response.headers["location"].endswith(f"/api/property/extract/jobs/{job['jobId']}")
+
+    response = await client.get(f"/api/property/extract/jobs/{job['jobId']}", params={"wait": 5})
+    done = response.json()
+    assert done["status"] == "DONE"
+    assert done["propertyId"]
+
+    # The listing now exists, so another URL for it is done without queueing
+    response = await client.post("/api/property/extract/jobs", json={"url": "https://m.zillow.com/homedetails/x/7_zpid"})
+    assert response.json()["status"] == "DONE"
+    assert response.json()["propertyId"] == done["propertyId"]
+    assert pool.stats()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(job_env, monkeypatch):
+    """Test that an extraction error ends the job as FAILED with its message"""
+    client, pool, session_maker = job_env
+    fake_extraction(monkeypatch, error=ValueError("Listing page not found"))
+    await pool.start(session_maker)
+
+    job = (await client.post("/api/property/extract/jobs", json={"url": "https://example.com/listing/1"})).json()
+    failed = (await client.get(f"/api/property/extract/jobs/{job['jobId']}", params={"wait": 5})).json()
+    assert failed["status"] == "FAILED"
+    assert failed["error"] == "Listing page not found"
+    assert pool.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queued_jobs_resume_on_start(job_env, monkeypatch):
+    """Test that jobs left in the table by a stopped process run when the pool starts"""
+    client, pool, session_maker = job_env
+    calls = fake_extraction(monkeypatch)
+
+    response = await client.post("/api/property/extract/jobs", json={"url": "https://example.com/listing/2"})
+    assert response.status_code == 503
+
+    async with session_maker() as db:
+        job = ExtractionJob(url="https://example.com/listing/2", status=ExtractionJobStatus.QUEUED)
+        db.add(job)
+        await db.commit()
+
+    await pool.start(session_maker)
+    response = await client.get(f"/api/property/extract/jobs/{job.id}", params={"wait": 5})
+    assert response.json()["status"] == "DONE"
+    assert calls == ["https://example.com/listing/2"]
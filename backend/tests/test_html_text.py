@@ -0,0 +1,73 @@
+"""
+HTML-to-text conversion tests
+"""
+import timeit
+
+from app.utils.html_text import html_to_text
+
+
+def growth(make_html, n: int) -> float:
+    """
+    How much longer a 4x larger page takes to convert (best of three runs)
+    
+    About 4 when the conversion is linear and 16 when it is quadratic, so a
+    bound in between doesn't depend on how fast the machine is.
+    """
+    def best(html: str) -> float:
+        return min(timeit.repeat(lambda: html_to_text(html, max_chars=10**7), number=1, repeat=3))
+    return best(make_html(4 * n)) / best(make_html(n))
+
+
+def test_html_to_text_keeps_visible_text_only():
+    """Test that scripts, styles, SVG and comments are dropped and whitespace collapsed"""
+    html = (
+        "<!DOCTYPE html><html><head><title>123 Main St &amp; Co</title>"
+        "<style>.price { color: red }</style>"
+        '<script>if (a < b) { el.innerHTML = "</div>" }</script></head>'
+        "<body><h1>123 Main St</h1><!-- <p>hidden</p> -->"
+        '<svg viewBox="0 0 1 1"><text>icon</text></svg><svg/>'
+        "<p>Price:\n\n   $500,000</p><p>Offers due if price < 510k</p>"
+        "<SCRIPT type='text/x'>tracking()</script >Beds: 3</body></html>"
+    )
+    assert html_to_text(html) == (
+        "123 Main St & Co 123 Main St Price: $500,000 Offers due if price < 510k Beds: 3"
+    )
+
+
+def test_html_to_text_stops_at_budget():
+    """Test the character budget"""
+    html = "<p>" + "word " * 100000 + "</p>"
+    text = html_to_text(html, max_chars=100)
+    assert len(text) == 100
+    assert text.startswith("word word")
+
+
+def test_html_to_text_handles_unterminated_elements_linearly():
+    """Test that unclosed script tags (pathological for the old regex) are cheap"""
+    def page(n: int) -> str:
+        return "<p>Listing</p>" + "<p>text</p><script" * n
+
+    assert html_to_text(page(20000)) == "Listing text"
+    assert growth(page, 50_000) < 10
+
+
+def test_html_to_text_windows_do_not_split_words():
+    """Test that text spanning the conversion window is kept intact"""
+    html = "<div>" + "<span>alpha beta</span>" * 10000 + "</div>"
+    assert html_to_text(html, max_chars=10**6) == " ".join(["alpha beta"] * 10000)
+
+
+def test_html_to_text_block_lines():
+    """Test that block mode puts each block-level element on its own line"""
+    html = "<nav><a>Buy</a> <a>Rent</a></nav><h1>1 Main St</h1><ul><li>3 <b>bd</b></li><li>2 ba</li></ul>Footer"
+    assert html_to_text(html, blocks=True) == "Buy Rent\n1 Main St\n3 bd\n2 ba\nFooter"
+
+
+def test_html_to_text_handles_unclosed_tags_linearly():
+    """Test that "<" without a closing ">" is text and the page isn't rescanned"""
+    def page(n: int) -> str:
+        return "<p>Listing</p>" + "<x" * n
+
+    assert html_to_text(page(200_000), max_chars=10_000_000).startswith("Listing <x<x")
+    assert growth(page, 50_000) < 10
+    assert html_to_text("x<5 and <b>y</b>") == "x<5 and y"
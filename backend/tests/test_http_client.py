@@ -0,0 +1,211 @@
+"""
+Shared HTTP client tests
+"""
+import asyncio
+import httpx
+import pytest
+
+from app.utils.http_client import (
+    ACCEPT_ENCODING,
+    BROTLI_AVAILABLE,
+    PooledHttpClient,
+    RequestPriority,
+    parse_retry_after,
+)
+
+
+def make_client(**overrides) -> PooledHttpClient:
+    options = dict(
+        max_connections=10,
+        max_keepalive_connections=5,
+        max_connections_per_host=2,
+        keepalive_expiry=5.0,
+        http2=False,
+    )
+    options.update(overrides)
+    return PooledHttpClient(**options)
+
+
+@pytest.mark.asyncio
+async def test_requests_per_host_are_bounded():
+    """Test that one host never has more requests in flight than its limit"""
+    in_flight = {"zillow.com": 0, "redfin.com": 0}
+    peak = {"zillow.com": 0, "redfin.com": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        in_flight[host] += 1
+        peak[host] = max(peak[host], in_flight[host])
+        await asyncio.sleep(0.01)
+        in_flight[host] -= 1
+        return httpx.Response(200, text="ok")
+
+    client = make_client()
+    client.start(transport=httpx.MockTransport(handler))
+    try:
+        urls = [f"https://zillow.com/homedetails/{i}" for i in range(6)]
+        urls += [f"https://redfin.com/home/{i}" for i in range(3)]
+        responses = await asyncio.gather(*(client.get(url) for url in urls))
+    finally:
+        await client.close()
+
+    assert all(r.status_code == 200 for r in responses)
+    assert peak == {"zillow.com": 2, "redfin.com": 2}
+    stats = client.stats()
+    assert stats["requests"] == 9
+    assert stats["hosts"]["zillow.com"] == {
+        "requests": 6,
+        "in_flight": 0,
+        "throttled": 4,
+        "rate_limited": 0,
+        "retries": 0,
+        "blocked_for": 0.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_are_retried_after_retry_after(monkeypatch):
+    """Test that a 429 is retried after its Retry-After and counted for its host"""
+    answers = [
+        httpx.Response(429, headers={"Retry-After": "2"}),
+        httpx.Response(403),
+        httpx.Response(200, text="listing"),
+    ]
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return answers.pop(0)
+
+    client = make_client(max_retries=3, backoff_base=0.5)
+    client.start(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    try:
+        response = await client.get("https://zillow.com/homedetails/1")
+    finally:
+        await client.close()
+
+    assert response.status_code == 200
+    # Retry-After first, then a jittered back-off within base * 2
+    assert sleeps[0] == 2.0
+    assert 0 <= sleeps[1] <= 1.0
+    host = client.stats()["hosts"]["zillow.com"]
+    assert host["requests"] == 3
+    assert host["rate_limited"] == 2
+    assert host["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_long_retry_after_is_not_retried():
+    """Test that a Retry-After beyond the maximum returns the throttled answer"""
+    client = make_client(max_retries=3, max_retry_after=60.0)
+    client.start(transport=httpx.MockTransport(lambda request: httpx.Response(429, headers={"Retry-After": "3600"})))
+    try:
+        response = await client.get("https://redfin.com/home/1")
+    finally:
+        await client.close()
+    assert response.status_code == 429
+    assert client.stats()["hosts"]["redfin.com"]["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_before_background_ones():
+    """Test that waiting interactive requests are let through first"""
+    order = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        order.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200)
+
+    client = make_client(max_connections_per_host=1)
+    client.start(transport=httpx.MockTransport(handler))
+    try:
+        first = asyncio.create_task(client.get("https://zillow.com/first"))
+        await asyncio.sleep(0)
+        background = [
+            asyncio.create_task(client.get(f"https://zillow.com/background{i}", priority=RequestPriority.BACKGROUND))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(client.get("https://zillow.com/interactive"))
+        await asyncio.gather(first, interactive, *background)
+    finally:
+        await client.close()
+    assert order[:2] == ["/first", "/interactive"]
+
+
+@pytest.mark.asyncio
+async def test_requests_per_host_are_rate_limited():
+    """Test that a host's token bucket spaces requests beyond the burst"""
+    client = make_client(rate_per_host=50.0, burst_per_host=2)
+    client.start(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        await asyncio.gather(*(client.get(f"https://realtor.com/{i}") for i in range(5)))
+    finally:
+        await client.close()
+    # Two requests from the burst, three more at 50 per second; how many had
+    # to wait depends on when the bucket was refilled, so only the spacing is checked
+    assert loop.time() - started >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_idle_hosts_beyond_the_maximum_are_forgotten():
+    """Test that only max_hosts hosts keep a limiter, busy ones excepted"""
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "busy.com":
+            await release.wait()
+        return httpx.Response(200)
+
+    client = make_client(max_hosts=2)
+    client.start(transport=httpx.MockTransport(handler))
+    try:
+        busy = asyncio.create_task(client.get("https://busy.com/"))
+        await asyncio.sleep(0)
+        for i in range(5):
+            await client.get(f"https://site{i}.com/")
+        assert list(client._host_limits) == ["busy.com", "site4.com"]
+        release.set()
+        await busy
+        stats = client.stats()
+    finally:
+        await client.close()
+    assert stats["requests"] == 6
+    assert set(stats["hosts"]) == {"busy.com", "site4.com"}
+
+
+def test_parse_retry_after():
+    """Test both Retry-After forms"""
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not BROTLI_AVAILABLE, reason="brotli is not installed")
+async def test_brotli_responses_are_decoded():
+    """Test that advertising br is backed by a working decoder"""
+    import brotli
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert "br" in request.headers["accept-encoding"]
+        return httpx.Response(
+            200,
+            content=brotli.compress(b"<html>listing</html>"),
+            headers={"Content-Encoding": "br"},
+        )
+
+    client = make_client()
+    client.start(transport=httpx.MockTransport(handler))
+    try:
+        response = await client.get("https://realtor.com/x", headers={"Accept-Encoding": ACCEPT_ENCODING})
+    finally:
+        await client.close()
+    assert response.text == "<html>listing</html>"
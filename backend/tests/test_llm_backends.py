@@ -0,0 +1,96 @@
+"""
+LLM backend tests: cassettes and the local stand-in server
+"""
+import httpx
+import pytest
+
+from app.utils.llm_backends import (
+    CassetteBackend,
+    CassetteMissError,
+    HttpStandInBackend,
+    LLMBackend,
+    LLMResult,
+    load_cassette,
+    prompt_key,
+)
+from app.utils.llm_client import LLMClient
+from benchmarks.llm_standin import FALLBACK_TEXT, StandInProfile, create_app
+
+
+class EchoBackend(LLMBackend):
+    name = "echo"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt: str) -> LLMResult:
+        self.calls += 1
+        return LLMResult(f'{{"echo": "{prompt}"}}', prompt_tokens=7)
+
+
+def standin(recordings=None, **profile) -> HttpStandInBackend:
+    app = create_app(recordings or {}, StandInProfile(latency=0, **profile))
+    return HttpStandInBackend("http://standin", transport=httpx.ASGITransport(app=app))
+
+
+@pytest.mark.asyncio
+async def test_cassette_records_and_replays(tmp_path):
+    """Test that a recorded run replays offline with the same answers"""
+    path = str(tmp_path / "cassettes" / "llm.jsonl")
+    inner = EchoBackend()
+    recorder = CassetteBackend(inner, path, "record")
+    recorded = [await recorder.generate(prompt) for prompt in ("a", "b")]
+    assert inner.calls == 2
+    assert set(load_cassette(path)) == {prompt_key("a"), prompt_key("b")}
+
+    client = LLMClient(backend=CassetteBackend(None, path, "replay"), timeout=1.0, max_concurrency=2)
+    client.configure()
+    assert client.configured
+    assert await client.generate_json("b") == recorded[1].text
+    assert client.stats()["prompt_tokens"] == 7
+    assert client.stats()["backend"]["replayed"] == 1
+
+    with pytest.raises(CassetteMissError):
+        await client.backend.generate("never recorded")
+
+
+@pytest.mark.asyncio
+async def test_standin_serves_recorded_responses():
+    """Test that the stand-in answers recorded prompts, and others per --strict"""
+    recordings = {prompt_key("known"): {"key": prompt_key("known"), "text": '{"price": 1}', "promptTokens": 3}}
+    backend = standin(recordings)
+    try:
+        assert await backend.generate("known") == LLMResult('{"price": 1}', 3)
+        assert (await backend.generate("other")).text == FALLBACK_TEXT
+    finally:
+        await backend.close()
+
+    strict = standin(recordings, strict=True)
+    try:
+        with pytest.raises(Exception, match="404"):
+            await strict.generate("other")
+    finally:
+        await strict.close()
+
+
+@pytest.mark.asyncio
+async def test_standin_error_profile_is_seeded():
+    """Test that errors follow the configured rate, the same way for the same seed"""
+    outcomes = []
+    for _ in range(2):
+        backend = standin(error_rate=0.5, error_status=429, seed=7)
+        run = []
+        try:
+            for _ in range(20):
+                try:
+                    await backend.generate("prompt")
+                    run.append("ok")
+                except Exception as e:
+                    assert "429" in str(e)
+                    run.append("error")
+        finally:
+            await backend.close()
+        outcomes.append(run)
+
+    assert outcomes[0] == outcomes[1]
+    assert 0 < outcomes[0].count("error") < 20
@@ -0,0 +1,157 @@
+"""
+LLM client tests
+"""
+import asyncio
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitState
+from app.utils.disconnect import ClientDisconnected, cancel_on_disconnect
+from app.utils.llm_backends import LLMBackend, LLMResult
+from app.utils.llm_client import LLMClient, LLMTimeoutError, LLMUnavailableError
+
+
+class FakeBackend(LLMBackend):
+    """Stands in for the Gemini backend and records concurrency"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate(self, prompt: str) -> LLMResult:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return LLMResult('{"address": "1 Main St"}')
+
+
+class FailingBackend(LLMBackend):
+    def __init__(self):
+        self.calls = 0
+        self.failing = True
+
+    async def generate(self, prompt: str) -> LLMResult:
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError("503 Service Unavailable")
+        return LLMResult("{}")
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(
+        window_seconds=60,
+        min_calls=2,
+        failure_ratio=0.5,
+        slow_call_seconds=10,
+        slow_call_ratio=1.0,
+        open_seconds=60,
+    )
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+def make_client(
+    backend: LLMBackend,
+    timeout: float = 1.0,
+    max_concurrency: int = 2,
+    breaker: CircuitBreaker = None,
+) -> LLMClient:
+    return LLMClient(backend=backend, timeout=timeout, max_concurrency=max_concurrency, breaker=breaker)
+
+
+@pytest.mark.asyncio
+async def test_llm_calls_are_bounded():
+    """Test that concurrent calls never exceed max_concurrency"""
+    backend = FakeBackend(delay=0.01)
+    client = make_client(backend, max_concurrency=2)
+
+    results = await asyncio.gather(*(client.generate_json("prompt") for _ in range(5)))
+
+    assert results == ['{"address": "1 Main St"}'] * 5
+    assert backend.peak == 2
+    assert client.stats()["calls"] == 5
+
+
+@pytest.mark.asyncio
+async def test_llm_call_times_out():
+    """Test that a slow call is abandoned after the timeout"""
+    backend = FakeBackend(delay=5)
+    client = make_client(backend, timeout=0.01)
+
+    with pytest.raises(LLMTimeoutError):
+        await client.generate_json("prompt")
+    assert backend.in_flight == 0
+    assert client.stats()["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_call_is_cancelled_when_client_disconnects():
+    """Test that a disconnect cancels the in-flight LLM call"""
+
+    class DisconnectingRequest:
+        async def is_disconnected(self) -> bool:
+            return True
+
+    backend = FakeBackend(delay=5)
+    client = make_client(backend)
+
+    with pytest.raises(ClientDisconnected):
+        await cancel_on_disconnect(DisconnectingRequest(), client.generate_json("prompt"), poll_interval=0.01)
+    assert backend.in_flight == 0
+    assert client.stats()["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_failures_and_fails_fast():
+    """Test that repeated failures open the circuit and later calls skip the backend"""
+    backend = FailingBackend()
+    client = make_client(backend, breaker=make_breaker())
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await client.generate_json("prompt")
+    with pytest.raises(LLMUnavailableError) as error:
+        await client.generate_json("prompt")
+
+    assert backend.calls == 2
+    assert 0 < error.value.retry_after <= 60
+    breaker = client.stats()["circuit_breaker"]
+    assert breaker["state"] == "OPEN"
+    assert breaker["window_failures"] == 2
+    assert breaker["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_breaker_probe_closes_the_circuit():
+    """Test that a successful half-open probe closes the circuit, and a failed one reopens it"""
+    backend = FailingBackend()
+    breaker = make_breaker(open_seconds=0)
+    client = make_client(backend, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await client.generate_json("prompt")
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(RuntimeError):
+        await client.generate_json("prompt")
+    assert breaker.state == CircuitState.OPEN
+
+    backend.failing = False
+    assert await client.generate_json("prompt") == "{}"
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.times_opened == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_calls_open_the_circuit():
+    """Test that calls slower than the threshold count against the provider"""
+    backend = FakeBackend(delay=0.02)
+    breaker = make_breaker(slow_call_seconds=0.01, slow_call_ratio=1.0)
+    client = make_client(backend, breaker=breaker)
+
+    await client.generate_json("prompt")
+    await client.generate_json("prompt")
+    assert breaker.state == CircuitState.OPEN
@@ -0,0 +1,151 @@
+"""
+Offer document storage tests
+"""
+import asyncio
+import os
+import pytest
+
+from app.config import settings
+from app.models.offer import Offer
+from app.services import offer_documents
+from app.utils.pdf_generator import OfferData
+
+
+def make_offer_data() -> OfferData:
+    return OfferData(
+        property_address="789 Shared Street",
+        city="Austin",
+        state="TX",
+        zip_code="78703",
+        offer_price=425000.0,
+        closing_date="2024-05-01",
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_access_shares_one_render(test_db, tmp_path, monkeypatch):
+    """Test that concurrent first requests for an offer wait for a single render"""
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    renders = 0
+
+    async def slow_render(offer_data, property_type=None):
+        nonlocal renders
+        renders += 1
+        await asyncio.sleep(0.05)
+        return b"%PDF-1.7 test"
+
+    monkeypatch.setattr(offer_documents, "generate_offer_letter_pdf", slow_render)
+    offer = Offer(id="offer-single-flight", user_id="u", property_id="p", financing_type="cash",
+                  offer_price=425000.0, contingencies={})
+    test_db.add(offer)
+    await test_db.commit()
+
+    urls = await asyncio.gather(*[
+        offer_documents.materialize_offer_letter(test_db, offer, make_offer_data())
+        for _ in range(5)
+    ])
+
+    assert renders == 1
+    assert len(set(urls)) == 1
+    assert os.listdir(tmp_path) == [os.path.basename(urls[0])]
+
+
+@pytest.mark.asyncio
+async def test_cache_budget_evicts_least_recently_used(test_db, tmp_path, monkeypatch):
+    """Test the on-disk byte budget for lazily rendered offer letters"""
+    from datetime import datetime
+    from sqlalchemy import select
+    from app.models.offer_document import OfferDocument
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "OFFER_LETTER_CACHE_MAX_BYTES", 250)
+    for i, name in enumerate(["old", "mid", "new"]):
+        (tmp_path / f"{name}.pdf").write_bytes(b"x" * 100)
+        test_db.add(OfferDocument(
+            content_hash=name, file_name=f"{name}.pdf", template_hash="t", size_bytes=100,
+            ref_count=1, last_accessed_at=datetime(2024, 1, 1, i),
+        ))
+    await test_db.commit()
+
+    await offer_documents.enforce_offer_letter_cache_budget(test_db, keep="new.pdf")
+
+    assert sorted(os.listdir(tmp_path)) == ["mid.pdf", "new.pdf"]
+    evicted = (await test_db.execute(
+        select(OfferDocument.file_name).where(OfferDocument.evicted_at.is_not(None))
+    )).scalars().all()
+    assert evicted == ["old.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_references_are_all_counted(tmp_path, monkeypatch):
+    """Test that acquires and releases on separate sessions don't lose counts"""
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from app.database import Base
+    from app.models.offer_document import OfferDocument
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path / "offers"))
+
+    async def slow_render(offer_data, property_type=None):
+        await asyncio.sleep(0.01)
+        return b"%PDF-1.7 test"
+
+    monkeypatch.setattr(offer_documents, "generate_offer_letter_pdf", slow_render)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'documents.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def acquire() -> OfferDocument:
+        async with session_maker() as session:
+            return await offer_documents.acquire_offer_document(session, make_offer_data())
+
+    async def release(file_name: str) -> None:
+        async with session_maker() as session:
+            await offer_documents.release_offer_document(session, file_name)
+            await session.commit()
+
+    try:
+        document = await acquire()
+        await asyncio.gather(*(acquire() for _ in range(5)))
+        async with session_maker() as session:
+            assert (await session.execute(select(OfferDocument.ref_count))).scalar_one() == 6
+
+        await asyncio.gather(*(release(document.file_name) for _ in range(5)))
+        assert os.path.exists(offer_documents.document_path(document))
+        await release(document.file_name)
+        assert not os.path.exists(offer_documents.document_path(document))
+        async with session_maker() as session:
+            assert (await session.execute(select(OfferDocument))).scalars().all() == []
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_document_accesses_are_recorded_at_most_every_interval(test_db, tmp_path, monkeypatch):
+    """Test that reading an offer letter only writes its access time when it is stale"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import select, update
+    from app.models.offer_document import OfferDocument
+
+    monkeypatch.setattr(settings, "OFFERS_DIR", str(tmp_path))
+
+    async def render(offer_data, property_type=None):
+        return b"%PDF-1.7 test"
+
+    monkeypatch.setattr(offer_documents, "generate_offer_letter_pdf", render)
+    offer = Offer(id="offer-access", user_id="u", property_id="p", financing_type="cash",
+                  offer_price=425000.0, contingencies={})
+    test_db.add(offer)
+    await test_db.commit()
+    await offer_documents.materialize_offer_letter(test_db, offer, make_offer_data())
+
+    async def access_after(age: timedelta) -> bool:
+        recorded = datetime.utcnow() - age
+        await test_db.execute(update(OfferDocument).values(last_accessed_at=recorded))
+        await test_db.commit()
+        await offer_documents.materialize_offer_letter(test_db, offer, make_offer_data())
+        return (await test_db.scalar(select(OfferDocument.last_accessed_at))) != recorded
+
+    assert not await access_after(timedelta(minutes=1))
+    assert await access_after(offer_documents.ACCESS_RECORD_INTERVAL + timedelta(minutes=1))
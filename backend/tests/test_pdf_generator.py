@@ -0,0 +1,206 @@
+"""
+PDF generation tests
+"""
+import os
+import shutil
+import pytest
+
+from app.config import settings
+from app.utils.pdf_generator import (
+    OfferData,
+    build_fill_plan,
+    generate_offer_letter_pdf,
+    get_unmatched_field_mappings,
+    render_offer_letter_pdf,
+    render_offer_letter_variants,
+    warm_template_cache,
+)
+from app.utils.pdf_renderer import PdfRenderPool, RenderQueueFullError
+from app.utils.template_cache import TemplateCache
+
+
+SINGLEFAMILY_TEMPLATE = os.path.join(settings.TEMPLATES_DIR, "tx", "singlefamily-resale.pdf")
+CONDO_TEMPLATE = os.path.join(settings.TEMPLATES_DIR, "tx", "condo-resale.pdf")
+
+
+def make_offer_data(**overrides) -> OfferData:
+    values = dict(
+        property_address="123 Test Street",
+        city="Austin",
+        state="TX",
+        zip_code="78701",
+        offer_price=500000.0,
+        closing_date="2024-03-01",
+        buyer_email="buyer@example.com",
+        seller_credits=5000.0,
+    )
+    values.update(overrides)
+    return OfferData(**values)
+
+
+def test_template_cache_hits_after_first_load():
+    """Test that a template is parsed once and then served from memory"""
+    cache = TemplateCache(max_entries=2)
+    first = cache.get(("tx", "singlefamily-resale.pdf"), SINGLEFAMILY_TEMPLATE)
+    second = cache.get(("tx", "singlefamily-resale.pdf"), SINGLEFAMILY_TEMPLATE)
+
+    assert first is second
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_template_cache_invalidates_changed_file(tmp_path):
+    """Test that a modified template file is re-parsed"""
+    path = tmp_path / "singlefamily-resale.pdf"
+    shutil.copy(SINGLEFAMILY_TEMPLATE, path)
+    cache = TemplateCache()
+    first = cache.get(("tx", path.name), str(path))
+
+    # Same content with a new mtime keeps the parsed template
+    os.utime(path, ns=(0, first.mtime_ns + 1_000_000_000))
+    assert cache.get(("tx", path.name), str(path)) is first
+
+    shutil.copy(CONDO_TEMPLATE, path)
+    refreshed = cache.get(("tx", path.name), str(path))
+    assert refreshed is not first
+    assert refreshed.sha256 != first.sha256
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_template_cache_evicts_least_recently_used():
+    """Test the LRU size bound"""
+    cache = TemplateCache(max_entries=1)
+    cache.get(("tx", "singlefamily-resale.pdf"), SINGLEFAMILY_TEMPLATE)
+    cache.get(("tx", "condo-resale.pdf"), CONDO_TEMPLATE)
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["evictions"] == 1
+    assert stats["templates"][0]["template"] == "condo-resale.pdf"
+
+
+def test_fill_plan_indexes_widgets_by_page():
+    """Test that the fill plan groups values by the pages holding their widgets"""
+    cache = TemplateCache()
+    plan = build_fill_plan(cache.get(("tx", "singlefamily-resale.pdf"), SINGLEFAMILY_TEMPLATE).reader)
+
+    pages = plan.group_by_page({"Texas known as": "123 Test Street", "Not a field": "x"})
+    assert len(pages) == 1
+    assert list(pages.values()) == [{"Texas known as": "123 Test Street"}]
+    assert plan.unmatched(["Texas known as", "Not a field"]) == ["Not a field"]
+
+
+@pytest.mark.parametrize("property_type", ["singlefamily", "condo"])
+def test_field_mappings_match_template(property_type):
+    """Test that every mapping key exists in its TX template"""
+    assert get_unmatched_field_mappings("TX", property_type) == []
+
+
+@pytest.mark.asyncio
+async def test_generate_offer_letter_pdf():
+    """Test that the filled contract is a PDF containing the offer values"""
+    from io import BytesIO
+    from pypdf import PdfReader
+
+    pdf_bytes = await generate_offer_letter_pdf(make_offer_data())
+    assert pdf_bytes.startswith(b"%PDF")
+
+    fields = PdfReader(BytesIO(pdf_bytes)).get_fields()
+    assert fields["Texas known as"]["/V"] == "123 Test Street"
+    assert fields["Email"]["/V"] == "buyer@example.com"
+
+
+def test_variants_match_individual_renders():
+    """Test that variants filled on one writer equal separately rendered offers"""
+    from io import BytesIO
+    from pypdf import PdfReader
+
+    def filled(pdf_bytes):
+        fields = PdfReader(BytesIO(pdf_bytes)).get_fields()
+        return {name: f.get("/V") for name, f in fields.items() if f.get("/V")}
+
+    variants = [
+        make_offer_data(seller_credits=None),
+        make_offer_data(seller_credits=2500.0, closing_date="2024-04-15"),
+        make_offer_data(),
+    ]
+    outputs = render_offer_letter_variants(variants, "singlefamily")
+
+    assert len(outputs) == 3
+    for variant, pdf_bytes in zip(variants, outputs):
+        assert filled(pdf_bytes) == filled(render_offer_letter_pdf(variant, "singlefamily"))
+
+
+@pytest.mark.parametrize("property_type", ["singlefamily", "condo"])
+def test_incremental_output_appends_to_template(monkeypatch, property_type):
+    """Test that incremental mode keeps the template bytes and appends the fields"""
+    from io import BytesIO
+    from pypdf import PdfReader
+
+    monkeypatch.setattr(settings, "PDF_OUTPUT_MODE", "incremental")
+    template_path = CONDO_TEMPLATE if property_type == "condo" else SINGLEFAMILY_TEMPLATE
+    with open(template_path, "rb") as f:
+        template_bytes = f.read()
+
+    pdf_bytes = render_offer_letter_pdf(make_offer_data(buyer_name="Buyer (Jr.)"), property_type)
+    assert pdf_bytes.startswith(template_bytes)
+    assert len(pdf_bytes) - len(template_bytes) < 64 * 1024
+
+    reader = PdfReader(BytesIO(pdf_bytes), strict=True)
+    fields = reader.get_fields()
+    assert fields["1 PARTIES The parties to this contract are"]["/V"] == "Buyer (Jr.)"
+    assert fields["Email"]["/V"] == "buyer@example.com"
+    assert reader.trailer["/Root"]["/AcroForm"]["/NeedAppearances"]
+
+
+def test_incremental_output_with_classic_xref_table(tmp_path):
+    """Test incremental updates of a template that uses an xref table, not a stream"""
+    from io import BytesIO
+    from pypdf import PdfReader, PdfWriter
+    from app.utils.pdf_incremental import build_incremental_update, write_incremental_fill
+
+    path = tmp_path / "classic.pdf"
+    writer = PdfWriter()
+    writer.clone_document_from_reader(PdfReader(SINGLEFAMILY_TEMPLATE))
+    writer.write(str(path))
+
+    template = TemplateCache().get(("tx", path.name), str(path))
+    fill_plan = build_fill_plan(template.reader)
+    pdf_bytes = write_incremental_fill(template, fill_plan, {"Email": "a@b.co"})
+
+    update = build_incremental_update(template, fill_plan, {"Email": "a@b.co"})
+    assert pdf_bytes == template.data + update
+    assert b"\ntrailer\n" in update
+    assert PdfReader(BytesIO(pdf_bytes), strict=True).get_fields()["Email"]["/V"] == "a@b.co"
+
+
+@pytest.mark.asyncio
+async def test_render_pool_runs_on_worker_process():
+    """Test rendering on a warmed worker process"""
+    pool = PdfRenderPool(workers=1, max_queue=4)
+    pool.start(initializer=warm_template_cache)
+    try:
+        pdf_bytes = await pool.run(render_offer_letter_pdf, make_offer_data(), "singlefamily")
+        assert pdf_bytes.startswith(b"%PDF")
+        assert pool.stats()["completed"] == 1
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_render_pool_rejects_when_queue_is_full():
+    """Test the max queue depth bound"""
+    import asyncio
+
+    pool = PdfRenderPool(workers=1, max_queue=1)
+    pool.start()
+    try:
+        first = asyncio.ensure_future(pool.run(render_offer_letter_pdf, make_offer_data(), None))
+        await asyncio.sleep(0)
+        with pytest.raises(RenderQueueFullError):
+            await pool.run(render_offer_letter_pdf, make_offer_data(), None)
+        await first
+        assert pool.stats()["rejected"] == 1
+    finally:
+        pool.shutdown()
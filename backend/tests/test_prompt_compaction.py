@@ -0,0 +1,54 @@
+"""
+Prompt compaction tests
+"""
+from app.utils.prompt_compaction import compact_page_text, estimate_tokens, score_segment
+
+
+def listing_page_text() -> str:
+    nav = "\n".join(["Buy", "Rent", "Sell", "Home Loans", "Agent Finder", "Sign in"] * 40)
+    facts = "\n".join([
+        "123 Main St, Austin, TX 78701",
+        "$525,000",
+        "3 bd | 2 ba | 1,850 sqft",
+        "Year built: 1972",
+        "HOA: None",
+        "Listed by: Pat Agent, (512) 555-0100, pat@example.com",
+        "MLS#: ACT123",
+    ])
+    description = "Charming home with an updated kitchen and a large backyard. " * 5
+    carousel = "\n".join(
+        f"Similar homes {n}\n${400 + n},000\n3 bd 2 ba" for n in range(60)
+    )
+    footer = "\n".join(["Privacy", "Terms of use", "Cookie preferences", "All rights reserved"] * 60)
+    return "\n".join([nav, facts, description, carousel, footer])
+
+
+def test_text_within_budget_is_unchanged():
+    """Test that short pages are sent as is"""
+    text = "1 Main St\n$500,000"
+    compacted = compact_page_text(text, token_budget=100)
+    assert compacted.text == text
+    assert compacted.tokens == compacted.original_tokens
+
+
+def test_compaction_keeps_listing_facts_within_budget():
+    """Test that the fact sheet survives while nav, footer and carousels are dropped"""
+    text = listing_page_text()
+    compacted = compact_page_text(text, token_budget=300)
+
+    assert compacted.original_tokens > 1000
+    assert compacted.tokens <= 300
+    assert estimate_tokens(compacted.text) == compacted.tokens
+    for fact in ("123 Main St, Austin, TX 78701", "$525,000", "1,850 sqft", "MLS#: ACT123", "pat@example.com"):
+        assert fact in compacted.text
+    assert "Agent Finder" not in compacted.text
+    assert "Terms of use" not in compacted.text
+    assert compacted.kept_segments < compacted.total_segments
+
+
+def test_carousel_scores_below_fact_sheet():
+    """Test that repeated prices don't outrank a segment with varied facts"""
+    facts = "123 Main St, Austin, TX 78701\n$525,000\n3 bd | 2 ba | 1,850 sqft\nMLS#: ACT123"
+    carousel = "Similar homes\n" + "\n".join(f"${n}00,000 3 bd 2 ba" for n in range(2, 9))
+    assert score_segment(facts) > score_segment(carousel)
+    assert score_segment("Buy\nRent\nSell") == 0
@@ -0,0 +1,122 @@
+"""
+Listing id canonicalization and property dedup tests
+"""
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.api import property as property_api
+from app.database import Base, add_missing_columns
+from app.models.property import Property
+from app.services.property_lookup import backfill_listing_keys
+from app.utils.listing_url import listing_key
+from app.utils.property_extractor import ExtractedPropertyData
+
+
+@pytest.mark.parametrize("url,expected", [
+    ("https://www.zillow.com/homedetails/1-Main-St-Austin-TX-78701/12345_zpid/", "zillow:12345"),
+    ("https://m.zillow.com/homedetails/1-Main-Street-Austin/12345_zpid?utm_source=share", "zillow:12345"),
+    ("https://www.zillow.com/homes/?zpid=12345", "zillow:12345"),
+    ("https://www.redfin.com/TX/Austin/1-Main-St-78701/home/987654?utm_medium=email", "redfin:987654"),
+    ("https://www.redfin.com/TX/Austin/1-Main-St-78701/unit-4/home/987655/", "redfin:987655"),
+    ("https://www.realtor.com/realestateandhomes-detail/1-Main-St_Austin_TX_78701_M12345-67890", "realtor:M12345-67890"),
+    ("https://www.zillow.com/austin-tx/", None),
+    ("https://notzillow.com/homedetails/12345_zpid/", None),
+    ("https://example.com/listing/12345", None),
+])
+def test_listing_key(url, expected):
+    """Test that URL variants of a listing reduce to the same key"""
+    assert listing_key(url) == expected
+
+
+@pytest.mark.asyncio
+async def test_backfill_sets_listing_keys(test_db):
+    """Test that rows stored before the column existed get their key"""
+    test_db.add_all([
+        Property(source_url="https://www.zillow.com/homedetails/x/111_zpid/", address="1 A St",
+                 city="Austin", state="TX", zip_code="78701", property_type="singlefamily"),
+        Property(source_url="https://example.com/listing/1", address="2 B St",
+                 city="Austin", state="TX", zip_code="78701", property_type="singlefamily"),
+    ])
+    await test_db.commit()
+
+    assert await backfill_listing_keys(test_db, batch_size=1) == 1
+    keys = (await test_db.execute(select(Property.listing_key).order_by(Property.address))).scalars().all()
+    assert keys == ["zillow:111", None]
+
+
+@pytest.mark.asyncio
+async def test_add_missing_columns():
+    """Test that a table created by an older model gains the new column and its index"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("DROP INDEX ix_properties_listing_key"))
+        await conn.execute(text("ALTER TABLE properties DROP COLUMN listing_key"))
+
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(add_missing_columns)
+
+        columns = await conn.run_sync(lambda c: [col["name"] for col in inspect(c).get_columns("properties")])
+        indexes = await conn.run_sync(lambda c: [ix["name"] for ix in inspect(c).get_indexes("properties")])
+    await engine.dispose()
+    assert "listing_key" in columns
+    assert "ix_properties_listing_key" in indexes
+
+
+@pytest.mark.asyncio
+async def test_extract_dedups_by_listing_id(client: AsyncClient, monkeypatch):
+    """Test that another URL of a known listing returns it without extracting again"""
+    calls = []
+
+    async def extract_property_cached(db, url):
+        calls.append(url)
+        return ExtractedPropertyData(
+            address="1 Main St", city="Austin", state="TX", zip_code="78701", price=500000,
+        )
+
+    monkeypatch.setattr(property_api, "extract_property_cached", extract_property_cached)
+
+    first = await client.post("/api/property/extract", json={
+        "url": "https://www.zillow.com/homedetails/1-Main-St-Austin-TX-78701/12345_zpid/",
+    })
+    assert first.status_code == 200
+    second = await client.post("/api/property/extract", json={
+        "url": "https://m.zillow.com/homedetails/1-Main-Street/12345_zpid?utm_source=share",
+    })
+    assert second.status_code == 200
+    assert second.json()["propertyId"] == first.json()["propertyId"]
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_url_fallback_matches_the_canonical_form(test_db):
+    """Test that URLs without a listing id still find rows saved under the canonical URL"""
+    from app.services.property_lookup import find_properties_by_urls, find_property_by_url
+
+    test_db.add(Property(source_url="https://example.com/listing/12", address="3 C St",
+                         city="Austin", state="TX", zip_code="78701", property_type="singlefamily"))
+    await test_db.commit()
+
+    variant = "https://www.example.com/listing/12/?utm_source=share"
+    assert (await find_property_by_url(test_db, variant)).address == "3 C St"
+    assert (await find_properties_by_urls(test_db, [variant]))[variant].address == "3 C St"
+    assert await find_property_by_url(test_db, "https://example.com/listing/13") is None
+
+
+@pytest.mark.asyncio
+async def test_extract_runs_on_its_own_session(client: AsyncClient, test_db, monkeypatch):
+    """Test that the cancellable extraction never shares the request's session"""
+    sessions = []
+
+    async def extract_property_cached(db, url):
+        sessions.append(db)
+        return ExtractedPropertyData(
+            address="4 D St", city="Austin", state="TX", zip_code="78701", price=400000,
+        )
+
+    monkeypatch.setattr(property_api, "extract_property_cached", extract_property_cached)
+    response = await client.post("/api/property/extract", json={"url": "https://example.com/listing/4"})
+    assert response.status_code == 200
+    assert len(sessions) == 1 and sessions[0] is not test_db
@@ -0,0 +1,96 @@
+"""
+Conditional property refresh tests
+"""
+import json
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from app.models.property import Property
+from app.services import property_refresh
+from app.services.extraction_cache import ExtractionCache
+from app.utils import property_extractor
+from app.utils.http_client import PooledHttpClient
+
+
+@pytest.mark.asyncio
+async def test_refresh_skips_llm_for_unchanged_pages(client: AsyncClient, test_db, monkeypatch):
+    """Test that a 304 or an unchanged page text doesn't call the LLM, and a change does"""
+    page = {"etag": '"v1"', "html": "<h1>1 Main St</h1><p>Austin, TX 78701</p><p>$510,000</p>"}
+    conditional_headers = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        conditional_headers.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == page["etag"]:
+            return httpx.Response(304, headers={"ETag": page["etag"]})
+        return httpx.Response(200, text=page["html"], headers={"ETag": page["etag"]})
+
+    prompts = []
+
+    async def generate_json(prompt, timeout=None):
+        prompts.append(prompt)
+        price = 510000 if "$510,000" in prompt else 495000
+        return json.dumps({"price": price, "aiFairValue": price + 5000, "daysOnMarket": 3})
+
+    http_client = PooledHttpClient(10, 5, 2, 5.0, http2=False)
+    http_client.start(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(property_extractor, "http_client", http_client)
+    monkeypatch.setattr(property_extractor.llm_client, "generate_json", generate_json)
+    monkeypatch.setattr(property_refresh, "extraction_cache", ExtractionCache(4, 3600, 60))
+
+    property_obj = Property(
+        source_url="https://example.com/listing/1",
+        address="1 Main St",
+        city="Austin",
+        state="TX",
+        zip_code="78701",
+        property_type="singlefamily",
+        price=500000,
+    )
+    test_db.add(property_obj)
+    await test_db.commit()
+    refresh_url = f"/api/property/{property_obj.id}/refresh"
+
+    try:
+        # No stored validators yet: full fetch and extraction
+        response = await client.post(refresh_url)
+        assert response.status_code == 200
+        assert response.json()["outcome"] == "UPDATED"
+        assert len(prompts) == 1
+        assert '"address"' not in prompts[0].split("these exact fields:")[1]
+        assert property_obj.price == 510000
+        assert property_obj.page_etag == '"v1"'
+
+        # Same ETag: the server answers 304
+        response = await client.post(refresh_url)
+        assert response.json()["outcome"] == "NOT_MODIFIED"
+        assert conditional_headers[-1] == '"v1"'
+
+        # New ETag, markup-only change: same text hash
+        page["etag"] = '"v2"'
+        page["html"] = page["html"].replace("<p>", '<p class="x">')
+        response = await client.post(refresh_url)
+        assert response.json()["outcome"] == "UNCHANGED"
+        assert property_obj.page_etag == '"v2"'
+        assert len(prompts) == 1
+
+        # The price changed on the page
+        page["etag"] = '"v3"'
+        page["html"] = page["html"].replace("$510,000", "$495,000")
+        response = await client.post(refresh_url)
+        assert response.json()["outcome"] == "UPDATED"
+        assert len(prompts) == 2
+        assert property_obj.price == 495000
+    finally:
+        await http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_refresh_requires_source_url(client: AsyncClient, test_db):
+    """Test that properties entered by hand can't be refreshed"""
+    property_obj = Property(address="2 Side St", city="Austin", state="TX", zip_code="78701", property_type="condo")
+    test_db.add(property_obj)
+    await test_db.commit()
+
+    response = await client.post(f"/api/property/{property_obj.id}/refresh")
+    assert response.status_code == 400
@@ -0,0 +1,138 @@
+"""
+Background property refresh tests
+"""
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models.offer import Offer, OfferStatus
+from app.models.property import Property
+from app.models.user import User
+from app.services import property_refresh, refresh_scheduler
+from app.services.extraction_cache import ExtractionCache
+from app.services.refresh_scheduler import PropertyRefresher
+from app.utils import property_extractor
+from app.utils.http_client import RequestPriority
+from app.utils.property_extractor import ListingPage
+
+
+def make_property(name: str, **overrides) -> Property:
+    values = dict(
+        source_url=f"https://example.com/listing/{name}",
+        address=f"{name} Main St",
+        city="Austin",
+        state="TX",
+        zip_code="78701",
+        property_type="singlefamily",
+        price=500000,
+        created_at=datetime.utcnow() - timedelta(days=2),
+    )
+    values.update(overrides)
+    return Property(**values)
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'refresh.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_due_properties_are_refreshed_stalest_first(session_maker, monkeypatch):
+    """Test candidate selection and that a batch is refreshed with a volatile-only prompt"""
+    now = datetime.utcnow()
+    async with session_maker() as db:
+        user = User(email="buyer@example.com", name="Buyer")
+        with_offer = make_property("1", page_checked_at=now - timedelta(hours=12))
+        viewed = make_property("2", last_viewed_at=now - timedelta(hours=1))
+        completed_offer = make_property("3")
+        unused = make_property("4")
+        fresh = make_property("5", last_viewed_at=now, page_checked_at=now - timedelta(minutes=5))
+        db.add_all([user, with_offer, viewed, completed_offer, unused, fresh])
+        await db.flush()
+        for property_obj, status in ((with_offer, OfferStatus.GENERATED), (completed_offer, OfferStatus.COMPLETED)):
+            db.add(Offer(
+                user_id=user.id,
+                property_id=property_obj.id,
+                financing_type="cash",
+                offer_price=480000,
+                contingencies={},
+                status=status,
+            ))
+        await db.commit()
+
+    refresher = PropertyRefresher(interval=60, batch_size=10, max_per_hour=3600 * 1000, stale_after=6 * 3600, view_window=7 * 86400)
+    async with session_maker() as db:
+        due = await refresher.select_due(db)
+    assert [p.address for p in due] == ["2 Main St", "1 Main St"]
+
+    async def fetch_listing_page(url, etag=None, last_modified=None, priority=None):
+        assert priority == RequestPriority.BACKGROUND
+        return ListingPage(html=f"<h1>{url}</h1><p>Now $450,000</p>", etag='"e"')
+
+    prompts = []
+
+    async def generate_json(prompt, timeout=None):
+        prompts.append(prompt)
+        return json.dumps({"price": 450000, "daysOnMarket": 9})
+
+    monkeypatch.setattr(property_refresh, "fetch_listing_page", fetch_listing_page)
+    monkeypatch.setattr(property_refresh, "extraction_cache", ExtractionCache(4, 3600, 60))
+    monkeypatch.setattr(property_extractor.llm_client, "generate_json", generate_json)
+    refresher._session_maker = session_maker
+    assert await refresher.run_once() == 2
+
+    # Only the volatile fields were asked for
+    schema = prompts[0].split("these exact fields:")[1]
+    assert '"price"' in schema and '"daysOnMarket"' in schema
+    assert '"bedrooms"' not in schema and '"address"' not in schema
+
+    async with session_maker() as db:
+        refreshed = await db.get(Property, viewed.id)
+        assert refreshed.price == 450000
+        assert refreshed.days_on_market == 9
+        assert refreshed.page_etag == '"e"'
+        assert refreshed.page_checked_at is not None
+        assert await refresher.select_due(db) == []
+    assert refresher.stats()["outcomes"] == {"UPDATED": 2}
+
+
+@pytest.mark.asyncio
+async def test_refresher_yields_to_interactive_llm_calls(monkeypatch):
+    """Test that a check waits while another LLM call is in flight"""
+    refresher = PropertyRefresher(interval=60, batch_size=1, max_per_hour=3600, stale_after=0, view_window=0)
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        monkeypatch.setattr(refresh_scheduler.llm_client, "_in_flight", 0)
+
+    monkeypatch.setattr(refresh_scheduler.llm_client, "_in_flight", 1)
+    monkeypatch.setattr(refresh_scheduler.asyncio, "sleep", sleep)
+    await refresher._wait_for_turn()
+    assert sleeps == [1.0]
+    assert refresher.stats()["busy_waits"] == 1
+
+    # The next check is spaced by the hourly budget
+    await refresher._wait_for_turn()
+    assert 0 < sleeps[-1] <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_property_views_are_recorded(client, test_db):
+    """Test that viewing a property marks it for refreshes without changing updated_at"""
+    property_obj = make_property("6")
+    test_db.add(property_obj)
+    await test_db.commit()
+    updated_at = property_obj.updated_at
+
+    response = await client.get(f"/api/property/{property_obj.id}")
+    assert response.status_code == 200
+    await test_db.refresh(property_obj)
+    assert property_obj.last_viewed_at is not None
+    assert property_obj.updated_at == updated_at
@@ -0,0 +1,178 @@
+"""
+Structured-data extraction tests
+"""
+import json
+import pytest
+
+from app.utils import property_extractor
+from app.utils.llm_client import LLMUnavailableError
+from app.utils.structured_data import extract_structured_fields
+
+
+def zillow_page() -> str:
+    home = {
+        "zpid": 123,
+        "streetAddress": "1 Zillow Way",
+        "city": "Austin",
+        "state": "TX",
+        "zipcode": "78701",
+        "price": 525000,
+        "zestimate": 531200,
+        "bedrooms": 3,
+        "bathrooms": 2.5,
+        "livingArea": 2100,
+        "yearBuilt": 1972,
+        "homeType": "SINGLE_FAMILY",
+        "daysOnZillow": 12,
+        "attributionInfo": {"mlsId": "ACT123", "agentName": "Pat Agent"},
+        "resoFacts": {"hasAssociation": False},
+    }
+    # Zillow nests its page cache as a JSON string inside __NEXT_DATA__
+    cache = json.dumps({"ForSaleQuery{zpid:123}": {"property": home}})
+    next_data = {"props": {"pageProps": {"componentProps": {"gdpClientCache": cache}}}}
+    return (
+        "<html><head><title>1 Zillow Way</title>"
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>'
+        "</head><body>Listing</body></html>"
+    )
+
+
+def test_zillow_state_blob():
+    """Test that Zillow's embedded property record fills the listing fields"""
+    fields = extract_structured_fields(zillow_page(), "zillow")
+
+    assert fields["address"] == "1 Zillow Way"
+    assert fields["zipCode"] == "78701"
+    assert fields["price"] == 525000
+    assert fields["aiFairValue"] == 531200
+    assert fields["bedrooms"] == 3
+    assert fields["bathrooms"] == 2.5
+    assert fields["mlsNumber"] == "ACT123"
+    assert fields["hasHOA"] is False
+    assert fields["builtBefore1978"] is True
+
+
+def test_json_ld_and_open_graph():
+    """Test the generic JSON-LD and OpenGraph parsers used for Redfin"""
+    json_ld = {
+        "@context": "https://schema.org",
+        "@graph": [
+            {
+                "@type": ["SingleFamilyResidence", "Product"],
+                "address": {
+                    "@type": "PostalAddress",
+                    "streetAddress": "2 Redfin Rd",
+                    "addressLocality": "Dallas",
+                    "addressRegion": "TX",
+                    "postalCode": "75201",
+                },
+                "numberOfRooms": 4,
+                "floorSize": {"@type": "QuantitativeValue", "value": "1,850"},
+                "offers": {"@type": "Offer", "price": "$410,000"},
+            }
+        ],
+    }
+    html = (
+        f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+        '<meta property="og:title" content="2 Redfin Rd, Dallas, TX 75201 | MLS# 20240101 | Redfin">'
+    )
+    fields = extract_structured_fields(html, "redfin")
+
+    assert fields["address"] == "2 Redfin Rd"
+    assert fields["state"] == "TX"
+    assert fields["price"] == 410000
+    assert fields["squareFeet"] == 1850
+    assert fields["propertyType"] == "singlefamily"
+    assert fields["mlsNumber"] == "20240101"
+    assert "aiFairValue" not in fields
+
+
+def test_realtor_state_blob():
+    """Test realtor.com's property record"""
+    home = {
+        "list_price": 299000,
+        "location": {"address": {"line": "3 Realtor Ct", "city": "Houston", "state_code": "TX", "postal_code": "77002"}},
+        "description": {"beds": 2, "baths_consolidated": "1.5", "sqft": 1100, "year_built": 1999, "type": "condos"},
+        "source": {"listing_id": "HAR555"},
+        "hoa": {"fee": 350},
+    }
+    next_data = {"props": {"pageProps": {"initialReduxState": {"propertyDetails": home}}}}
+    html = f'<script id="__NEXT_DATA__">{json.dumps(next_data)}</script>'
+    fields = extract_structured_fields(html, "realtor")
+
+    assert fields["address"] == "3 Realtor Ct"
+    assert fields["bathrooms"] == 1.5
+    assert fields["propertyType"] == "condos"
+    assert fields["hasHOA"] is True
+    assert fields["builtBefore1978"] is False
+
+
+def test_malformed_structured_data_is_ignored():
+    """Test that broken JSON doesn't fail the extraction"""
+    html = '<script type="application/ld+json">{not json</script><script id="__NEXT_DATA__">[</script>'
+    assert extract_structured_fields(html, "zillow") == {}
+
+
+@pytest.mark.asyncio
+async def test_complete_structured_data_skips_llm(monkeypatch):
+    """Test that a well-formed listing is extracted without calling the LLM"""
+    async def fetch(url):
+        return zillow_page()
+
+    async def generate_json(prompt, timeout=None):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(property_extractor, "fetch_webpage_content", fetch)
+    monkeypatch.setattr(property_extractor.llm_client, "generate_json", generate_json)
+
+    data = await property_extractor.extract_property_from_url("https://www.zillow.com/homedetails/123_zpid/")
+    assert data.address == "1 Zillow Way"
+    assert data.ai_fair_value == 531200
+    assert data.square_feet == 2100
+
+
+@pytest.mark.asyncio
+async def test_llm_is_asked_only_for_missing_fields(monkeypatch):
+    """Test that the LLM fills the gaps without overriding structured values"""
+    prompts = []
+
+    async def fetch(url):
+        return zillow_page().replace('\\"zestimate\\": 531200, ', "")
+
+    async def generate_json(prompt, timeout=None):
+        prompts.append(prompt)
+        return json.dumps({"aiFairValue": 515000, "price": 1, "listingAgentEmail": "pat@example.com"})
+
+    monkeypatch.setattr(property_extractor, "fetch_webpage_content", fetch)
+    monkeypatch.setattr(property_extractor.llm_client, "generate_json", generate_json)
+
+    data = await property_extractor.extract_property_from_url("https://www.zillow.com/homedetails/123_zpid/")
+    assert data.ai_fair_value == 515000
+    assert data.price == 525000
+    assert data.listing_agent_email == "pat@example.com"
+
+    schema = prompts[0].split("these exact fields:")[1]
+    assert '"aiFairValue"' in schema
+    assert '"address"' not in schema
+
+
+@pytest.mark.asyncio
+async def test_structured_data_is_used_alone_while_llm_is_unavailable(monkeypatch):
+    """Test the degraded extraction when the LLM circuit is open"""
+    async def generate_json(prompt, timeout=None):
+        raise LLMUnavailableError("LLM is unavailable", 30.0)
+
+    monkeypatch.setattr(property_extractor.llm_client, "generate_json", generate_json)
+
+    page = property_extractor.ListingPage(html=zillow_page().replace('\\"zestimate\\": 531200, ', ""))
+    fields = await property_extractor.extract_property_fields("https://www.zillow.com/homedetails/123_zpid/", page=page)
+    assert fields[property_extractor.PARTIAL_RESULT] is True
+    assert fields["address"] == "1 Zillow Way"
+    assert "aiFairValue" not in fields
+
+    # Nothing to fall back on: the error is raised
+    with pytest.raises(LLMUnavailableError):
+        await property_extractor.extract_property_fields(
+            "https://www.zillow.com/homedetails/123_zpid/",
+            page=property_extractor.ListingPage(html="<html>Listing</html>"),
+        )